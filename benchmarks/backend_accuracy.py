@@ -0,0 +1,143 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.analytics import PANELS as ALL_PANELS
+from utils.analytics import FilteredData, area_sources, map_medians, ratings_by_person, top_couriers
+from utils.backends import PandasBackend, SQLBackend, build_database, default_engine
+from utils.data_manipulation import clean_data, haversine_distance, load_data, write_snapshot
+from utils.filters import FilterIndex
+from utils.geo import bin_coordinates
+from utils.spatial import AreaFilter, GridIndex
+
+# Consultas das páginas que leem as linhas (as demais usam o cubo e os sketches, iguais nos dois backends)
+PANELS = {
+    'map_medians': map_medians,
+    'ratings_by_person': ratings_by_person,
+    'top_couriers': top_couriers,
+    'map_bins_delivery': lambda data: bin_coordinates(data.rows, ['Delivery_location_latitude', 'Delivery_location_longitude'])[0],
+    'map_bins_restaurant': lambda data: bin_coordinates(data.rows, ['Restaurant_latitude', 'Restaurant_longitude'])[0],
+}
+
+def same_result(df_pandas, df_sql, rtol=1e-6):
+    """ Esta função tem o objetivo de comparar o resultado de uma consulta nos dois backends.
+
+        Colunas numéricas são comparadas com tolerância relativa (as avaliações são float32 no pandas e
+        float64 no banco); as demais, como texto.
+
+        Input:
+        - df_pandas (DataFrame): Resultado do backend pandas
+        - df_sql (DataFrame): Resultado do backend SQL
+        - rtol (float): Tolerância relativa
+        Output: bool
+    """
+    if list(df_pandas.columns) != list(df_sql.columns) or len(df_pandas) != len(df_sql):
+        return False
+
+    for col in df_pandas.columns:
+        left, right = df_pandas[col], df_sql[col]
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            if not np.allclose(left.to_numpy(dtype=float), right.to_numpy(dtype=float), rtol=rtol, equal_nan=True):
+                return False
+        elif not (left.astype(str).to_numpy() == right.astype(str).to_numpy()).all():
+            return False
+
+    return True
+
+def check_backends(path, engine):
+    """ Esta função tem o objetivo de comparar as consultas das páginas no backend pandas e no banco embutido.
+
+        São usados filtros com metade e com todo o período, combinados com todas as densidades, duas densidades
+        e nenhuma densidade, sem e com filtros geográficos (raio em torno de um restaurante e distância mínima).
+        Com filtros geográficos, todas as tabelas das páginas são comparadas, com o cubo e os sketches construídos
+        a partir das linhas de cada backend (ver utils.analytics.area_sources), assim como o restaurante mais próximo.
+
+        Input:
+        - path (str): Caminho do CSV
+        - engine (str): 'duckdb' ou 'sqlite'
+        Output: DataFrame (uma linha por filtro e consulta)
+    """
+    df1 = clean_data(load_data.__wrapped__(path))
+    pandas_backend = PandasBackend(FilterIndex(df1, cache_size=0))
+
+    # O banco e o snapshot são gravados em uma pasta temporária, para não alterar a pasta do CSV
+    folder = tempfile.mkdtemp()
+    try:
+        copy = shutil.copy(path, folder)
+        write_snapshot(copy, df1)
+        sql_backend = SQLBackend(build_database(copy, engine), engine)
+
+        middle = pandas_backend.min_date + (pandas_backend.max_date - pandas_backend.min_date) / 2
+        options = pandas_backend.traffic_options
+        center = tuple(df1.loc[len(df1) // 2, ['Restaurant_latitude', 'Restaurant_longitude']])
+        areas = [AreaFilter(), AreaFilter(center, 50, 'delivery'), AreaFilter(center, 100, 'restaurant', df1['distance'].median()),
+                 AreaFilter(min_distance_km=df1['distance'].median())]
+        rows = []
+        for date_limit in [middle, pandas_backend.max_date + pd.Timedelta(days=1)]:
+            for traffic_options in [options, options[:2], []]:
+                for area in areas:
+                    data_pandas = FilteredData(pandas_backend.filter(date_limit, traffic_options, area), None)
+                    data_sql = FilteredData(sql_backend.filter(date_limit, traffic_options, area), None)
+                    panels = PANELS
+                    if area.active and len(data_pandas.rows) > 0:
+                        data_pandas = FilteredData(data_pandas.rows, *area_sources(data_pandas.rows))
+                        data_sql = FilteredData(data_sql.rows, *area_sources(data_sql.rows))
+                        panels = {**ALL_PANELS, **PANELS}
+
+                    state = {'date_limit': date_limit, 'traffic': '|'.join(map(str, traffic_options)), 'area': area.key()}
+                    rows.append({**state, 'panel': 'len', 'rows': len(data_pandas.rows), 'ok': len(data_pandas.rows) == len(data_sql.rows)})
+                    for name, func in panels.items():
+                        df_pandas = func(data_pandas)
+                        rows.append({**state, 'panel': name, 'rows': len(df_pandas), 'ok': same_result(df_pandas, func(data_sql))})
+
+        nearest = pandas_backend.nearest_restaurant(center[0] + 0.01, center[1] - 0.01)
+        rows.append({'date_limit': None, 'traffic': None, 'area': None, 'panel': 'nearest_restaurant', 'rows': 1,
+                     'ok': nearest == sql_backend.nearest_restaurant(center[0] + 0.01, center[1] - 0.01)})
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return pd.DataFrame(rows)
+
+def check_antimeridian(n_points=20_000, n_queries=300, seed=42):
+    """ Esta função tem o objetivo de comparar o índice espacial (GridIndex) com a distância calculada para todos os pontos, perto de ±180° de longitude.
+
+        Os pontos e os centros das consultas ficam a até 1° do antimeridiano (incluindo longitudes exatamente 180 e -180),
+        onde o retângulo das consultas é dividido em duas faixas de colunas.
+
+        Input:
+        - n_points (int): Quantidade de pontos
+        - n_queries (int): Quantidade de consultas (raio e ponto mais próximo)
+        - seed (int): Semente do gerador aleatório
+        Output: DataFrame (uma linha por tipo de consulta, no formato de check_backends)
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-80, 80, n_points)
+    lon = np.where(rng.random(n_points) < 0.5, rng.uniform(179, 180, n_points), rng.uniform(-180, -179, n_points))
+    lon[:10], lon[10:20] = 180.0, -180.0
+    grid = GridIndex(lat, lon)
+
+    within_ok, nearest_ok = 0, 0
+    for _ in range(n_queries):
+        center = (rng.uniform(-80, 80), rng.choice([-1, 1]) * rng.uniform(179, 180))
+        radius_km = rng.choice([1, 5, 20, 50, 200])
+        distances = haversine_distance(center[0], center[1], lat, lon)
+        within_ok += np.array_equal(grid.within(center[0], center[1], radius_km), np.flatnonzero(distances <= radius_km))
+        nearest_ok += grid.nearest(center[0], center[1])[1] == distances.min()
+
+    return pd.DataFrame([{'date_limit': None, 'traffic': None, 'area': None, 'panel': f'antimeridian_{name}', 'rows': n_queries, 'ok': n_ok == n_queries}
+                         for name, n_ok in [('within', within_ok), ('nearest', nearest_ok)]])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifica se as consultas das páginas no banco embutido retornam o mesmo que o pandas.')
+    parser.add_argument('--path', default=os.path.join('datasets', 'train.csv'), help='CSV no formato do train.csv')
+    parser.add_argument('--engine', choices=['duckdb', 'sqlite'], default=None, help='Padrão: DuckDB se instalado, senão SQLite')
+    args = parser.parse_args()
+
+    report = pd.concat([check_backends(args.path, args.engine or default_engine()), check_antimeridian()], ignore_index=True)
+    print(report.to_string(index=False))
+    sys.exit(0 if report['ok'].all() else 1)
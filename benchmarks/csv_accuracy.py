@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_manipulation import clean_data, quarantine_report, read_clean_csv
+
+def compare_frames(df_reference, df1):
+    """ Esta função tem o objetivo de comparar, coluna a coluna, dois DataFrames limpos.
+
+        Input:
+        - df_reference (DataFrame): Saída de clean_data
+        - df1 (DataFrame): Saída de read_clean_csv
+        Output: DataFrame (uma linha por coluna, com os tipos, se os valores são idênticos e a maior diferença numérica)
+    """
+    rows = []
+    for col in df_reference.columns:
+        left, right = df_reference[col], df1[col] if col in df1.columns else None
+        row = {'column': col, 'dtype': str(left.dtype), 'dtype_new': None if right is None else str(right.dtype),
+               'identical': right is not None and left.equals(right), 'max_abs_diff': None}
+        if right is not None and not row['identical'] and pd.api.types.is_float_dtype(left) and pd.api.types.is_float_dtype(right):
+            row['max_abs_diff'] = float(np.nanmax(np.abs(left.to_numpy() - right.to_numpy())))
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+def check_csv(path):
+    """ Esta função tem o objetivo de comparar read_clean_csv com clean_data sobre o mesmo CSV, em resultado e em tempo.
+
+        A referência é lida com float_precision='round_trip' (números arredondados corretamente, como no pyarrow);
+        a comparação com o leitor padrão do pandas também é mostrada, para CSVs com números longos.
+
+        Input: path (str) -> Caminho do CSV
+        Output: tuple (comparação com a referência, comparação com o leitor padrão, tempos em segundos, quarentena por motivo)
+    """
+    start = time.perf_counter()
+    df_default = clean_data(pd.read_csv(path))
+    seconds = {'pandas_clean_data': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    df1, df_rejected = read_clean_csv(path)
+    seconds['read_clean_csv'] = time.perf_counter() - start
+
+    df_reference = clean_data(pd.read_csv(path, float_precision='round_trip'))
+    return compare_frames(df_reference, df1), compare_frames(df_default, df1), seconds, quarantine_report(df_rejected)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifica se a leitura com o pyarrow (read_clean_csv) retorna o mesmo que clean_data.')
+    parser.add_argument('--path', default=os.path.join('datasets', 'train.csv'), help='CSV no formato do train.csv')
+    args = parser.parse_args()
+
+    report, report_default, seconds, report_rejected = check_csv(args.path)
+    print(report.to_string(index=False))
+    print('\nColunas diferentes do leitor padrão do pandas:', ', '.join(report_default.loc[~report_default['identical'], 'column']) or 'nenhuma')
+    print('\n' + ', '.join(f'{name}: {value:.3f} s' for name, value in seconds.items()))
+    print('\n' + report_rejected.to_string(index=False))
+    sys.exit(0 if report['identical'].all() else 1)
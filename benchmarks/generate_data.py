@@ -0,0 +1,123 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Valores categóricos no mesmo formato do train.csv original (com os espaços à direita)
+CITIES = ['Metropolitian ', 'Urban ', 'Semi-Urban ']
+CITY_WEIGHTS = [0.75, 0.22, 0.03]
+TRAFFIC = ['Low ', 'Jam ', 'Medium ', 'High ']
+WEATHER = ['conditions Sunny', 'conditions Stormy', 'conditions Sandstorms', 'conditions Cloudy', 'conditions Fog', 'conditions Windy']
+ORDER_TYPES = ['Snack ', 'Meal ', 'Drinks ', 'Buffet ']
+VEHICLES = ['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle ']
+VEHICLE_WEIGHTS = [0.58, 0.33, 0.08, 0.01]
+CITY_CODES = ['INDO', 'BANG', 'COIMB', 'CHEN', 'HYD', 'RANCHI', 'MYS', 'DEH', 'KOC', 'PUNE', 'LUDH', 'KNP',
+              'MUM', 'KOL', 'JAP', 'SUR', 'GOA', 'AURG', 'AGR', 'VAD', 'ALH', 'BHP']
+
+# Centros aproximados das cidades (lat, lon), usados para gerar coordenadas agrupadas
+CITY_CENTERS = np.array([[22.72, 75.86], [12.97, 77.59], [11.02, 76.96], [13.08, 80.27], [17.39, 78.49],
+                         [23.34, 85.31], [12.30, 76.64], [30.32, 78.03], [9.93, 76.26], [18.52, 73.86],
+                         [30.90, 75.86], [26.45, 80.33], [19.08, 72.88], [22.57, 88.36], [26.91, 75.79],
+                         [21.17, 72.83], [15.30, 74.12], [19.88, 75.34], [27.18, 78.01], [22.31, 73.18],
+                         [25.44, 81.85], [23.26, 77.41]])
+
+def generate_chunk(n, rng, start_id=0, start_date='2022-02-11', days=56):
+    """ Esta função tem o objetivo de gerar n pedidos sintéticos no formato bruto do train.csv.
+
+        São reproduzidas as particularidades do arquivo original: o valor 'NaN ' como nulo,
+        textos com espaços à direita, o prefixo '(min) ' em Time_taken(min) e datas em '%d-%m-%Y'.
+
+        Input:
+        - n (int): Quantidade de linhas
+        - rng (Generator): Gerador de números aleatórios do NumPy
+        - start_id (int): Primeiro número usado na coluna ID
+        - start_date (str): Data do primeiro dia de pedidos
+        - days (int): Quantidade de dias cobertos pelos pedidos
+        Output: DataFrame
+    """
+    def choice(values, p=None):
+        return rng.choice(np.array(values, dtype=object), n, p=p)
+
+    def with_nan(values, rate):
+        values = values.astype(object)
+        values[rng.random(n) < rate] = 'NaN '
+        return values
+
+    city_code = rng.integers(0, len(CITY_CODES), n)
+    restaurant = rng.integers(1, 21, n)
+    courier = rng.integers(1, 4, n)
+    delivery_person_id = np.char.add(np.char.add(np.array(CITY_CODES)[city_code], 'RES'),
+                                     np.char.add(np.char.zfill(restaurant.astype(str), 2),
+                                                 np.char.add('DEL', np.char.zfill(courier.astype(str), 2))))
+
+    restaurant_lat = CITY_CENTERS[city_code, 0] + rng.normal(0, 0.05, n)
+    restaurant_lon = CITY_CENTERS[city_code, 1] + rng.normal(0, 0.05, n)
+
+    missing_profile = rng.random(n) < 0.04
+    age = rng.integers(20, 40, n).astype(str).astype(object)
+    age[missing_profile] = 'NaN '
+    ratings = np.round(rng.uniform(2.5, 5.0, n), 1).astype(str).astype(object)
+    ratings[missing_profile] = 'NaN '
+
+    order_date = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+    minutes = rng.integers(600, 1380, n)
+    time_ordered = np.char.add(np.char.add(np.char.zfill((minutes // 60).astype(str), 2), ':'),
+                               np.char.add(np.char.zfill((minutes % 60).astype(str), 2), ':00')).astype(object)
+    time_picked = np.char.add(np.char.add(np.char.zfill(((minutes + 10) // 60 % 24).astype(str), 2), ':'),
+                              np.char.add(np.char.zfill(((minutes + 10) % 60).astype(str), 2), ':00'))
+
+    weather = choice(WEATHER)
+    weather[rng.random(n) < 0.01] = 'conditions NaN'
+
+    return pd.DataFrame({
+        'ID': [f'0x{i:04x} ' for i in range(start_id, start_id + n)],
+        'Delivery_person_ID': np.char.add(delivery_person_id, ' '),
+        'Delivery_person_Age': age,
+        'Delivery_person_Ratings': ratings,
+        'Restaurant_latitude': restaurant_lat,
+        'Restaurant_longitude': restaurant_lon,
+        'Delivery_location_latitude': restaurant_lat + rng.uniform(-0.15, 0.15, n),
+        'Delivery_location_longitude': restaurant_lon + rng.uniform(-0.15, 0.15, n),
+        'Order_Date': order_date.strftime('%d-%m-%Y'),
+        'Time_Orderd': with_nan(time_ordered, 0.01),
+        'Time_Order_picked': time_picked,
+        'Weatherconditions': weather,
+        'Road_traffic_density': with_nan(choice(TRAFFIC), 0.01),
+        'Vehicle_condition': rng.integers(0, 4, n),
+        'Type_of_order': choice(ORDER_TYPES),
+        'Type_of_vehicle': choice(VEHICLES, VEHICLE_WEIGHTS),
+        'multiple_deliveries': with_nan(rng.integers(0, 4, n).astype(str), 0.02),
+        'Festival': with_nan(choice(['No ', 'Yes '], [0.98, 0.02]), 0.005),
+        'City': with_nan(choice(CITIES, CITY_WEIGHTS), 0.026),
+        'Time_taken(min)': np.char.add('(min) ', rng.integers(10, 55, n).astype(str)),
+    })
+
+def generate_csv(path, rows, seed=42, chunksize=500_000, start_date='2022-02-11', days=56):
+    """ Esta função tem o objetivo de gravar um train.csv sintético com a quantidade de linhas informada.
+
+        As linhas são geradas e gravadas em blocos, então arquivos de 10M de linhas não precisam caber na memória.
+
+        Input:
+        - path (str): Caminho do CSV de saída
+        - rows (int): Quantidade total de linhas
+        - seed (int): Semente do gerador aleatório
+        - chunksize (int): Quantidade de linhas geradas por bloco
+        - start_date (str): Data do primeiro dia de pedidos
+        - days (int): Quantidade de dias cobertos pelos pedidos
+        Output: None
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunksize):
+        df_chunk = generate_chunk(min(chunksize, rows - start), rng, start, start_date, days)
+        df_chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um train.csv sintético para benchmarks.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--out', default='datasets/synthetic.csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start-date', default='2022-02-11')
+    parser.add_argument('--days', type=int, default=56)
+    args = parser.parse_args()
+
+    generate_csv(args.out, args.rows, args.seed, start_date=args.start_date, days=args.days)
@@ -0,0 +1,186 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.generate_data import generate_csv
+from utils.analytics import PANELS, FilteredData, area_sources
+from utils.backends import PandasBackend, SQLBackend, build_database, default_engine
+from utils.data_manipulation import clean_data, haversine_distance, load_data, read_clean_csv, write_snapshot
+from utils.filters import FilterIndex
+from utils.geo import bin_coordinates
+from utils.quantiles import build_digests
+from utils.ranking import top_k_per_group
+from utils.rollup import build_cube, filter_cube
+from utils.sketches import build_distinct_sketches
+from utils.spatial import AreaFilter
+
+RESULTS_DIR = 'benchmarks/results'
+
+def measure(func, *args, memory=True):
+    """ Esta função tem o objetivo de medir o tempo (s) e o pico de memória alocada (MB) de uma chamada.
+
+        Como o tracemalloc deixa a execução mais lenta, o tempo é medido em uma execução sem ele
+        e a memória em uma segunda execução.
+
+        Input:
+        - func (callable): Função a ser medida
+        - args: Argumentos da função
+        - memory (bool): Flag que indica se o pico de memória deve ser medido
+        Output: tuple (retorno da função, segundos, pico de memória em MB ou None)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+
+    if not memory:
+        return result, seconds, None
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, seconds, round(peak / 2 ** 20, 1)
+
+def top_deliveries(rows):
+    """ Esta função reproduz o ranking de entregadores da página Entregadores. """
+    df_times = rows.aggregate(['City', 'Delivery_person_ID'], {'Time_taken(min)': ('Time_taken(min)', 'mean')})
+    return top_k_per_group(df_times, 'City', 'Time_taken(min)', k=10)
+
+def spatial_index(filter_index):
+    """ Constrói o SpatialIndex do FilterIndex (feito na primeira consulta com filtros geográficos). """
+    return filter_index.spatial
+
+def page_empresa(data):
+    """ Esta função reproduz as agregações da página Empresa. """
+    for name in ['orders_by_date', 'orders_by_traffic', 'orders_by_city_and_traffic', 'orders_by_week', 'orders_by_person', 'rolling_by_city', 'map_medians']:
+        PANELS[name](data)
+    bin_coordinates(data.rows, ['Delivery_location_latitude', 'Delivery_location_longitude'])
+
+def page_entregadores(data):
+    """ Esta função reproduz as agregações da página Entregadores. """
+    for name in ['courier_extremes', 'ratings_by_person', 'ratings_by_traffic', 'ratings_by_weather', 'top_couriers']:
+        PANELS[name](data)
+
+def page_restaurantes(data):
+    """ Esta função reproduz as agregações da página Restaurantes. """
+    for name in ['unique_couriers', 'mean_distance', 'festival_time', 'time_by_city', 'time_by_city_and_order_type', 'distance_by_city',
+                 'time_by_city_and_traffic', 'time_percentiles_by_city', 'time_percentiles_by_traffic']:
+        PANELS[name](data)
+
+def run_benchmark(path, memory=True, backends=('pandas',)):
+    """ Esta função tem o objetivo de medir as etapas críticas do dashboard sobre um CSV.
+
+        As consultas das páginas são medidas em cada backend (ver utils.backends); as etapas dos
+        backends SQL têm o nome do banco como prefixo (ex.: 'sqlite_page_empresa').
+
+        Input:
+        - path (str): Caminho do CSV
+        - memory (bool): Flag que indica se o pico de memória deve ser medido
+        - backends (list): 'pandas', 'sql', 'duckdb' e/ou 'sqlite'
+        Output: list (um dicionário por etapa com 'step', 'seconds' e 'peak_mb')
+    """
+    results = []
+
+    def step(name, func, *args):
+        result, seconds, peak_mb = measure(func, *args, memory=memory)
+        results.append({'step': name, 'seconds': round(seconds, 4), 'peak_mb': peak_mb})
+        return result
+
+    df_raw = step('load_data', load_data.__wrapped__, path)
+    df1 = step('clean_data', clean_data, df_raw)
+    step('read_clean_csv', read_clean_csv, path)
+    step('distance', haversine_distance, df1['Restaurant_latitude'], df1['Restaurant_longitude'],
+         df1['Delivery_location_latitude'], df1['Delivery_location_longitude'])
+    cube = step('build_cube', build_cube, df1)
+    sketches = step('build_sketches', build_distinct_sketches, df1)
+    digests = step('build_digests', build_digests, df1)
+    # Sem cache LRU, para medir o filtro em si
+    filter_index = step('filter_index', FilterIndex, df1, 0)
+
+    # Filtro típico: metade do período e duas densidades de tráfego
+    date_limit = df1['Order_Date'].min() + (df1['Order_Date'].max() - df1['Order_Date'].min()) / 2
+    traffic_options = filter_index.traffic_options[:2]
+    cube_filtered = step('filter_cube', filter_cube, cube, date_limit, traffic_options)
+    step('spatial_index', spatial_index, filter_index)
+    # Filtro geográfico típico: entregas a até 20 km de um restaurante
+    center = tuple(df1.loc[len(df1) // 2, ['Restaurant_latitude', 'Restaurant_longitude']])
+    area = AreaFilter(center, 20, 'delivery')
+    sketches_filtered = filter_cube(sketches, date_limit, traffic_options)
+    digests_filtered = filter_cube(digests, date_limit, traffic_options)
+
+    for name in backends:
+        if name == 'pandas':
+            prefix, backend = '', PandasBackend(filter_index)
+        else:
+            # O banco é construído a partir do snapshot limpo, como nas páginas
+            engine = default_engine() if name == 'sql' else name
+            write_snapshot(path, df1)
+            prefix = f'{engine}_'
+            backend = SQLBackend(step(f'{prefix}build_database', build_database, path, engine), engine)
+
+        rows_filtered = step(f'{prefix}filter', backend.filter, date_limit, traffic_options)
+        data = FilteredData(rows_filtered, cube_filtered, sketches_filtered, digests_filtered)
+
+        step(f'{prefix}top_deliveries', top_deliveries, rows_filtered)
+        step(f'{prefix}page_empresa', page_empresa, data)
+        step(f'{prefix}page_entregadores', page_entregadores, data)
+        step(f'{prefix}page_restaurantes', page_restaurantes, data)
+
+        rows_area = step(f'{prefix}filter_area', backend.filter, date_limit, traffic_options, area)
+        step(f'{prefix}area_sources', area_sources, rows_area)
+        step(f'{prefix}nearest_restaurant', backend.nearest_restaurant, *center)
+
+    return results
+
+def compare(report, baseline):
+    """ Esta função tem o objetivo de comparar um relatório com um relatório anterior (razão atual / anterior).
+
+        Input:
+        - report (DataFrame): Relatório atual
+        - baseline (DataFrame): Relatório anterior
+        Output: DataFrame
+    """
+    df_compare = report.merge(baseline, on=['rows', 'step'], how='left', suffixes=('', '_baseline'))
+    df_compare['seconds_ratio'] = (df_compare['seconds'] / df_compare['seconds_baseline']).round(2)
+    df_compare['peak_mb_ratio'] = (df_compare['peak_mb'].astype(float) / df_compare['peak_mb_baseline'].astype(float)).round(2)
+
+    return df_compare
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mede tempo e memória das etapas críticas do dashboard em dados sintéticos.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--data-dir', default='datasets', help='Pasta onde os CSVs sintéticos são gerados (e reaproveitados)')
+    parser.add_argument('--compare', help='Relatório JSON anterior para comparação')
+    parser.add_argument('--no-memory', action='store_true', help='Não mede o pico de memória (execução mais rápida)')
+    parser.add_argument('--backends', nargs='+', default=['pandas'], choices=['pandas', 'sql', 'duckdb', 'sqlite'],
+                        help='Backends das consultas das páginas (ver utils.backends)')
+    args = parser.parse_args()
+
+    rows_reports = []
+    for rows in args.rows:
+        path = os.path.join(args.data_dir, f'synthetic_{rows}.csv')
+        if not os.path.exists(path):
+            generate_csv(path, rows)
+        for result in run_benchmark(path, memory=not args.no_memory, backends=args.backends):
+            rows_reports.append({'rows': rows, **result})
+
+    report = pd.DataFrame(rows_reports)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w') as f:
+        json.dump({'python': platform.python_version(), 'pandas': pd.__version__, 'results': rows_reports}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report = compare(report, pd.DataFrame(json.load(f)['results']))
+
+    print(report.to_string(index=False))
+    print(f'\nRelatório gravado em {output}')
@@ -0,0 +1,78 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.data_manipulation import clean_data, load_data
+from utils.sketches import DistinctSketch, build_distinct_sketches, distinct_count
+
+def check_cardinalities(cardinalities, trials=5, z=3, seed=42):
+    """ Esta função tem o objetivo de comparar a estimativa do HyperLogLog (sem o modo exato) com a contagem exata.
+
+        Para cada cardinalidade são gerados trials conjuntos de IDs aleatórios, com repetições.
+
+        Input:
+        - cardinalities (list): Quantidades de valores distintos
+        - trials (int): Quantidade de conjuntos por cardinalidade
+        - z (float): Quantidade de erros padrão do intervalo
+        - seed (int): Semente do gerador aleatório
+        Output: DataFrame (uma linha por conjunto, com o erro relativo e se o valor exato ficou dentro do intervalo)
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in cardinalities:
+        for trial in range(trials):
+            ids = rng.choice(np.arange(n) + trial * n, size=3 * n).astype(str)
+            exact = len(np.unique(ids))
+
+            sketch = DistinctSketch(exact_limit=0).add(ids)
+            low, high = sketch.error_bounds(z)
+            rows.append({'distinct': exact, 'trial': trial, 'estimate': round(sketch.estimate()),
+                         'relative_error': round((sketch.estimate() - exact) / exact, 4),
+                         'within_bounds': low <= exact <= high})
+
+    return pd.DataFrame(rows)
+
+def check_dataset(path, z=3):
+    """ Esta função tem o objetivo de comparar, em um CSV real, os entregadores distintos por semana dos sketches com o nunique exato.
+
+        São comparados o modo padrão (exato para poucos valores) e o HyperLogLog puro.
+
+        Input:
+        - path (str): Caminho do CSV
+        - z (float): Quantidade de erros padrão do intervalo
+        Output: DataFrame
+    """
+    df1 = clean_data(load_data.__wrapped__(path))
+    exact = df1.groupby('week_of_year', observed=True)['Delivery_person_ID'].nunique().rename('nunique').reset_index()
+
+    df_compare = exact
+    for name, exact_limit in [('default', None), ('hll', 0)]:
+        kwargs = {} if exact_limit is None else {'exact_limit': exact_limit}
+        df_count = distinct_count(build_distinct_sketches(df1, **kwargs), ['week_of_year'], z, **kwargs)
+        df_count = df_count.rename(columns={'distinct': name, 'low': f'{name}_low', 'high': f'{name}_high', 'exact': f'{name}_exact'})
+        df_compare = df_compare.merge(df_count, on='week_of_year', how='left')
+
+    df_compare['default_ok'] = df_compare['default'] == df_compare['nunique']
+    df_compare['hll_ok'] = (df_compare['hll_low'] <= df_compare['nunique']) & (df_compare['nunique'] <= df_compare['hll_high'])
+
+    return df_compare
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifica o erro dos sketches de valores distintos contra a contagem exata.')
+    parser.add_argument('--cardinalities', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--path', help='CSV no formato do train.csv para comparar os entregadores distintos por semana')
+    args = parser.parse_args()
+
+    report = check_cardinalities(args.cardinalities, args.trials)
+    print(report.to_string(index=False))
+    ok = bool(report['within_bounds'].all())
+
+    if args.path:
+        df_compare = check_dataset(args.path)
+        print(df_compare.to_string(index=False))
+        ok &= bool(df_compare['default_ok'].all() and df_compare['hll_ok'].all())
+
+    sys.exit(0 if ok else 1)
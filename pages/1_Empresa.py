@@ -2,19 +2,36 @@
 # Imports
 # =======================================
 import folium
-import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit_folium import st_folium
-from utils.data_manipulation import load_data, clean_data, chart
+from utils.analytics import FilteredData, load_area_sources, load_rolling
+from utils.artifacts import PanelSource
+from utils.data_manipulation import MAX_CHART_POINTS, dataset_path, load_courier_sketches, load_cube, chart
+from utils.backends import load_backend
+from utils.filters import sidebar_filters
+from utils.profiling import profile, profiled, profiling_panel, start_profiling
+from utils.geo import bin_coordinates, draw_binned_map
+from utils.rollup import filter_cube
+from utils.windows import ROLLING_WINDOWS
 
 # =======================================
 # Configurações da página
 # =======================================
 st.set_page_config(layout="wide", page_title='Visão Empresa', page_icon='img/logo.png')
+start_profiling('Empresa')
+
+# Visões da página e as tabelas que cada uma usa (as das visões inativas são calculadas em segundo plano)
+VIEWS = {
+    'Visão Gerencial': ['orders_by_date', 'orders_by_traffic', 'orders_by_city_and_traffic'],
+    'Visão Tática': ['orders_by_week', 'orders_by_person', 'rolling_by_city'],
+    'Visão Geográfica': ['map_medians'],
+}
 
 # =======================================
 # Funções
 # =======================================
+@profiled()
 def draw_map(df_map, cols, popup_cols):
     """ Esta função tem o objetivo de criar um mapa que mostra a localização central dos restaurantes por tipo de cidade.
 
@@ -30,65 +47,79 @@ def draw_map(df_map, cols, popup_cols):
                                zoom_control=True, control_scale=True, 
                                zoom_start=6)
 
-    for _, row in df_map.iterrows():
-        folium.Marker(location=(row[cols[0]], 
-                                row[cols[1]]), 
-                                popup=row[popup_cols], 
-                                icon=folium.Icon(color='red')).add_to(map)   
+    popups = df_map[popup_cols[0]].astype(str).str.cat([df_map[col].astype(str) for col in popup_cols[1:]], sep=' - ')
+
+    for lat, lon, popup in zip(df_map[cols[0]], df_map[cols[1]], popups):
+        folium.Marker(location=(lat, lon), 
+                      popup=popup, 
+                      icon=folium.Icon(color='red')).add_to(map)   
 
     return map
 
 # =======================================
-# Extração
+# Extração e Limpeza
 # =======================================
-path = 'datasets/train.csv'
-df = load_data(path)
+path = dataset_path()
+# Backend das consultas sobre as linhas: pandas em memória ou banco embutido (variável de ambiente CURRY_BACKEND)
+with profile('load_backend') as section:
+    backend = load_backend(path)
+    section.rows_out = len(backend)
 
-# =======================================
-# Limpeza
-# =======================================
-df1 = clean_data(df)
+with profile('load_cube') as section:
+    cube = load_cube(path)
+    section.rows_out = len(cube)
+
+with profile('load_courier_sketches') as section:
+    sketches = load_courier_sketches(path)
+    section.rows_out = len(sketches)
 
 # =======================================
 # Barra Lateral
 # =======================================
 st.markdown('# Marketplace - Visão Empresa')
-st.sidebar.image('img/logo.png', width=120)
-st.sidebar.markdown('# Curry Company')
-st.sidebar.markdown('## Fastest delivery in town')
-st.sidebar.markdown('---')
-
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider('Até qual valor?', value=df1['Order_Date'].max().to_pydatetime(), 
-                                                   min_value=df1['Order_Date'].min().to_pydatetime(), 
-                                                   max_value=df1['Order_Date'].max().to_pydatetime(),
-                                                   format='DD-MM-YYYY')
-st.sidebar.markdown('---')
-
-traffic_options = st.sidebar.multiselect('Quais as condições de trânsito?', 
-                                 options=df1['Road_traffic_density'].unique(), 
-                                 default=df1['Road_traffic_density'].unique(),
-                                 placeholder='Escolha as densidades')
-
-st.sidebar.markdown('---')
-st.sidebar.markdown('### Made by Gabriel Paneque Didi')
+date_slider, traffic_options, area = sidebar_filters(backend)
 
 # Uso dos filtros
-df1 = df1.loc[(df1['Order_Date'] < date_slider) & (df1['Road_traffic_density'].isin(traffic_options)), :]
+with profile('filter', rows_in=len(backend)) as section:
+    rows1 = backend.filter(date_slider, traffic_options, area)
+    section.rows_out = len(rows1)
+
+if area.active:
+    # Filtros geográficos: o cubo e os sketches são construídos a partir das linhas filtradas (ver utils.analytics.area_sources)
+    with profile('area_sources', rows_in=len(rows1)) as section:
+        cube1, sketches1, _ = load_area_sources(path, rows1, date_slider, traffic_options, area)
+        section.rows_out = len(cube1)
+else:
+    with profile('filter_cube', rows_in=len(cube)) as section:
+        cube1 = filter_cube(cube, date_slider, traffic_options)
+        section.rows_out = len(cube1)
+
+    with profile('filter_sketches', rows_in=len(sketches)) as section:
+        sketches1 = filter_cube(sketches, date_slider, traffic_options)
+        section.rows_out = len(sketches1)
+
+# Tabelas pré-calculadas (python -m utils.artifacts), com cálculo na hora quando não existirem. As janelas móveis são
+# calculadas uma vez sobre todo o histórico do estado de tráfego e área e cortadas na data limite (ver load_rolling)
+data = FilteredData(rows1, cube1, sketches1, rolling=lambda: load_rolling(path, backend, traffic_options, area, cube, sketches))
+panels = PanelSource(path, date_slider, traffic_options, data, area)
 
 # =======================================
 # Layout
 # =======================================
-tab1, tab2, tab3 = st.tabs(['Visão Gerencial', 'Visão Tática', 'Visão Geográfica'])
+# Só a visão selecionada é calculada e desenhada a cada interação (st.tabs executaria as três)
+view = st.radio('Visão', list(VIEWS), horizontal=True, key='empresa_view', label_visibility='collapsed')
 
-with tab1:
+if view == 'Visão Gerencial':
     with st.container():
         # Quantidade de pedidos por dia
         st.markdown('#### Quantidade de pedidos por dia')
 
-        orders_by_date = df1.loc[:, ['ID', 'Order_Date']].groupby('Order_Date').count().reset_index()
+        with profile('orders_by_date', rows_in=len(cube1)) as section:
+            orders_by_date = panels.get('orders_by_date')
+            section.rows_out = len(orders_by_date)
 
-        fig_orders_by_date = chart(orders_by_date, ['Order_Date', 'ID'], {'ID': 'Num. pedidos', 'Order_Date': 'Data'})
+        fig_orders_by_date = chart(orders_by_date, ['Order_Date', 'ID'], {'ID': 'Num. pedidos', 'Order_Date': 'Data'},
+                                   max_points=MAX_CHART_POINTS, downsample='minmax')
         st.plotly_chart(fig_orders_by_date)
 
     with st.container():
@@ -98,7 +129,9 @@ with tab1:
         # Quantidade de pedidos por densidade de tráfego
         st.markdown('#### Quantidade de pedidos por densidade de tráfego')   
 
-        orders_by_traffic_density = df1.loc[:, ['ID', 'Road_traffic_density']].groupby('Road_traffic_density').count().reset_index()
+        with profile('orders_by_traffic_density', rows_in=len(cube1)) as section:
+            orders_by_traffic_density = panels.get('orders_by_traffic')
+            section.rows_out = len(orders_by_traffic_density)
 
         fig_orders_by_traffic_density = chart(orders_by_traffic_density, ['Road_traffic_density', 'ID'], type='pie')
         st.plotly_chart(fig_orders_by_traffic_density)
@@ -107,7 +140,9 @@ with tab1:
         # Comparação do volume de pedidos por cidade e tipo de tráfego
         st.markdown('#### Comparação do volume de pedidos por cidade e tipo de tráfego')
         
-        orders_by_city_and_traffic = df1.loc[:, ['ID', 'City', 'Road_traffic_density']].groupby(['City', 'Road_traffic_density']).count().reset_index()
+        with profile('orders_by_city_and_traffic', rows_in=len(cube1)) as section:
+            orders_by_city_and_traffic = panels.get('orders_by_city_and_traffic')
+            section.rows_out = len(orders_by_city_and_traffic)
         
         fig_orders_by_city_and_traffic = chart(orders_by_city_and_traffic, 
                                                ['City', 'Road_traffic_density'], 
@@ -116,42 +151,89 @@ with tab1:
                                                type='scatter')
         st.plotly_chart(fig_orders_by_city_and_traffic)
 
-with tab2:
+elif view == 'Visão Tática':
     with st.container():
         # Quantidade de pedidos por semana
         st.markdown('#### Quantidade de pedidos por semana')    
 
-        orders_by_week = df1.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
+        with profile('orders_by_week', rows_in=len(cube1)) as section:
+            orders_by_week = panels.get('orders_by_week')
+            section.rows_out = len(orders_by_week)
 
         fig_orders_by_week = chart(orders_by_week, 
                                    ['week_of_year', 'ID'], 
                                    labels={'ID': 'Num. pedidos', 'week_of_year': 'Semana'}, 
-                                   type='line')
+                                   type='line', max_points=MAX_CHART_POINTS)
         st.plotly_chart(fig_orders_by_week)
 
     with st.container():
         # Quantidade de pedidos por entregador por semana
         st.markdown('#### Quantidade de pedidos por entregador por semana') 
-        people_by_week = df1.loc[:, ['Delivery_person_ID', 'week_of_year']].groupby('week_of_year').nunique().reset_index()
-
-        orders_by_person = pd.merge(orders_by_week, people_by_week, how='inner', on='week_of_year')
-        orders_by_person['orders_by_person'] = orders_by_person['ID'] / orders_by_person['Delivery_person_ID']
+        with profile('orders_by_person', rows_in=len(rows1)) as section:
+            orders_by_person = panels.get('orders_by_person')
+            section.rows_out = len(orders_by_person)
 
         fig_orders_by_person = chart(orders_by_person, 
                                     ['week_of_year', 'orders_by_person'],
                                     labels={'week_of_year': 'Semana', 'orders_by_person': 'Pedidos por entregador'},
-                                    type='line')
+                                    type='line', max_points=MAX_CHART_POINTS)
 
         st.plotly_chart(fig_orders_by_person)
 
-with tab3:
-    # A localização central de cada cidade por tipo de tráfego
-    df_map = df1.loc[:, ['Delivery_location_latitude', 'Delivery_location_longitude', 'City', 'Road_traffic_density']].groupby(['City', 'Road_traffic_density']).median().reset_index()
+    with st.container():
+        # Métricas por cidade em janelas móveis de dias corridos
+        st.markdown('#### Métricas móveis por cidade')
+        window = st.radio('Janela', ROLLING_WINDOWS, format_func=lambda days: f'Últimos {days} dias', horizontal=True, key='empresa_window')
+
+        with profile('rolling_by_city', rows_in=len(cube1)) as section:
+            rolling_by_city = panels.get('rolling_by_city')
+            rolling_by_city = rolling_by_city.loc[rolling_by_city['window'] == window, :]
+            section.rows_out = len(rolling_by_city)
+
+        if len(rolling_by_city) == 0:
+            st.markdown(f'O período filtrado tem menos de {window} dias.')
+        else:
+            for col, label in [('orders', 'Num. pedidos'), ('orders_by_person', 'Pedidos por entregador ativo'), ('time_mean', 'Tempo médio de entrega (min)')]:
+                fig_rolling = chart(rolling_by_city,
+                                    ['Order_Date', col],
+                                    labels={'Order_Date': 'Último dia da janela', col: label, 'City': 'Tipo de cidade'},
+                                    color='City', type='line')
+                st.plotly_chart(fig_rolling)
+
+elif view == 'Visão Geográfica':
+    map_mode = st.radio('Modo do mapa', ['Localização central', 'Densidade de entregas', 'Densidade de restaurantes'], horizontal=True)
+
     try:
-        map = draw_map(df_map, ['Delivery_location_latitude', 'Delivery_location_longitude'], ['City', 'Road_traffic_density'])
+        if map_mode == 'Localização central':
+            # A localização central de cada cidade por tipo de tráfego
+            with profile('map_medians', rows_in=len(rows1)) as section:
+                df_map = panels.get('map_medians')
+                section.rows_out = len(df_map)
+            map = draw_map(df_map, ['Delivery_location_latitude', 'Delivery_location_longitude'], ['City', 'Road_traffic_density'])
+            title = 'A localização central de cada cidade por tipo de tráfego'
+        else:
+            # Pedidos agrupados em uma grade no servidor: quantidade e tempo médio de entrega por célula
+            if map_mode == 'Densidade de entregas':
+                cols = ['Delivery_location_latitude', 'Delivery_location_longitude']
+            else:
+                cols = ['Restaurant_latitude', 'Restaurant_longitude']
+            with profile('map_bins', rows_in=len(rows1)) as section:
+                df_bins, cell_size = bin_coordinates(rows1, cols)
+                section.rows_out = len(df_bins)
+            with profile('draw_binned_map', rows_in=len(df_bins)):
+                map = draw_binned_map(df_bins, cell_size)
+            title = f'{map_mode} (células de {cell_size:g}°)'
 
         with st.container():
-            st.markdown('#### A localização central de cada cidade por tipo de tráfego')
-            st_folium(map, returned_objects=[], use_container_width=True)
+            st.markdown(f'#### {title}')
+            with profile('st_folium'):
+                st_folium(map, returned_objects=[], use_container_width=True)
     except:
-        st.markdown('Erro! Tente atualizar os filtros!')
\ No newline at end of file
+        st.markdown('Erro! Tente atualizar os filtros!')
+
+# Adianta as tabelas das outras visões para o mesmo filtro: um lote pendente por sessão, substituído quando o filtro muda
+ctx = get_script_run_ctx()
+panels.prefetch([name for other, names in VIEWS.items() if other != view for name in names],
+                owner=('Empresa', ctx.session_id if ctx else None))
+
+profiling_panel()
\ No newline at end of file
@@ -1,78 +1,57 @@
 # =======================================
 # Imports
 # =======================================
-import pandas as pd
 import streamlit as st
-from utils.data_manipulation import load_data, clean_data
+from utils.analytics import FilteredData, load_area_sources, split_top_couriers
+from utils.artifacts import PanelSource
+from utils.data_manipulation import dataset_path, load_cube
+from utils.backends import load_backend
+from utils.filters import sidebar_filters
+from utils.profiling import profile, profiling_panel, start_profiling
+from utils.rollup import filter_cube
 
 # =======================================
 # Configurações da página
 # =======================================
 st.set_page_config(layout="wide", page_title='Visão Entregadores', page_icon='img/logo.png')
+start_profiling('Entregadores')
 
 # =======================================
-# Funções
+# Extração e Limpeza
 # =======================================
-def top_deliveries(df, ascending):
-    """ Esta função tem a responsabilidade de retornar os 10 entregadores mais rápidos (ou mais lentos) por cidade
+path = dataset_path()
+# Backend das consultas sobre as linhas: pandas em memória ou banco embutido (variável de ambiente CURRY_BACKEND)
+with profile('load_backend') as section:
+    backend = load_backend(path)
+    section.rows_out = len(backend)
 
-        Input: 
-        - df (DataFrame): DataFrame com os dados de entregas
-        - ascending (bool): Flag que indica se vai retornar os entregadores mais rápidos ou mais lentos 
-        (True para os mais rápidos, False para os mais lentos)
-        Output: DataFrame
-    """
-    cities = df['City'].unique()
-
-    df_times = df.loc[:, ['Time_taken(min)', 'City', 'Delivery_person_ID']].groupby(['City', 'Delivery_person_ID']).mean().reset_index()
-
-    df_top = pd.DataFrame()
-
-    for city in cities:
-        df_aux = df_times.loc[df_times['City'] == city, :].sort_values(by='Time_taken(min)', ascending=ascending).head(10)
-
-        df_top = pd.concat([df_top, df_aux]).reset_index(drop=True)
-
-    return df_top
-
-
-# =======================================
-# Extração
-# =======================================
-path = 'datasets/train.csv'
-df = load_data(path)
-
-# =======================================
-# Limpeza
-# =======================================
-df1 = clean_data(df)
+with profile('load_cube') as section:
+    cube = load_cube(path)
+    section.rows_out = len(cube)
 
 # =======================================
 # Barra Lateral
 # =======================================
 st.markdown('# Marketplace - Visão Entregadores')
-st.sidebar.image('img/logo.png', width=120)
-st.sidebar.markdown('# Curry Company')
-st.sidebar.markdown('## Fastest delivery in town')
-st.sidebar.markdown('---')
-
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider('Até qual valor?', value=df1['Order_Date'].max().to_pydatetime(), 
-                                                   min_value=df1['Order_Date'].min().to_pydatetime(), 
-                                                   max_value=df1['Order_Date'].max().to_pydatetime(),
-                                                   format='DD-MM-YYYY')
-st.sidebar.markdown('---')
-
-traffic_options = st.sidebar.multiselect('Quais as condições de trânsito?', 
-                                 options=df1['Road_traffic_density'].unique(), 
-                                 default=df1['Road_traffic_density'].unique(),
-                                 placeholder='Escolha as densidades')
-
-st.sidebar.markdown('---')
-st.sidebar.markdown('### Made by Gabriel Paneque Didi')
+date_slider, traffic_options, area = sidebar_filters(backend)
 
 # Uso dos filtros
-df1 = df1.loc[(df1['Order_Date'] < date_slider) & (df1['Road_traffic_density'].isin(traffic_options)), :]
+with profile('filter', rows_in=len(backend)) as section:
+    rows1 = backend.filter(date_slider, traffic_options, area)
+    section.rows_out = len(rows1)
+
+if area.active:
+    # Filtros geográficos: o cubo é construído a partir das linhas filtradas (ver utils.analytics.area_sources)
+    with profile('area_sources', rows_in=len(rows1)) as section:
+        cube1 = load_area_sources(path, rows1, date_slider, traffic_options, area)[0]
+        section.rows_out = len(cube1)
+else:
+    with profile('filter_cube', rows_in=len(cube)) as section:
+        cube1 = filter_cube(cube, date_slider, traffic_options)
+        section.rows_out = len(cube1)
+
+# Tabelas pré-calculadas (python -m utils.artifacts), com cálculo na hora quando não existirem
+panels = PanelSource(path, date_slider, traffic_options, FilteredData(rows1, cube1), area)
 
 # =======================================
 # Layout
@@ -81,19 +60,20 @@ df1 = df1.loc[(df1['Order_Date'] < date_slider) & (df1['Road_traffic_density'].i
 with st.container():
     st.markdown('#### Métricas gerais')
     col1, col2, col3, col4 = st.columns(4)
+    courier_extremes = panels.get('courier_extremes')
     
     with col1:
         # Maior idade dos entregadores
-        st.metric(label='Maior idade', value=df1.loc[:, 'Delivery_person_Age'].max())
+        st.metric(label='Maior idade', value=courier_extremes['age_max'][0])
     with col2:
         # Menor idade dos entregadores
-        st.metric(label='Menor idade', value=df1.loc[:, 'Delivery_person_Age'].min())
+        st.metric(label='Menor idade', value=courier_extremes['age_min'][0])
     with col3:
         # Melhor condição dos veículos
-        st.metric(label='Melhor condição', value=df1.loc[:, 'Vehicle_condition'].max())     
+        st.metric(label='Melhor condição', value=courier_extremes['vehicle_condition_max'][0])     
     with col4:
         # Pior condição dos veículos
-        st.metric(label='Pior condição', value=df1.loc[:, 'Vehicle_condition'].min())  
+        st.metric(label='Pior condição', value=courier_extremes['vehicle_condition_min'][0])  
 
 st.markdown('---')
 
@@ -101,7 +81,9 @@ with st.container():
     # Avaliação média por entregador
     st.markdown('#### Avaliação média por entregador')  
 
-    ratings_by_person = df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']].groupby('Delivery_person_ID').mean().reset_index()
+    with profile('ratings_by_person', rows_in=len(rows1)) as section:
+        ratings_by_person = panels.get('ratings_by_person')
+        section.rows_out = len(ratings_by_person)
     st.dataframe(ratings_by_person)     
 
 with st.container():
@@ -110,30 +92,33 @@ with st.container():
     with col1:
         # Avaliação média e o desvio padrão por tipo de tráfego
         st.markdown('#### Avaliação média por tráfego') 
-        mean_std_by_traffic_density = df1.loc[:, ['Road_traffic_density', 'Delivery_person_Ratings']].groupby('Road_traffic_density') \
-                                                                                    .agg({'Delivery_person_Ratings': ['mean', 'std']}).reset_index()
-        mean_std_by_traffic_density.columns = ['Road_traffic_density', 'ratings_mean', 'ratings_std']
+        with profile('mean_std_by_traffic_density', rows_in=len(cube1)):
+            mean_std_by_traffic_density = panels.get('ratings_by_traffic')
         st.dataframe(mean_std_by_traffic_density)  
     with col2:
         # Avaliação média e o desvio padrão por clima
         st.markdown('#### Avaliação média por clima')             
-        mean_std_by_weather = df1.loc[:, ['Weatherconditions', 'Delivery_person_Ratings']].groupby('Weatherconditions') \
-                                                                                        .agg({'Delivery_person_Ratings': ['mean', 'std']}).reset_index()
-        mean_std_by_weather.columns = ['Weatherconditions', 'ratings_mean', 'ratings_std']
+        with profile('mean_std_by_weather', rows_in=len(cube1)):
+            mean_std_by_weather = panels.get('ratings_by_weather')
         st.dataframe(mean_std_by_weather)
 
 st.markdown('---')
 
 with st.container():
+    # Mais rápidos e mais lentos vêm da mesma tabela (uma única agregação por entregador)
+    with profile('top_deliveries', rows_in=len(rows1)):
+        fastest_deliveries, slowest_deliveries = split_top_couriers(panels.get('top_couriers'))
 
     col1, col2 = st.columns(2)
 
     with col1:
         # Top 10 entregadores mais rápidos por cidade
         st.markdown('#### Top 10 entregadores mais rápidos por cidade')
-        st.dataframe(top_deliveries(df1, True))
+        st.dataframe(fastest_deliveries)
 
     with col2:
         # Top 10 entregadores mais lentos por cidade
         st.markdown('#### Top 10 entregadores mais lentos por cidade')
-        st.dataframe(top_deliveries(df1, False))
\ No newline at end of file
+        st.dataframe(slowest_deliveries)
+
+profiling_panel()
\ No newline at end of file
@@ -2,34 +2,38 @@
 # Imports
 # =======================================
 import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
-from haversine import haversine
-from utils.data_manipulation import load_data, clean_data, chart
+from utils.analytics import FilteredData, load_area_sources
+from utils.artifacts import PanelSource
+from utils.data_manipulation import dataset_path, load_courier_sketches, load_cube, load_digests, chart
+from utils.backends import load_backend
+from utils.filters import sidebar_filters
+from utils.profiling import profile, profiled, profiling_panel, start_profiling
+from utils.rollup import filter_cube
 
 # =======================================
 # Configurações da página
 # =======================================
 st.set_page_config(layout="wide", page_title='Visão Restaurantes', page_icon='img/logo.png')
+start_profiling('Restaurantes')
 
 # =======================================
 # Funções
 # =======================================
-def avg_std_time_festival(df, festival, col):
+@profiled()
+def avg_std_time_festival(df_festival, festival, col):
     """ Esta função tem a responsabilidade de retornar as métricas de média e desvio padrão do tempo de entrega com e sem festivais.
 
         Input: 
-        - df (DataFrame): DataFrame com os dados das entregas
+        - df_festival (DataFrame): Média, desvio padrão e percentis do tempo por festival, combinados a partir
+        das parciais de Welford do cubo e dos t-digests (ver utils.analytics.festival_time)
         - festival (str): Flag que indica se está ocorrendo o festival
         ('Yes' para presença do festival, 'No' para a ausência do festival)
         - col (str): String que indica qual métrica deve ser retornada
-        ('time_mean' para média, 'time_std' para desvio padrão)
+        ('time_mean' para média, 'time_std' para desvio padrão, 'time_p50', 'time_p90' e 'time_p99' para percentis)
         Output: DataFrame
     """    
-    df_festival = df.loc[:, ['Festival', 'Time_taken(min)']].groupby('Festival').agg({'Time_taken(min)': ['mean', 'std']}).reset_index()
-    df_festival.columns = ['Festival', 'time_mean', 'time_std']
-    
     try:
         value = np.round(df_festival.loc[df_festival['Festival'] == festival, col].reset_index(drop=True)[0], 2)
 
@@ -38,54 +42,84 @@ def avg_std_time_festival(df, festival, col):
 
     return value
 
-# =======================================
-# Extração
-# =======================================
-path = 'datasets/train.csv'
-df = load_data(path)
+def percentiles_help(df_festival, festival):
+    """ Esta função tem o objetivo de descrever os percentis do tempo de entrega com ou sem festival, para a ajuda das métricas.
+
+        Input:
+        - df_festival (DataFrame): Saída de utils.analytics.festival_time
+        - festival (str): 'Yes' ou 'No'
+        Output: str
+    """
+    return ' · '.join(f'{col[5:]}: {avg_std_time_festival(df_festival, festival, col)} min' for col in ['time_p50', 'time_p90', 'time_p99'])
+
+@profiled()
+def percentiles_chart(df_percentiles, x, label):
+    """ Esta função tem o objetivo de criar um gráfico de barras agrupadas com os percentis p50, p90 e p99 do tempo de entrega.
+
+        Input:
+        - df_percentiles (DataFrame): Tabela com a coluna x e as colunas 'time_p50', 'time_p90' e 'time_p99'
+        - x (str): Coluna do eixo x
+        - label (str): Título do eixo x
+        Output: Figure
+    """
+    fig = go.Figure()
+    for col in ['time_p50', 'time_p90', 'time_p99']:
+        fig.add_trace(go.Bar(x=df_percentiles[x], y=df_percentiles[col], name=col[5:]))
+    fig.update_layout(barmode='group', xaxis_title=label, yaxis_title='Tempo de entrega (min)')
+    return fig
 
 # =======================================
-# Limpeza
+# Extração e Limpeza
 # =======================================
-df1 = clean_data(df)
+path = dataset_path()
+# Backend das consultas sobre as linhas: pandas em memória ou banco embutido (variável de ambiente CURRY_BACKEND)
+with profile('load_backend') as section:
+    backend = load_backend(path)
+    section.rows_out = len(backend)
 
-# Criando nova coluna 'distance'
-
-df1['distance'] = df1.loc[:, ['Restaurant_latitude', 
-                              'Restaurant_longitude', 
-                              'Delivery_location_latitude', 
-                              'Delivery_location_longitude']].apply(lambda x: haversine((x['Restaurant_latitude'], x['Restaurant_longitude']), 
-                                                                                        (x['Delivery_location_latitude'], x['Delivery_location_longitude'])), 
-                                                                                        axis=1)
+with profile('load_cube') as section:
+    cube = load_cube(path)
+    section.rows_out = len(cube)
 
+with profile('load_courier_sketches') as section:
+    sketches = load_courier_sketches(path)
+    section.rows_out = len(sketches)
 
+with profile('load_digests') as section:
+    digests = load_digests(path)
+    section.rows_out = len(digests)
 
 # =======================================
 # Barra Lateral
 # =======================================
 st.markdown('# Marketplace - Visão Restaurantes')
-st.sidebar.image('img/logo.png', width=120)
-st.sidebar.markdown('# Curry Company')
-st.sidebar.markdown('## Fastest delivery in town')
-st.sidebar.markdown('---')
-
-st.sidebar.markdown('## Selecione uma data limite')
-date_slider = st.sidebar.slider('Até qual valor?', value=df1['Order_Date'].max().to_pydatetime(), 
-                                                   min_value=df1['Order_Date'].min().to_pydatetime(), 
-                                                   max_value=df1['Order_Date'].max().to_pydatetime(),
-                                                   format='DD-MM-YYYY')
-st.sidebar.markdown('---')
-
-traffic_options = st.sidebar.multiselect('Quais as condições de trânsito?', 
-                                 options=df1['Road_traffic_density'].unique(), 
-                                 default=df1['Road_traffic_density'].unique(),
-                                 placeholder='Escolha as densidades')
-
-st.sidebar.markdown('---')
-st.sidebar.markdown('### Made by Gabriel Paneque Didi')
+date_slider, traffic_options, area = sidebar_filters(backend)
 
 # Uso dos filtros
-df1 = df1.loc[(df1['Order_Date'] < date_slider) & (df1['Road_traffic_density'].isin(traffic_options)), :]
+with profile('filter', rows_in=len(backend)) as section:
+    rows1 = backend.filter(date_slider, traffic_options, area)
+    section.rows_out = len(rows1)
+
+if area.active:
+    # Filtros geográficos: o cubo e os sketches são construídos a partir das linhas filtradas (ver utils.analytics.area_sources)
+    with profile('area_sources', rows_in=len(rows1)) as section:
+        cube1, sketches1, digests1 = load_area_sources(path, rows1, date_slider, traffic_options, area)
+        section.rows_out = len(cube1)
+else:
+    with profile('filter_cube', rows_in=len(cube)) as section:
+        cube1 = filter_cube(cube, date_slider, traffic_options)
+        section.rows_out = len(cube1)
+
+    with profile('filter_sketches', rows_in=len(sketches)) as section:
+        sketches1 = filter_cube(sketches, date_slider, traffic_options)
+        section.rows_out = len(sketches1)
+
+    with profile('filter_digests', rows_in=len(digests)) as section:
+        digests1 = filter_cube(digests, date_slider, traffic_options)
+        section.rows_out = len(digests1)
+
+# Tabelas pré-calculadas (python -m utils.artifacts), com cálculo na hora quando não existirem
+panels = PanelSource(path, date_slider, traffic_options, FilteredData(rows1, cube1, sketches1, digests1), area)
 
 # =======================================
 # Layout
@@ -97,22 +131,29 @@ with st.container():
     col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
-        st.metric(label='Entregadores únicos', value=df1['Delivery_person_ID'].nunique())
+        with profile('unique_couriers', rows_in=len(sketches1)):
+            unique_couriers = panels.get('unique_couriers')
+        # Acima do limite do modo exato, a contagem vem do HyperLogLog: o intervalo de erro é mostrado na ajuda
+        st.metric(label='Entregadores únicos', value=int(unique_couriers['unique_couriers'][0]),
+                  help=None if unique_couriers['exact'][0] else f"Estimativa entre {unique_couriers['low'][0]:.0f} e {unique_couriers['high'][0]:.0f}")
 
     with col2:
-        st.metric(label='Distância média (km)', value=np.round(float(df1['distance'].mean()), 2))
+        st.metric(label='Distância média (km)', value=np.round(float(panels.get('mean_distance')['distance'][0]), 2))
+
+    with profile('festival_time', rows_in=len(cube1)):
+        df_festival = panels.get('festival_time')
 
     with col3:
-        st.metric(label='Tempo médio c/ Festival', value=avg_std_time_festival(df1, 'Yes', 'time_mean'))
+        st.metric(label='Tempo médio c/ Festival', value=avg_std_time_festival(df_festival, 'Yes', 'time_mean'), help=percentiles_help(df_festival, 'Yes'))
     
     with col4:
-        st.metric(label='Desvio padrão c/ Festival', value=avg_std_time_festival(df1, 'Yes', 'time_std'))
+        st.metric(label='Desvio padrão c/ Festival', value=avg_std_time_festival(df_festival, 'Yes', 'time_std'))
 
     with col5:
-        st.metric(label='Tempo médio s/ Festival', value=avg_std_time_festival(df1, 'No', 'time_mean'))
+        st.metric(label='Tempo médio s/ Festival', value=avg_std_time_festival(df_festival, 'No', 'time_mean'), help=percentiles_help(df_festival, 'No'))
 
     with col6:
-        st.metric(label='Desvio padrão s/ Festival', value=avg_std_time_festival(df1, 'No', 'time_std'))
+        st.metric(label='Desvio padrão s/ Festival', value=avg_std_time_festival(df_festival, 'No', 'time_std'))
 
 with st.container():
     st.markdown('---')
@@ -122,21 +163,22 @@ with st.container():
     with col1:
         st.markdown('#### Distribuição do tempo por cidade')
 
-        df_mean_std_time_by_city = df1.loc[:, ['Time_taken(min)', 'City']].groupby('City').agg({'Time_taken(min)': ['mean', 'std']}).reset_index()
-        df_mean_std_time_by_city.columns = ['City', 'time_mean', 'time_std']
+        with profile('mean_std_time_by_city', rows_in=len(cube1)):
+            df_mean_std_time_by_city = panels.get('time_by_city')
 
-        fig_mean_std_time = go.Figure()
-        fig_mean_std_time.add_trace(go.Bar(x=df_mean_std_time_by_city['City'], 
-                             y=df_mean_std_time_by_city['time_mean'], 
-                             error_y={'type': 'data',
-                                      'array': df_mean_std_time_by_city['time_std']}))
+        with profile('chart mean_std_time_by_city'):
+            fig_mean_std_time = go.Figure()
+            fig_mean_std_time.add_trace(go.Bar(x=df_mean_std_time_by_city['City'], 
+                                 y=df_mean_std_time_by_city['time_mean'], 
+                                 error_y={'type': 'data',
+                                          'array': df_mean_std_time_by_city['time_std']}))
         st.plotly_chart(fig_mean_std_time)
     
     with col2:
         st.markdown('#### Tempo médio por tipo de entrega')
         
-        df_mean_std_time_by_city_and_order_type = df1.loc[:, ['Time_taken(min)', 'City', 'Type_of_order']].groupby(['City', 'Type_of_order']).agg({'Time_taken(min)': ['mean', 'std']}).reset_index()
-        df_mean_std_time_by_city_and_order_type.columns = ['City', 'Type_of_order', 'time_mean', 'time_std']
+        with profile('mean_std_time_by_city_and_order_type', rows_in=len(cube1)):
+            df_mean_std_time_by_city_and_order_type = panels.get('time_by_city_and_order_type')
         st.dataframe(df_mean_std_time_by_city_and_order_type)
 
 with st.container():
@@ -146,19 +188,22 @@ with st.container():
     with col1:
         st.markdown('#### Distrbuição da distância média por cidade')
         
-        avg_distance = df1.loc[:, ['City', 'distance']].groupby('City').mean().reset_index()
-        fig_avg_distance = go.Figure(data=[go.Pie(values=avg_distance['distance'], labels=avg_distance['City'], pull=[0, 0.1, 0])])
+        with profile('avg_distance', rows_in=len(cube1)):
+            avg_distance = panels.get('distance_by_city')
+
+        with profile('chart avg_distance'):
+            fig_avg_distance = go.Figure(data=[go.Pie(values=avg_distance['distance'], labels=avg_distance['City'], pull=[0, 0.1, 0])])
         st.plotly_chart(fig_avg_distance)
     
     with col2:
         try:
             st.markdown('#### Tempo médio por cidade e tipo de tráfego')
 
-            if len(df1) == 0:
+            if len(cube1) == 0:
                 raise ValueError('DataFrame vazio') 
             
-            df_mean_std_time_by_city_and_traffic_density = df1.loc[:, ['Time_taken(min)', 'City', 'Road_traffic_density']].groupby(['City', 'Road_traffic_density']).agg({'Time_taken(min)': ['mean', 'std']}).reset_index()
-            df_mean_std_time_by_city_and_traffic_density.columns = ['City', 'Road_traffic_density', 'time_mean', 'time_std']
+            with profile('mean_std_time_by_city_and_traffic_density', rows_in=len(cube1)):
+                df_mean_std_time_by_city_and_traffic_density = panels.get('time_by_city_and_traffic')
 
             fig_sunburst = chart(df_mean_std_time_by_city_and_traffic_density, 
                                  ['City', 'Road_traffic_density', 'time_mean'], 
@@ -169,4 +214,24 @@ with st.container():
             st.plotly_chart(fig_sunburst)
 
         except:
-            st.markdown('Erro! Tente atualizar os filtros!')
\ No newline at end of file
+            st.markdown('Erro! Tente atualizar os filtros!')
+
+with st.container():
+    st.markdown('---')
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('#### Percentis do tempo de entrega por cidade')
+
+        with profile('time_percentiles_by_city', rows_in=len(digests1)):
+            df_percentiles_by_city = panels.get('time_percentiles_by_city')
+        st.plotly_chart(percentiles_chart(df_percentiles_by_city, 'City', 'Cidade'))
+
+    with col2:
+        st.markdown('#### Percentis do tempo de entrega por tipo de tráfego')
+
+        with profile('time_percentiles_by_traffic', rows_in=len(digests1)):
+            df_percentiles_by_traffic = panels.get('time_percentiles_by_traffic')
+        st.plotly_chart(percentiles_chart(df_percentiles_by_traffic, 'Road_traffic_density', 'Densidade de tráfego'))
+
+profiling_panel()
\ No newline at end of file
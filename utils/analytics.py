@@ -0,0 +1,426 @@
+import argparse
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.quantiles import quantiles
+from utils.ranking import top_k_per_group
+from utils.rollup import filter_cube, rollup
+from utils.sketches import distinct_count
+from utils.windows import rolling_metrics
+
+# Pasta padrão dos relatórios exportados pela linha de comando
+EXPORT_DIR = 'reports'
+
+# Cache LRU do cubo e dos sketches construídos com filtros geográficos, compartilhado entre sessões (ver load_area_sources)
+AREA_CACHE_SIZE = 8
+_area_cache = OrderedDict()
+_area_lock = threading.Lock()
+
+# Cache LRU das janelas móveis de todo o histórico, por estado de tráfego e filtros geográficos (ver load_rolling).
+# Cobre os 15 subconjuntos de densidades de tráfego pré-calculados pelos artefatos
+ROLLING_CACHE_SIZE = 16
+_rolling_cache = OrderedDict()
+_rolling_lock = threading.Lock()
+
+class Filters:
+    """ Esta classe tem o objetivo de representar os filtros da barra lateral das páginas.
+
+        Input:
+        - date_limit (datetime): Data limite (exclusiva) dos pedidos. Se não informada, é a data máxima dos dados
+        (o mesmo valor inicial do slider das páginas)
+        - traffic_options (list): Densidades de tráfego selecionadas. Se não informadas, todas
+        - area (AreaFilter): Filtros geográficos (ver utils.spatial). Se não informados, nenhum
+    """
+    def __init__(self, date_limit=None, traffic_options=None, area=None):
+        self.date_limit = date_limit
+        self.traffic_options = traffic_options
+        self.area = area
+
+class FilteredData:
+    """ Esta classe tem o objetivo de reunir as fontes de dados já filtradas pela barra lateral, usadas pelas tabelas das páginas.
+
+        Input:
+        - rows (PandasRows ou SQLRows): Dados filtrados, consultados pelo backend das páginas (ver utils.backends)
+        - cube1 (DataFrame): Cubo filtrado (ver utils.rollup)
+        - sketches1 (DataFrame): Sketches de entregadores filtrados (ver utils.sketches)
+        - digests1 (DataFrame): Sketches de quantis filtrados (ver utils.quantiles)
+        - rolling (function): Função sem argumentos que retorna as janelas móveis de todo o histórico com as mesmas
+        densidades de tráfego e filtros geográficos (ver load_rolling). Se não informada, as janelas são calculadas
+        a partir de cube1 e sketches1
+    """
+    def __init__(self, rows, cube1, sketches1=None, digests1=None, rolling=None):
+        self.rows = rows
+        self.cube1 = cube1
+        self.sketches1 = sketches1
+        self.digests1 = digests1
+        self.rolling = rolling
+
+def load_filtered(filters=None, path=None, backend=None):
+    """ Esta função tem o objetivo de carregar e filtrar as fontes de dados das tabelas, fora das páginas (sem o Streamlit).
+
+        Os módulos de carga são importados só aqui, para que importar utils.analytics seja rápido.
+
+        Input:
+        - filters (Filters): Filtros. Se não informados, os valores iniciais da barra lateral
+        - path (str): CSV de origem ou pasta do armazenamento incremental (padrão: a mesma origem das páginas)
+        - backend (str): Backend das consultas sobre as linhas (ver utils.backends.load_backend)
+        Output: FilteredData
+    """
+    from utils.backends import load_backend
+    from utils.data_manipulation import dataset_path, load_courier_sketches, load_cube, load_digests
+
+    filters = filters or Filters()
+    path = path or dataset_path()
+    source = load_backend(path, backend)
+
+    date_limit = source.max_date if filters.date_limit is None else pd.Timestamp(filters.date_limit)
+    traffic_options = source.traffic_options if filters.traffic_options is None else filters.traffic_options
+
+    rows = source.filter(date_limit, traffic_options, filters.area)
+    if filters.area is not None and filters.area.active:
+        return FilteredData(rows, *load_area_sources(path, rows, date_limit, traffic_options, filters.area),
+                            rolling=lambda: load_rolling(path, source, traffic_options, filters.area))
+
+    cube, sketches = load_cube(path), load_courier_sketches(path)
+    return FilteredData(rows,
+                        filter_cube(cube, date_limit, traffic_options),
+                        filter_cube(sketches, date_limit, traffic_options),
+                        filter_cube(load_digests(path), date_limit, traffic_options),
+                        rolling=lambda: load_rolling(path, source, traffic_options, cube=cube, sketches=sketches))
+
+def area_sources(rows):
+    """ Esta função tem o objetivo de construir o cubo e os sketches a partir das linhas que atendem aos filtros geográficos.
+
+        O cubo e os sketches gravados não têm dimensões geográficas, então com filtros geográficos eles são
+        reconstruídos a partir das linhas filtradas (já cortadas pela data e pelo tráfego), e as tabelas das páginas
+        continuam consistentes com os filtros.
+
+        Input: rows (PandasRows ou SQLRows) -> Linhas filtradas pelo backend (ver utils.backends)
+        Output: tuple (cubo, sketches de entregadores, sketches de quantis)
+    """
+    from utils.quantiles import QUANTILE_MEASURES, build_digests
+    from utils.rollup import CUBE_DIMENSIONS, CUBE_MEASURES, build_cube
+    from utils.sketches import build_distinct_sketches
+
+    columns = list(dict.fromkeys(CUBE_DIMENSIONS + CUBE_MEASURES + QUANTILE_MEASURES + ['Delivery_person_ID']))
+    df = rows.frame(columns)
+    return build_cube(df), build_distinct_sketches(df), build_digests(df)
+
+def load_area_sources(path, rows, date_limit, traffic_options, area):
+    """ Esta função tem o objetivo de retornar o cubo e os sketches de um estado de filtro com filtros geográficos (ver area_sources).
+
+        Os resultados recentes são memorizados em um cache LRU com chave (versão dos dados, estado de filtro), para que
+        interações que não mudam os filtros (ex.: trocar de visão) não reconstruam o cubo.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - rows (PandasRows ou SQLRows): Linhas filtradas com os mesmos filtros
+        - date_limit (datetime): Data limite selecionada
+        - traffic_options (list): Densidades de tráfego selecionadas
+        - area (AreaFilter): Filtros geográficos ativos
+        Output: tuple (cubo, sketches de entregadores, sketches de quantis)
+    """
+    from utils.data_manipulation import data_version
+
+    key = (data_version(path), pd.Timestamp(date_limit), frozenset(traffic_options), area.key())
+    with _area_lock:
+        if key in _area_cache:
+            _area_cache.move_to_end(key)
+            return _area_cache[key]
+
+    sources = area_sources(rows)
+
+    with _area_lock:
+        _area_cache[key] = sources
+        if len(_area_cache) > AREA_CACHE_SIZE:
+            _area_cache.popitem(last=False)
+
+    return sources
+
+def load_rolling(path, source, traffic_options, area=None, cube=None, sketches=None):
+    """ Esta função tem o objetivo de retornar as janelas móveis (rolling_metrics) de todo o histórico de um estado de tráfego e de filtros geográficos.
+
+        Uma janela que termina em um dia só depende dos dias até ele, então as janelas de qualquer data limite são um
+        corte desta tabela (ver rolling_by_city): as estimativas do HyperLogLog são feitas uma única vez por estado,
+        e não a cada posição do slider de datas. Os resultados recentes são memorizados em um cache LRU com chave
+        (versão dos dados, densidades de tráfego, filtros geográficos).
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - source (PandasBackend ou SQLBackend): Backend das linhas, lidas só com filtros geográficos ativos (ver utils.backends)
+        - traffic_options (list): Densidades de tráfego selecionadas
+        - area (AreaFilter): Filtros geográficos. Se não informados, nenhum
+        - cube (DataFrame): Cubo completo, sem filtros. Se não informado, é carregado de path
+        - sketches (DataFrame): Sketches de entregadores completos, sem filtros. Se não informados, são carregados de path
+        Output: DataFrame (ver rolling_metrics)
+    """
+    from utils.data_manipulation import data_version, load_courier_sketches, load_cube
+
+    active = area is not None and area.active
+    key = (data_version(path), frozenset(traffic_options), area.key() if active else None)
+    with _rolling_lock:
+        if key in _rolling_cache:
+            _rolling_cache.move_to_end(key)
+            return _rolling_cache[key]
+
+    if active:
+        cube, sketches, _ = area_sources(source.filter(source.max_date + pd.Timedelta(days=1), traffic_options, area))
+    else:
+        cube = load_cube(path) if cube is None else cube
+        sketches = load_courier_sketches(path) if sketches is None else sketches
+        cube = cube.loc[cube['Road_traffic_density'].isin(traffic_options), :]
+        sketches = sketches.loc[sketches['Road_traffic_density'].isin(traffic_options), :]
+
+    df_rolling = rolling_metrics(cube, sketches)
+
+    with _rolling_lock:
+        _rolling_cache[key] = df_rolling
+        if len(_rolling_cache) > ROLLING_CACHE_SIZE:
+            _rolling_cache.popitem(last=False)
+
+    return df_rolling
+
+# =======================================
+# Empresa
+# =======================================
+def orders_by_date(data):
+    """ Quantidade de pedidos por dia (Empresa). """
+    df_orders = rollup(data.cube1, ['Order_Date'])
+    df_orders.columns = ['Order_Date', 'ID']
+    return df_orders
+
+def orders_by_traffic(data):
+    """ Quantidade de pedidos por densidade de tráfego (Empresa). """
+    df_orders = rollup(data.cube1, ['Road_traffic_density'])
+    df_orders.columns = ['Road_traffic_density', 'ID']
+    return df_orders
+
+def orders_by_city_and_traffic(data):
+    """ Quantidade de pedidos por cidade e densidade de tráfego (Empresa). """
+    df_orders = rollup(data.cube1, ['City', 'Road_traffic_density'])
+    df_orders.columns = ['City', 'Road_traffic_density', 'ID']
+    return df_orders
+
+def orders_by_week(data):
+    """ Quantidade de pedidos por semana (Empresa). """
+    df_orders = rollup(data.cube1, ['week_of_year'])
+    df_orders.columns = ['week_of_year', 'ID']
+    return df_orders
+
+def orders_by_person(data):
+    """ Quantidade de pedidos por entregador por semana (Empresa). """
+    people_by_week = distinct_count(data.sketches1, ['week_of_year']).loc[:, ['week_of_year', 'distinct']]
+    people_by_week.columns = ['week_of_year', 'Delivery_person_ID']
+
+    df_orders = pd.merge(orders_by_week(data), people_by_week, how='inner', on='week_of_year')
+    df_orders['orders_by_person'] = df_orders['ID'] / df_orders['Delivery_person_ID']
+    return df_orders
+
+def rolling_by_city(data):
+    """ Pedidos, pedidos por entregador ativo e tempo médio de entrega por cidade em janelas móveis de 7 e 28 dias (Empresa). """
+    if data.rolling is None:
+        return rolling_metrics(data.cube1, data.sketches1)
+
+    # Corte das janelas de todo o histórico: as que terminam até o último dia filtrado, das cidades com pedidos
+    # filtrados (as mesmas linhas de rolling_metrics(cube1, sketches1))
+    df_rolling = data.rolling()
+    mask = (df_rolling['Order_Date'] <= data.cube1['Order_Date'].max()) & df_rolling['City'].isin(data.cube1['City'].unique())
+    return df_rolling.loc[mask, :].reset_index(drop=True)
+
+def map_medians(data):
+    """ Localização central de cada cidade por tipo de tráfego (Empresa). """
+    return data.rows.aggregate(['City', 'Road_traffic_density'], {'Delivery_location_latitude': ('Delivery_location_latitude', 'median'),
+                                                                   'Delivery_location_longitude': ('Delivery_location_longitude', 'median')})
+
+# =======================================
+# Entregadores
+# =======================================
+def courier_extremes(data):
+    """ Maior e menor idade dos entregadores e melhor e pior condição dos veículos (Entregadores). """
+    cube1 = data.cube1
+    return pd.DataFrame({'age_max': [cube1['Delivery_person_Age_max'].max()], 'age_min': [cube1['Delivery_person_Age_min'].min()],
+                         'vehicle_condition_max': [cube1['Vehicle_condition_max'].max()],
+                         'vehicle_condition_min': [cube1['Vehicle_condition_min'].min()]})
+
+def ratings_by_person(data):
+    """ Avaliação média por entregador (Entregadores). """
+    return data.rows.aggregate(['Delivery_person_ID'], {'Delivery_person_Ratings': ('Delivery_person_Ratings', 'mean')})
+
+def ratings_by_traffic(data):
+    """ Avaliação média e desvio padrão por densidade de tráfego (Entregadores). """
+    df_ratings = rollup(data.cube1, ['Road_traffic_density'], {'Delivery_person_Ratings': ['mean', 'std']}).drop(columns='count')
+    df_ratings.columns = ['Road_traffic_density', 'ratings_mean', 'ratings_std']
+    return df_ratings
+
+def ratings_by_weather(data):
+    """ Avaliação média e desvio padrão por clima (Entregadores). """
+    df_ratings = rollup(data.cube1, ['Weatherconditions'], {'Delivery_person_Ratings': ['mean', 'std']}).drop(columns='count')
+    df_ratings.columns = ['Weatherconditions', 'ratings_mean', 'ratings_std']
+    return df_ratings
+
+def top_couriers(data, k=10, city=None):
+    """ Esta função tem o objetivo de retornar os k entregadores mais rápidos e os k mais lentos por cidade, pelo tempo médio de entrega (Entregadores).
+
+        A agregação por entregador e a ordenação (top_k_per_group) são feitas uma única vez para os dois extremos,
+        que são retornados em uma única tabela (ver split_top_couriers).
+
+        Input:
+        - data (FilteredData)
+        - k (int): Quantidade de entregadores por cidade em cada extremo
+        - city (str): Se informada, só os entregadores desta cidade
+        Output: DataFrame com as colunas 'ranking' ('fastest' ou 'slowest'), 'City', 'Delivery_person_ID' e 'Time_taken(min)'
+    """
+    df_times = data.rows.aggregate(['City', 'Delivery_person_ID'], {'Time_taken(min)': ('Time_taken(min)', 'mean')})
+    if city is not None:
+        df_times = df_times.loc[df_times['City'] == city, :]
+
+    df_fastest, df_slowest = top_k_per_group(df_times, 'City', 'Time_taken(min)', k=k)
+    return pd.concat([df_fastest.assign(ranking='fastest'), df_slowest.assign(ranking='slowest')],
+                     ignore_index=True).loc[:, ['ranking', 'City', 'Delivery_person_ID', 'Time_taken(min)']]
+
+def split_top_couriers(df_top):
+    """ Esta função tem o objetivo de separar a tabela de top_couriers nos mais rápidos e nos mais lentos.
+
+        Input: df_top (DataFrame) -> Saída de top_couriers
+        Output: tuple (DataFrame dos mais rápidos, DataFrame dos mais lentos), sem a coluna 'ranking'
+    """
+    return tuple(df_top.loc[df_top['ranking'] == ranking, :].drop(columns='ranking').reset_index(drop=True)
+                 for ranking in ['fastest', 'slowest'])
+
+# =======================================
+# Restaurantes
+# =======================================
+def unique_couriers(data):
+    """ Quantidade de entregadores únicos, com o intervalo de erro do sketch (Restaurantes). """
+    df_couriers = distinct_count(data.sketches1)
+    df_couriers.columns = ['unique_couriers', 'low', 'high', 'exact']
+    return df_couriers
+
+def mean_distance(data):
+    """ Distância média entre restaurante e local de entrega, em km (Restaurantes). """
+    n = data.cube1['distance_n'].sum()
+    return pd.DataFrame({'distance': [data.cube1['distance_sum'].sum() / n if n > 0 else float('nan')]})
+
+def festival_time(data):
+    """ Média, desvio padrão e percentis do tempo de entrega com e sem festival (Restaurantes). """
+    df_festival = rollup(data.cube1, ['Festival'], {'Time_taken(min)': ['mean', 'std']}).drop(columns='count')
+    df_festival.columns = ['Festival', 'time_mean', 'time_std']
+    return _with_percentiles(df_festival, data, ['Festival'])
+
+def time_by_city(data):
+    """ Média e desvio padrão do tempo de entrega por cidade (Restaurantes). """
+    df_time = rollup(data.cube1, ['City'], {'Time_taken(min)': ['mean', 'std']}).drop(columns='count')
+    df_time.columns = ['City', 'time_mean', 'time_std']
+    return df_time
+
+def time_by_city_and_order_type(data):
+    """ Média e desvio padrão do tempo de entrega por cidade e tipo de pedido (Restaurantes). """
+    df_time = rollup(data.cube1, ['City', 'Type_of_order'], {'Time_taken(min)': ['mean', 'std']}).drop(columns='count')
+    df_time.columns = ['City', 'Type_of_order', 'time_mean', 'time_std']
+    return df_time
+
+def distance_by_city(data):
+    """ Distância média por cidade (Restaurantes). """
+    df_distance = rollup(data.cube1, ['City'], {'distance': ['mean']}).drop(columns='count')
+    df_distance.columns = ['City', 'distance']
+    return df_distance
+
+def time_by_city_and_traffic(data):
+    """ Média e desvio padrão do tempo de entrega por cidade e tipo de tráfego (Restaurantes, sunburst). """
+    df_time = rollup(data.cube1, ['City', 'Road_traffic_density'], {'Time_taken(min)': ['mean', 'std']}).drop(columns='count')
+    df_time.columns = ['City', 'Road_traffic_density', 'time_mean', 'time_std']
+    return df_time
+
+def _with_percentiles(df_time, data, by):
+    df_percentiles = quantiles(data.digests1, by, 'Time_taken(min)')
+    df_percentiles.columns = by + ['time_' + col for col in df_percentiles.columns[len(by):]]
+    return df_time.merge(df_percentiles, on=by, how='left')
+
+def time_percentiles_by_city(data):
+    """ Percentis (p50, p90, p99) do tempo de entrega por cidade (Restaurantes). """
+    df_time = rollup(data.cube1, ['City'], {'Time_taken(min)': ['mean']}).drop(columns='count')
+    df_time.columns = ['City', 'time_mean']
+    return _with_percentiles(df_time, data, ['City'])
+
+def time_percentiles_by_traffic(data):
+    """ Percentis (p50, p90, p99) do tempo de entrega por densidade de tráfego (Restaurantes). """
+    df_time = rollup(data.cube1, ['Road_traffic_density'], {'Time_taken(min)': ['mean']}).drop(columns='count')
+    df_time.columns = ['Road_traffic_density', 'time_mean']
+    return _with_percentiles(df_time, data, ['Road_traffic_density'])
+
+# Tabelas das páginas, por nome: todas recebem apenas FilteredData
+PANELS = {
+    'orders_by_date': orders_by_date,
+    'orders_by_traffic': orders_by_traffic,
+    'orders_by_city_and_traffic': orders_by_city_and_traffic,
+    'orders_by_week': orders_by_week,
+    'orders_by_person': orders_by_person,
+    'rolling_by_city': rolling_by_city,
+    'map_medians': map_medians,
+    'courier_extremes': courier_extremes,
+    'ratings_by_person': ratings_by_person,
+    'ratings_by_traffic': ratings_by_traffic,
+    'ratings_by_weather': ratings_by_weather,
+    'top_couriers': top_couriers,
+    'unique_couriers': unique_couriers,
+    'mean_distance': mean_distance,
+    'festival_time': festival_time,
+    'time_by_city': time_by_city,
+    'time_by_city_and_order_type': time_by_city_and_order_type,
+    'distance_by_city': distance_by_city,
+    'time_by_city_and_traffic': time_by_city_and_traffic,
+    'time_percentiles_by_city': time_percentiles_by_city,
+    'time_percentiles_by_traffic': time_percentiles_by_traffic,
+}
+
+def export_panels(data, out_dir=EXPORT_DIR, names=None, format='csv'):
+    """ Esta função tem o objetivo de gravar as tabelas das páginas em arquivos, uma por tabela.
+
+        Input:
+        - data (FilteredData): Fontes de dados filtradas (ver load_filtered)
+        - out_dir (str): Pasta de saída
+        - names (list): Nomes das tabelas (chaves de PANELS). Se não informados, todas
+        - format (str): 'csv' ou 'json' (uma lista de registros por arquivo)
+        Output: list (arquivos gravados)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for name in names or PANELS:
+        df = PANELS[name](data)
+        file = os.path.join(out_dir, f'{name}.{format}')
+        if format == 'csv':
+            df.to_csv(file, index=False)
+        elif format == 'json':
+            df.to_json(file, orient='records', date_format='iso', indent=2)
+        else:
+            raise ValueError(f'Formato desconhecido: {format}')
+        files.append(file)
+
+    return files
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exporta as tabelas das páginas em CSV ou JSON, sem o Streamlit.')
+    parser.add_argument('--path', default=None, help='CSV de origem ou pasta do armazenamento (padrão: a mesma origem das páginas)')
+    parser.add_argument('--date-limit', default=None, help='Data limite (exclusiva), ex.: 2022-03-15 (padrão: a data máxima dos dados)')
+    parser.add_argument('--traffic', nargs='+', default=None, help='Densidades de tráfego (padrão: todas)')
+    parser.add_argument('--panels', nargs='+', default=None, choices=list(PANELS), help='Tabelas exportadas (padrão: todas)')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--near', nargs=2, type=float, default=None, metavar=('LAT', 'LON'), help='Ponto de referência do filtro de raio')
+    parser.add_argument('--radius-km', type=float, default=None, help='Pedidos a até esta distância (km) do ponto --near')
+    parser.add_argument('--target', choices=['delivery', 'restaurant'], default='delivery',
+                        help='Coordenadas comparadas com o raio: local de entrega ou restaurante')
+    parser.add_argument('--min-distance-km', type=float, default=None, help='Só entregas com distância maior que esta (km)')
+    parser.add_argument('--backend', default=None, help='pandas, sql, duckdb ou sqlite (ver utils.backends)')
+    parser.add_argument('--out-dir', default=EXPORT_DIR)
+    args = parser.parse_args()
+    if args.radius_km and args.near is None:
+        parser.error('--radius-km exige --near')
+
+    from utils.spatial import AreaFilter
+    area = AreaFilter(args.near, args.radius_km, args.target, args.min_distance_km)
+    data = load_filtered(Filters(args.date_limit, args.traffic, area), args.path, args.backend)
+    for file in export_panels(data, args.out_dir, args.panels, args.format):
+        print(file)
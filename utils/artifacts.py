@@ -0,0 +1,269 @@
+import argparse
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.analytics import PANELS, FilteredData, load_rolling
+from utils.caching import cache_resource, script_context
+from utils.data_manipulation import data_version, dataset_path
+from utils.rollup import filter_cube
+
+# Pasta dos artefatos pré-calculados (uma subpasta por versão dos dados)
+ARTIFACTS_DIR = 'datasets/artifacts'
+
+# Versão do formato dos artefatos. Deve ser incrementada sempre que as tabelas de ARTIFACTS mudarem.
+ARTIFACTS_VERSION = 5
+
+# Tabelas pré-calculadas: todas as tabelas das páginas (ver utils.analytics)
+ARTIFACTS = PANELS
+
+# Cache LRU das tabelas calculadas na hora, compartilhado entre sessões (ver PanelSource)
+PANEL_CACHE_SIZE = 256
+_panel_cache = OrderedDict()
+_panel_lock = threading.Lock()
+
+# Thread que calcula em segundo plano as tabelas das visões inativas (ver PanelSource.prefetch)
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+# Lote pendente de cada dono (ex.: sessão e página), com as tarefas do seu estado de filtro atual (ver PanelSource.prefetch)
+_prefetch_batches = {}
+_prefetch_lock = threading.Lock()
+
+# =======================================
+# Pré-cálculo e leitura
+# =======================================
+def traffic_key(traffic_options):
+    """ Esta função tem o objetivo de representar um conjunto de densidades de tráfego como texto.
+
+        Input: traffic_options (list)
+        Output: str
+    """
+    return '|'.join(sorted(str(option) for option in traffic_options))
+
+def filter_states(backend):
+    """ Esta função tem o objetivo de listar os estados de filtro mais comuns a serem pré-calculados.
+
+        São todas as fronteiras de semana (domingos, como em week_of_year) e a data máxima (valor padrão
+        do slider), combinadas com todos os subconjuntos não vazios de densidades de tráfego.
+
+        Input: backend (PandasBackend ou SQLBackend, ver utils.backends)
+        Output: list de tuplas (data limite, lista de densidades)
+    """
+    dates = list(pd.date_range(backend.min_date, backend.max_date, freq='W-SUN', inclusive='neither'))
+    dates.append(backend.max_date)
+
+    options = backend.traffic_options
+    subsets = [list(subset) for k in range(1, len(options) + 1) for subset in itertools.combinations(options, k)]
+
+    return [(date, subset) for date in dates for subset in subsets]
+
+def artifacts_dir(path, out_dir=ARTIFACTS_DIR):
+    """ Esta função tem o objetivo de retornar a pasta dos artefatos de uma versão dos dados e do formato dos artefatos.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - out_dir (str): Pasta dos artefatos
+        Output: str
+    """
+    return os.path.join(out_dir, f'{data_version(path)}_a{ARTIFACTS_VERSION}')
+
+def precompute_artifacts(path, out_dir=ARTIFACTS_DIR):
+    """ Esta função tem o objetivo de calcular todas as tabelas das páginas para os estados de filtro comuns.
+
+        Cada tabela é gravada em artifacts_dir(path, out_dir)/<nome>.parquet, com as colunas 'date_limit' e
+        'traffic' identificando o estado de filtro.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - out_dir (str): Pasta dos artefatos
+        Output: str (pasta gravada)
+    """
+    from utils.backends import PandasBackend
+    from utils.data_manipulation import load_clean_data, load_courier_sketches, load_cube, load_digests
+    from utils.filters import FilterIndex
+
+    backend = PandasBackend(FilterIndex(load_clean_data(path), cache_size=0))
+    cube = load_cube(path)
+    sketches = load_courier_sketches(path)
+    digests = load_digests(path)
+
+    tables = {name: [] for name in ARTIFACTS}
+    for date_limit, traffic_options in filter_states(backend):
+        data = FilteredData(backend.filter(date_limit, traffic_options),
+                            filter_cube(cube, date_limit, traffic_options),
+                            filter_cube(sketches, date_limit, traffic_options),
+                            filter_cube(digests, date_limit, traffic_options),
+                            rolling=lambda: load_rolling(path, backend, traffic_options, cube=cube, sketches=sketches))
+        for name, func in ARTIFACTS.items():
+            df_artifact = func(data)
+            df_artifact.insert(0, 'traffic', traffic_key(traffic_options))
+            df_artifact.insert(0, 'date_limit', date_limit)
+            tables[name].append(df_artifact)
+
+    target = artifacts_dir(path, out_dir)
+    os.makedirs(target, exist_ok=True)
+    for name, dfs in tables.items():
+        # Troca atômica: as páginas não leem arquivos incompletos, e o mtime da pasta muda (ver _read_artifacts)
+        tmp = os.path.join(target, f'{name}.parquet.tmp')
+        pd.concat(dfs, ignore_index=True).to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(target, f'{name}.parquet'))
+
+    return target
+
+@cache_resource
+def _read_artifacts(artifacts_dir, mtime_ns):
+    """ Esta função tem a responsabilidade de carregar os artefatos de uma versão dos dados, indexados pelo estado de filtro.
+
+        O mtime da pasta faz parte da chave do cache: um novo pré-cálculo para a mesma versão dos dados (que troca os
+        arquivos da pasta) invalida as tabelas carregadas antes.
+
+        Input:
+        - artifacts_dir (str)
+        - mtime_ns (int): mtime da pasta (os.stat(artifacts_dir).st_mtime_ns)
+        Output: dict {nome: DataFrame}
+    """
+    artifacts = {}
+    for name in ARTIFACTS:
+        file = os.path.join(artifacts_dir, f'{name}.parquet')
+        if os.path.exists(file):
+            artifacts[name] = pd.read_parquet(file).set_index(['date_limit', 'traffic']).sort_index()
+    return artifacts
+
+class _PrefetchBatch:
+    """ Esta classe guarda as tarefas em segundo plano de um dono para um estado de filtro (ver PanelSource.prefetch). """
+    def __init__(self, key):
+        self.key = key
+        self.futures = {}
+
+def _release_batch(owner, batch):
+    """ Esta função tem a responsabilidade de esquecer o lote de um dono quando todas as suas tarefas terminarem.
+
+        Input:
+        - owner (hashable): Dono do lote
+        - batch (_PrefetchBatch)
+        Output: None
+    """
+    with _prefetch_lock:
+        if _prefetch_batches.get(owner) is batch and all(future.done() for future in batch.futures.values()):
+            del _prefetch_batches[owner]
+
+class PanelSource:
+    """ Esta classe tem o objetivo de fornecer as tabelas das páginas, lendo os artefatos pré-calculados quando existirem.
+
+        Se não houver artefato para o estado de filtro atual, a tabela é calculada na hora a partir dos dados filtrados
+        e memorizada em um cache LRU com chave (versão dos dados, estado de filtro, nome da tabela).
+        Com filtros geográficos ativos não há artefatos: as tabelas são sempre calculadas (e memorizadas).
+        As tabelas retornadas são compartilhadas entre sessões e não devem ser modificadas.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - date_limit (datetime): Data limite selecionada
+        - traffic_options (list): Densidades de tráfego selecionadas
+        - data (FilteredData): Fontes de dados filtradas, usadas quando a tabela é calculada na hora
+        - area (AreaFilter): Filtros geográficos selecionados (ver utils.spatial)
+    """
+    def __init__(self, path, date_limit, traffic_options, data, area=None):
+        self.target = artifacts_dir(path)
+        self.key = (pd.Timestamp(date_limit), traffic_key(traffic_options))
+        if area is not None and area.active:
+            self.artifacts = {}
+            self.key += (area.key(),)
+        else:
+            self.artifacts = _read_artifacts(self.target, os.stat(self.target).st_mtime_ns) if os.path.isdir(self.target) else {}
+        self.data = data
+
+    def get(self, name):
+        """ Esta função tem o objetivo de retornar uma tabela da página para o estado de filtro atual.
+
+            Input: name (str) -> Nome da tabela (chave de ARTIFACTS)
+            Output: DataFrame
+        """
+        if name in self.artifacts:
+            try:
+                return self.artifacts[name].loc[[self.key]].reset_index(drop=True)
+            except KeyError:
+                pass
+
+        key = (self.target, self.key, name)
+        with _panel_lock:
+            if key in _panel_cache:
+                _panel_cache.move_to_end(key)
+                return _panel_cache[key]
+
+        df = ARTIFACTS[name](self.data)
+
+        with _panel_lock:
+            _panel_cache[key] = df
+            if len(_panel_cache) > PANEL_CACHE_SIZE:
+                _panel_cache.popitem(last=False)
+
+        return df
+
+    def prefetch(self, names, owner=None):
+        """ Esta função tem o objetivo de calcular em segundo plano tabelas que ainda não estão nos artefatos nem no cache.
+
+            Usada pelas páginas com visões (ex.: Empresa) para adiantar as tabelas das visões inativas depois de
+            desenhar a visão ativa: trocar de visão passa a ler o cache em vez de calcular.
+
+            Cada dono tem no máximo um lote pendente, o do seu estado de filtro atual: quando o estado muda, as tarefas
+            do lote anterior que ainda estão na fila são canceladas, e as que já saíram dela não calculam nada. Assim,
+            mover o slider várias vezes não enfileira tabelas de estados que não serão mais lidos.
+
+            Input:
+            - names (list): Nomes das tabelas (chaves de ARTIFACTS)
+            - owner (hashable): Dono do lote (ex.: (página, id da sessão)). Se não informado, um único dono compartilhado
+            Output: None
+        """
+        names = [name for name in names if not (name in self.artifacts and self.key in self.artifacts[name].index)]
+        with _panel_lock:
+            names = [name for name in names if (self.target, self.key, name) not in _panel_cache]
+
+        # As tarefas rodam com o contexto da sessão atual (st.cache_resource fora da thread da página, ver script_context)
+        task = script_context(self._prefetch)
+        stale, submitted = None, []
+        with _prefetch_lock:
+            batch = _prefetch_batches.get(owner)
+            if batch is None or batch.key != (self.target, self.key):
+                stale = batch
+                batch = _prefetch_batches[owner] = _PrefetchBatch((self.target, self.key))
+
+            for name in names:
+                if name not in batch.futures:
+                    batch.futures[name] = _prefetch_executor.submit(task, owner, batch, name)
+                    submitted.append(batch.futures[name])
+
+            if not batch.futures:
+                del _prefetch_batches[owner]
+
+        # Fora do lock: cancelar e registrar callbacks podem executar _release_batch, que usa o lock
+        if stale is not None:
+            for future in stale.futures.values():
+                future.cancel()
+        for future in submitted:
+            future.add_done_callback(lambda _: _release_batch(owner, batch))
+
+    def _prefetch(self, owner, batch, name):
+        """ Esta função tem a responsabilidade de calcular uma tabela do lote em segundo plano, se o lote ainda for o atual do dono.
+
+            Input:
+            - owner (hashable): Dono do lote
+            - batch (_PrefetchBatch): Lote da tarefa
+            - name (str): Nome da tabela
+            Output: None
+        """
+        with _prefetch_lock:
+            if _prefetch_batches.get(owner) is not batch:
+                return
+        self.get(name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pré-calcula as tabelas das páginas para os estados de filtro mais comuns.')
+    parser.add_argument('--path', default=None, help='CSV de origem ou pasta do armazenamento (padrão: a mesma origem das páginas)')
+    parser.add_argument('--out-dir', default=ARTIFACTS_DIR)
+    args = parser.parse_args()
+
+    print(precompute_artifacts(args.path or dataset_path(), args.out_dir))
@@ -0,0 +1,514 @@
+import argparse
+import math
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from utils.caching import cache_resource
+from utils.data_manipulation import EARTH_RADIUS_KM, SNAPSHOT_VERSION, data_version, dataset_path, snapshot_path, store_parts, write_snapshot
+from utils.filters import load_filter_index
+from utils.geo import grid_cells
+from utils.schema import compact_dtypes, widen_dictionaries
+from utils.spatial import TARGET_COLUMNS, AreaFilter, RestaurantLocator, latitude_band
+
+# Variável de ambiente que escolhe o backend das páginas: 'pandas' (padrão), 'sql' (DuckDB se instalado, senão SQLite),
+# 'duckdb' ou 'sqlite'
+BACKEND_ENV = 'CURRY_BACKEND'
+
+# Versão do formato do banco. Deve ser incrementada sempre que a tabela ou os índices mudarem.
+DATABASE_VERSION = 2
+
+# Tabela com os dados limpos e colunas indexadas (os filtros e agrupamentos das páginas e os filtros geográficos)
+TABLE = 'deliveries'
+INDEXED_COLUMNS = ['Order_Date', 'City', 'Road_traffic_density', 'Restaurant_latitude', 'Delivery_location_latitude', 'distance']
+
+# Quantidade de linhas lidas do Parquet e inseridas por vez na construção do banco
+BATCH_SIZE = 100_000
+
+# Agregações aceitas por aggregate, com a expressão SQL correspondente (a mediana do SQLite é calculada à parte)
+SQL_AGGREGATES = {
+    'mean': 'AVG({})',
+    'median': 'MEDIAN({})',
+    'count': 'COUNT({})',
+    'size': 'COUNT(*)',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+    'nunique': 'COUNT(DISTINCT {})',
+}
+
+def default_engine():
+    """ Esta função tem o objetivo de retornar o banco embutido disponível: DuckDB, se instalado, ou SQLite.
+
+        Input: None
+        Output: str ('duckdb' ou 'sqlite')
+    """
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return 'sqlite'
+    return 'duckdb'
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """ Esta função tem a responsabilidade de calcular a distância de haversine no SQLite (registrada como HAVERSINE).
+
+        Mesma fórmula de utils.data_manipulation.haversine_distance, sem depender das funções matemáticas do SQLite
+        (que não existem em todas as compilações).
+
+        Input: lat1, lon1, lat2, lon2 (float) -> Coordenadas em graus
+        Output: float (km) ou None se alguma coordenada for nula
+    """
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class PandasRows:
+    """ Esta classe tem o objetivo de responder às consultas das páginas sobre linhas filtradas em memória (pandas).
+
+        Input: df (DataFrame) -> Dados filtrados (ex.: FilterIndex.filter)
+    """
+    def __init__(self, df):
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    def aggregate(self, by, aggs):
+        """ Esta função tem o objetivo de agrupar as linhas e calcular as agregações informadas.
+
+            Grupos com chave nula são ignorados e o resultado é ordenado pelas chaves, como no groupby do pandas.
+
+            Input:
+            - by (list): Lista de strings com nomes de colunas de agrupamento (não vazia)
+            - aggs (dict): {coluna de saída: (coluna, agregação)}, com agregações de SQL_AGGREGATES
+            Output: DataFrame com as colunas by e as colunas de saída
+        """
+        return self.df.groupby(by, observed=True).agg(**aggs).reset_index()
+
+    def grid(self, cols, value_col, cell_size):
+        """ Esta função tem o objetivo de agrupar as coordenadas em uma grade (ver utils.geo.grid_cells).
+
+            Input:
+            - cols (list): Colunas de latitude e longitude
+            - value_col (str): Coluna cuja média é calculada por célula
+            - cell_size (float): Tamanho da célula, em graus
+            Output: DataFrame com as colunas 'row', 'column', 'orders' e 'value_mean'
+        """
+        return grid_cells(self.df, cols, value_col, cell_size)
+
+    def frame(self, columns):
+        """ Esta função tem o objetivo de retornar as linhas filtradas (ex.: para reconstruir o cubo com filtros geográficos).
+
+            Input: columns (list) -> Colunas retornadas
+            Output: DataFrame
+        """
+        return self.df.loc[:, columns]
+
+class PandasBackend:
+    """ Esta classe tem o objetivo de expor o FilterIndex (dados limpos em memória) com a mesma interface do SQLBackend.
+
+        Input: filter_index (FilterIndex)
+    """
+    def __init__(self, filter_index):
+        self.filter_index = filter_index
+        self.min_date = filter_index.min_date
+        self.max_date = filter_index.max_date
+        self.traffic_options = filter_index.traffic_options
+
+    def __len__(self):
+        return len(self.filter_index.data)
+
+    def filter(self, date_limit, traffic_options, area=None):
+        """ Esta função tem o objetivo de aplicar os filtros da barra lateral.
+
+            Input:
+            - date_limit (datetime): Data limite (exclusiva) dos pedidos
+            - traffic_options (list): Densidades de tráfego selecionadas
+            - area (AreaFilter): Filtros geográficos (ver utils.spatial). Se não informado, não há filtro geográfico
+            Output: PandasRows
+        """
+        return PandasRows(self.filter_index.filter(date_limit, traffic_options, area))
+
+    def nearest_restaurant(self, lat, lon):
+        """ Esta função tem o objetivo de retornar o restaurante mais próximo de uma coordenada (ver utils.spatial.RestaurantLocator).
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            Output: dict ou None
+        """
+        return self.filter_index.spatial.restaurants.nearest(lat, lon)
+
+class SQLRows:
+    """ Esta classe tem o objetivo de responder às consultas das páginas no banco embutido, com os filtros na cláusula WHERE.
+
+        Nenhuma linha é lida para o processo: só os resultados agregados (exceto em frame, usado com filtros geográficos).
+
+        Input:
+        - backend (SQLBackend)
+        - where (str): Condição SQL dos filtros
+        - params (list): Parâmetros da condição
+    """
+    def __init__(self, backend, where, params):
+        self.backend = backend
+        self.where = where
+        self.params = params
+        self._length = None
+
+    def __len__(self):
+        if self._length is None:
+            self._length = int(self.backend.query(f'SELECT COUNT(*) AS n FROM {TABLE} WHERE {self.where}', self.params)['n'][0])
+        return self._length
+
+    def _median(self, by, out, col):
+        """ Esta função tem a responsabilidade de calcular a mediana por grupo no SQLite, que não tem MEDIAN.
+
+            As linhas de cada grupo são numeradas em ordem (funções de janela) e a mediana é a média
+            da linha central (quantidade ímpar) ou das duas centrais (quantidade par), como no pandas.
+
+            Input:
+            - by (list): Colunas de agrupamento
+            - out (str): Coluna de saída
+            - col (str): Coluna da mediana
+            Output: DataFrame
+        """
+        keys = ', '.join(_quote(key) for key in by)
+        sql = (f'SELECT {keys}, AVG(value) AS {_quote(out)} FROM ('
+               f'SELECT {keys}, {_quote(col)} AS value, '
+               f'ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY {_quote(col)}) AS position, '
+               f'COUNT(*) OVER (PARTITION BY {keys}) AS n '
+               f'FROM {TABLE} WHERE {self._where(by)} AND {_quote(col)} IS NOT NULL) '
+               f'WHERE position IN ((n + 1) / 2, (n + 2) / 2) GROUP BY {keys}')
+        return self.backend.query(sql, self.params)
+
+    def _where(self, by):
+        return self.where + ''.join(f' AND {_quote(key)} IS NOT NULL' for key in by)
+
+    def aggregate(self, by, aggs):
+        """ Esta função tem o objetivo de agrupar as linhas e calcular as agregações informadas, em SQL.
+
+            Grupos com chave nula são ignorados e o resultado é ordenado pelas chaves, como no groupby do pandas.
+
+            Input:
+            - by (list): Lista de strings com nomes de colunas de agrupamento (não vazia)
+            - aggs (dict): {coluna de saída: (coluna, agregação)}, com agregações de SQL_AGGREGATES
+            Output: DataFrame com as colunas by e as colunas de saída
+        """
+        keys = ', '.join(_quote(key) for key in by)
+        medians = {out: col for out, (col, func) in aggs.items() if func == 'median' and self.backend.engine == 'sqlite'}
+        select = ''.join(f', {SQL_AGGREGATES[func].format(_quote(col))} AS {_quote(out)}'
+                         for out, (col, func) in aggs.items() if out not in medians)
+
+        df = self.backend.query(f'SELECT {keys}{select} FROM {TABLE} WHERE {self._where(by)} GROUP BY {keys} ORDER BY {keys}', self.params)
+        for out, col in medians.items():
+            df = df.merge(self._median(by, out, col), on=by, how='left')
+
+        return df.loc[:, by + list(aggs)]
+
+    def grid(self, cols, value_col, cell_size):
+        """ Esta função tem o objetivo de agrupar as coordenadas em uma grade, em SQL (ver utils.geo.grid_cells).
+
+            Input:
+            - cols (list): Colunas de latitude e longitude
+            - value_col (str): Coluna cuja média é calculada por célula
+            - cell_size (float): Tamanho da célula, em graus
+            Output: DataFrame com as colunas 'row', 'column', 'orders' e 'value_mean'
+        """
+        lat, lon = _quote(cols[0]), _quote(cols[1])
+        row = self.backend.floor(f'{lat} / {float(cell_size)!r}')
+        column = self.backend.floor(f'{lon} / {float(cell_size)!r}')
+        sql = (f'SELECT {row} AS "row", {column} AS "column", COUNT(*) AS orders, AVG({_quote(value_col)}) AS value_mean '
+               f'FROM {TABLE} WHERE {self.where} AND {lat} IS NOT NULL AND {lon} IS NOT NULL AND ({lat} <> 0 OR {lon} <> 0) '
+               f'GROUP BY 1, 2 ORDER BY 1, 2')
+        return self.backend.query(sql, self.params)
+
+    def frame(self, columns):
+        """ Esta função tem o objetivo de ler as linhas filtradas, com os tipos do DataFrame limpo (ex.: para reconstruir o cubo com filtros geográficos).
+
+            Input: columns (list) -> Colunas retornadas
+            Output: DataFrame
+        """
+        df = self.backend.query(f'SELECT {", ".join(_quote(col) for col in columns)} FROM {TABLE} WHERE {self.where}', self.params)
+        if 'Order_Date' in df.columns:
+            df['Order_Date'] = pd.to_datetime(df['Order_Date'])
+        return compact_dtypes(df)
+
+class SQLBackend:
+    """ Esta classe tem o objetivo de consultar os dados limpos em um banco embutido (DuckDB ou SQLite) em vez de mantê-los em memória.
+
+        O banco é aberto somente para leitura, com uma conexão por thread (cada sessão do Streamlit roda em uma thread).
+
+        Input:
+        - database (str): Caminho do banco (ver build_database)
+        - engine (str): 'duckdb' ou 'sqlite'
+    """
+    def __init__(self, database, engine):
+        self.database = database
+        self.engine = engine
+        self._local = threading.local()
+        self._restaurants = None
+        if engine == 'duckdb':
+            import duckdb
+            self._connection = duckdb.connect(database, read_only=True)
+
+        bounds = self.query(f'SELECT MIN("Order_Date") AS min_date, MAX("Order_Date") AS max_date, COUNT(*) AS n FROM {TABLE}')
+        self.min_date = pd.Timestamp(bounds['min_date'][0])
+        self.max_date = pd.Timestamp(bounds['max_date'][0])
+        self.n_rows = int(bounds['n'][0])
+        self.traffic_options = list(self.query(f'SELECT "Road_traffic_density" FROM {TABLE} WHERE "Road_traffic_density" IS NOT NULL '
+                                               'GROUP BY 1 ORDER BY MIN("Order_Date"), 1')['Road_traffic_density'])
+
+    def __len__(self):
+        return self.n_rows
+
+    def _cursor(self):
+        if not hasattr(self._local, 'cursor'):
+            if self.engine == 'duckdb':
+                self._local.cursor = self._connection.cursor()
+            else:
+                self._local.cursor = sqlite3.connect(f'file:{self.database}?mode=ro', uri=True, check_same_thread=False)
+                self._local.cursor.create_function('HAVERSINE', 4, _haversine, deterministic=True)
+        return self._local.cursor
+
+    def query(self, sql, params=None):
+        """ Esta função tem o objetivo de executar uma consulta e retornar o resultado como DataFrame.
+
+            Input:
+            - sql (str): Consulta, com parâmetros '?'
+            - params (list): Parâmetros da consulta
+            Output: DataFrame
+        """
+        if self.engine == 'duckdb':
+            return self._cursor().execute(sql, params or []).df()
+        return pd.read_sql_query(sql, self._cursor(), params=params or [])
+
+    def floor(self, expression):
+        """ Esta função tem o objetivo de retornar a expressão SQL do piso (inteiro) de uma expressão.
+
+            FLOOR não existe em todas as compilações do SQLite, então lá o piso é calculado com CAST.
+
+            Input: expression (str)
+            Output: str
+        """
+        if self.engine == 'duckdb':
+            return f'CAST(FLOOR({expression}) AS BIGINT)'
+        return f'(CAST({expression} AS INTEGER) - ({expression} < CAST({expression} AS INTEGER)))'
+
+    def haversine(self, lat, lon):
+        """ Esta função tem o objetivo de retornar a expressão SQL da distância de haversine (km) entre colunas e um ponto ('?', '?').
+
+            No SQLite é usada a função HAVERSINE registrada na conexão; no DuckDB, a fórmula com as funções nativas.
+
+            Input:
+            - lat, lon (str): Colunas de latitude e longitude (já entre aspas)
+            Output: str (parâmetros: latitude e longitude do ponto)
+        """
+        if self.engine == 'duckdb':
+            return (f'(2 * {EARTH_RADIUS_KM!r} * ASIN(SQRT(POWER(SIN((RADIANS({lat}) - RADIANS(?::DOUBLE)) / 2), 2) + '
+                    f'COS(RADIANS(?::DOUBLE)) * COS(RADIANS({lat})) * POWER(SIN((RADIANS({lon}) - RADIANS(?::DOUBLE)) / 2), 2))))')
+        return f'HAVERSINE(?, ?, {lat}, {lon})'
+
+    def nearest_restaurant(self, lat, lon):
+        """ Esta função tem o objetivo de retornar o restaurante mais próximo de uma coordenada (ver utils.spatial.RestaurantLocator).
+
+            Os restaurantes (coordenadas distintas, com a quantidade de pedidos) são lidos do banco uma única vez.
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            Output: dict ou None
+        """
+        if self._restaurants is None:
+            cols = ', '.join(_quote(col) for col in TARGET_COLUMNS['restaurant'])
+            df_restaurants = self.query(f'SELECT {cols}, COUNT(*) AS orders FROM {TABLE} GROUP BY {cols}')
+            self._restaurants = RestaurantLocator(df_restaurants.dropna())
+        return self._restaurants.nearest(lat, lon)
+
+    def filter(self, date_limit, traffic_options, area=None):
+        """ Esta função tem o objetivo de aplicar os filtros da barra lateral, como condição SQL das consultas.
+
+            O filtro de raio usa o índice da latitude (faixa de latitudes que contém o círculo) e a distância exata
+            de haversine só nas linhas da faixa; o de distância mínima usa o índice de distance.
+
+            Input:
+            - date_limit (datetime): Data limite (exclusiva) dos pedidos
+            - traffic_options (list): Densidades de tráfego selecionadas
+            - area (AreaFilter): Filtros geográficos (ver utils.spatial). Se não informado, não há filtro geográfico
+            Output: SQLRows
+        """
+        date_limit = pd.Timestamp(date_limit)
+        where = ['"Order_Date" < ?']
+        params = [date_limit.to_pydatetime() if self.engine == 'duckdb' else date_limit.strftime('%Y-%m-%d %H:%M:%S')]
+
+        # Como no FilterIndex, com todas as densidades selecionadas não há filtro de tráfego
+        if not all(option in traffic_options for option in self.traffic_options):
+            if traffic_options:
+                where.append(f'"Road_traffic_density" IN ({", ".join("?" * len(traffic_options))})')
+                params.extend(str(option) for option in traffic_options)
+            else:
+                where.append('1 = 0')
+
+        area = area or AreaFilter()
+        if area.radius_km is not None:
+            lat, lon = (_quote(col) for col in TARGET_COLUMNS[area.target])
+            where.append(f'{lat} BETWEEN ? AND ? AND {self.haversine(lat, lon)} <= ?')
+            center = [area.center[0], area.center[0], area.center[1]] if self.engine == 'duckdb' else list(area.center)
+            params.extend([*latitude_band(area.center[0], area.radius_km), *center, area.radius_km])
+        if area.min_distance_km is not None:
+            where.append('"distance" > ?')
+            params.append(area.min_distance_km)
+
+        return SQLRows(self, ' AND '.join(where), params)
+
+def database_path(path, engine):
+    """ Esta função tem o objetivo de retornar o caminho do banco de uma versão dos dados.
+
+        Para o CSV de origem, o banco fica na pasta dos snapshots; para o armazenamento incremental, na própria pasta.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - engine (str): 'duckdb' ou 'sqlite'
+        Output: str
+    """
+    folder = path if os.path.isdir(path) else os.path.dirname(snapshot_path(path))
+    return os.path.join(folder, f'{data_version(path)}_d{DATABASE_VERSION}.{engine}')
+
+def _source_dataset(path):
+    """ Esta função tem a responsabilidade de abrir os dados limpos (snapshot ou partes do armazenamento) como dataset Arrow, sem lê-los.
+
+        Input: path (str)
+        Output: Dataset
+    """
+    if os.path.isdir(path):
+        files = store_parts(path)
+    else:
+        target = snapshot_path(path)
+        files = [target if os.path.exists(target) else write_snapshot(path)]
+
+    return ds.dataset(files, schema=widen_dictionaries(pq.read_schema(files[0])), format='parquet')
+
+def _sqlite_type(arrow_type):
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return 'INTEGER'
+    if pa.types.is_floating(arrow_type):
+        return 'REAL'
+    return 'TEXT'
+
+def _load_sqlite(connection, dataset):
+    """ Esta função tem a responsabilidade de criar a tabela no SQLite e inseri-la em blocos de BATCH_SIZE linhas.
+
+        As datas são gravadas como texto ISO ('YYYY-MM-DD HH:MM:SS'), que compara na mesma ordem das datas.
+
+        Input:
+        - connection (Connection)
+        - dataset (Dataset)
+        Output: None
+    """
+    schema = dataset.schema
+    columns = ', '.join(f'{_quote(field.name)} {_sqlite_type(field.type)}' for field in schema)
+    connection.execute(f'CREATE TABLE {TABLE} ({columns})')
+
+    insert = f'INSERT INTO {TABLE} VALUES ({", ".join("?" * len(schema))})'
+    for batch in dataset.to_batches(batch_size=BATCH_SIZE):
+        values = [pc.strftime(column, format='%Y-%m-%d %H:%M:%S') if pa.types.is_timestamp(column.type) else column
+                  for column in batch.columns]
+        connection.executemany(insert, zip(*(column.to_pylist() for column in values)))
+
+def build_database(path, engine=None):
+    """ Esta função tem o objetivo de gravar os dados limpos em um banco embutido, com índices nas colunas dos filtros.
+
+        Os dados são copiados do snapshot Parquet (ou das partes do armazenamento incremental) em blocos, sem
+        carregá-los inteiros em memória. O banco é gravado de forma atômica e bancos de versões anteriores são removidos.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - engine (str): 'duckdb' ou 'sqlite'. Se não informado, é usado default_engine()
+        Output: str (caminho do banco)
+    """
+    engine = engine or default_engine()
+    target = database_path(path, engine)
+    tmp = target + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    dataset = _source_dataset(path)
+    indexes = [f'CREATE INDEX {TABLE}_{column.lower()} ON {TABLE} ({_quote(column)})' for column in INDEXED_COLUMNS]
+
+    if engine == 'duckdb':
+        import duckdb
+        connection = duckdb.connect(tmp)
+        connection.register('source', dataset)
+        connection.execute(f'CREATE TABLE {TABLE} AS SELECT * FROM source ORDER BY "Order_Date"')
+        for index in indexes:
+            connection.execute(index)
+        connection.close()
+    else:
+        connection = sqlite3.connect(tmp)
+        _load_sqlite(connection, dataset)
+        for index in indexes:
+            connection.execute(index)
+        connection.execute('ANALYZE')
+        connection.commit()
+        connection.close()
+
+    os.replace(tmp, target)
+
+    # Remove bancos de versões anteriores dos mesmos dados: a pasta do armazenamento só tem os seus bancos, e na pasta
+    # dos snapshots o prefixo inclui o nome completo do CSV (outros CSVs da pasta têm bancos próprios)
+    folder, name = os.path.split(target)
+    prefix = 'store_v' if os.path.isdir(path) else f'{os.path.splitext(os.path.basename(path))[0]}_v{SNAPSHOT_VERSION}_'
+    for file in os.listdir(folder):
+        if file.startswith(prefix) and file.endswith(f'.{engine}') and file != name:
+            os.remove(os.path.join(folder, file))
+
+    return target
+
+@cache_resource
+def _open_database(path, version, engine):
+    """ Esta função tem a responsabilidade de abrir o banco uma única vez por versão dos dados, construindo-o se necessário.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - version (str): Identificador da versão dos dados (faz parte da chave do cache)
+        - engine (str): 'duckdb' ou 'sqlite'
+        Output: SQLBackend
+    """
+    database = database_path(path, engine)
+    if not os.path.exists(database):
+        database = build_database(path, engine)
+    return SQLBackend(database, engine)
+
+def load_backend(path, name=None):
+    """ Esta função tem o objetivo de retornar o backend das consultas das páginas, compartilhado por todas as sessões.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - name (str): 'pandas', 'sql', 'duckdb' ou 'sqlite'. Se não informado, é lido de BACKEND_ENV (padrão 'pandas')
+        Output: PandasBackend ou SQLBackend
+    """
+    name = name or os.environ.get(BACKEND_ENV, 'pandas')
+    if name == 'pandas':
+        return PandasBackend(load_filter_index(path))
+    if name not in ('sql', 'duckdb', 'sqlite'):
+        raise ValueError(f'Backend desconhecido: {name}')
+
+    engine = default_engine() if name == 'sql' else name
+    return _open_database(path, data_version(path), engine)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grava os dados limpos em um banco embutido (DuckDB ou SQLite) para o backend SQL das páginas.')
+    parser.add_argument('--path', default=None, help='CSV de origem ou pasta do armazenamento (padrão: a mesma origem das páginas)')
+    parser.add_argument('--engine', choices=['duckdb', 'sqlite'], default=None, help='Padrão: DuckDB se instalado, senão SQLite')
+    args = parser.parse_args()
+
+    print(build_database(args.path or dataset_path(), args.engine))
@@ -0,0 +1,42 @@
+import functools
+import sys
+import threading
+
+def cache_resource(func):
+    """ Esta função tem o objetivo de memorizar o retorno de uma função, compartilhado por todas as chamadas do processo.
+
+        Dentro do Streamlit (que já foi importado pela página ou pelo servidor) é usado st.cache_resource;
+        fora dele (scripts, exportações, benchmarks) é usado functools.lru_cache, sem importar o Streamlit.
+        Nos dois casos a função original continua acessível em __wrapped__.
+
+        Input: func (callable)
+        Output: callable
+    """
+    if 'streamlit' in sys.modules:
+        import streamlit as st
+        return st.cache_resource(func)
+    return functools.lru_cache(maxsize=None)(func)
+
+def script_context(func):
+    """ Esta função tem o objetivo de preparar uma função para ser executada em outra thread com o contexto da execução atual do Streamlit.
+
+        Dentro do Streamlit, a thread que executar a função recebe o ScriptRunContext da sessão que a preparou
+        (add_script_run_ctx): st.cache_resource e st.session_state funcionam nela como na página, sem os avisos de
+        contexto ausente. Fora dele (ou sem sessão), a função é retornada sem alteração.
+
+        Input: func (callable)
+        Output: callable
+    """
+    if 'streamlit' not in sys.modules:
+        return func
+
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+    return wrapper
@@ -1,18 +1,76 @@
-import streamlit as st
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.ipc as ipc
+from utils.caching import cache_resource
+from utils.downsampling import downsample as downsample_series
+from utils.profiling import profiled
+from utils.quantiles import build_digests
+from utils.rollup import build_cube
+from utils.schema import COMPACT_SCHEMA, compact_dtypes, sort_categories, widen_dictionaries
+from utils.sketches import build_distinct_sketches
+
+# Arquivo CSV de origem e pasta do armazenamento incremental (ver utils.ingestion)
+DATA_PATH = 'datasets/train.csv'
+STORE_DIR = 'datasets/store'
+
+# Versão do formato do snapshot limpo (e dos artefatos gravados ao lado dele, como o cubo).
+# Deve ser incrementada sempre que clean_data ou o formato desses artefatos mudar.
+SNAPSHOT_VERSION = 7
+
+# Colunas em que o valor 'NaN ' descarta a linha (ver clean_data), na ordem usada para o motivo da quarentena
+REQUIRED_COLUMNS = ['Delivery_person_Age', 'multiple_deliveries', 'Road_traffic_density', 'City', 'Festival']
+
+# Colunas de texto sem os espaços das pontas (ver clean_data)
+STRIPPED_COLUMNS = ['ID', 'Delivery_person_ID', 'Road_traffic_density', 'Type_of_order', 'Type_of_vehicle', 'Festival', 'City']
+
+# Tipos convertidos pelo leitor de CSV do pyarrow (ver read_clean_csv). As demais colunas são lidas como texto
+CSV_TYPES = {
+    'Delivery_person_Age': pa.int64(),
+    'Delivery_person_Ratings': pa.float64(),
+    'Restaurant_latitude': pa.float64(),
+    'Restaurant_longitude': pa.float64(),
+    'Delivery_location_latitude': pa.float64(),
+    'Delivery_location_longitude': pa.float64(),
+    'Order_Date': pa.timestamp('ns'),
+    'Vehicle_condition': pa.int64(),
+    'multiple_deliveries': pa.int64(),
+}
 
-@st.cache_data
+# Raio médio da Terra em km (mesmo valor utilizado pelo pacote haversine)
+EARTH_RADIUS_KM = 6371.0088
+
+# Quantidade máxima de pontos enviados ao navegador nas séries temporais das páginas
+MAX_CHART_POINTS = 500
+
+# Cache LRU das figuras do Plotly, compartilhado entre sessões (ver chart)
+FIGURE_CACHE_SIZE = 128
+_figure_cache = OrderedDict()
+_figure_lock = threading.Lock()
+
+@cache_resource
 def load_data(path):
     """Esta função tem o objetivo de carregar os dados e armazená-los em um dataframe.
 
+        O DataFrame é compartilhado entre sessões (sem cópia por chamada) e não deve ser modificado;
+        clean_data trabalha sobre uma cópia.
+
         Input: path (str)
         Output: DataFrame
     """
     df = pd.read_csv(path)
     return df
 
-def clean_data(df):
+@profiled()
+def clean_data(df, compact=True):
     """ Esta função tem a responsabilidade de limpar o dataframe
 
         Limpezas realizadas:
@@ -21,8 +79,12 @@ def clean_data(df):
         3. Remoção dos espaços das variáveis de texto
         4. Formatação da coluna de datas
         5. Limpeza da coluna de tempo (remoção da variável numérica)
+        6. Criação da coluna de distância entre restaurante e local de entrega
+        7. Conversão para o esquema compacto de tipos (ver utils.schema)
 
-        Input: df (DataFrame)
+        Input:
+        - df (DataFrame): DataFrame com os dados brutos
+        - compact (bool): Flag que indica se o esquema compacto de tipos deve ser aplicado
         Output: DataFrame
     """
     # Cópia do df informado
@@ -55,9 +117,149 @@ def clean_data(df):
     # Criando nova coluna 'week_of_year'
     df1['week_of_year'] = df1['Order_Date'].dt.strftime('%U')
 
+    # Criando nova coluna 'distance'
+    df1['distance'] = haversine_distance(df1['Restaurant_latitude'], df1['Restaurant_longitude'],
+                                         df1['Delivery_location_latitude'], df1['Delivery_location_longitude'])
+
+    # Convertendo para o esquema compacto
+    if compact:
+        df1 = compact_dtypes(df1)
+
     return df1
 
-def chart(df, cols, labels=None, size=None, color=None, cc_scale=None, cc_midpoint=None, type='bar'):
+def csv_convert_options(columns):
+    """ Esta função tem o objetivo de retornar as opções do leitor de CSV do pyarrow usadas na limpeza (ver clean_csv_table).
+
+        Input: columns (list) -> Nomes das colunas do CSV
+        Output: ConvertOptions
+    """
+    types = {col: CSV_TYPES.get(col, pa.string()) for col in columns}
+    return pv.ConvertOptions(column_types=types, null_values=['NaN '], strings_can_be_null=False, timestamp_parsers=['%d-%m-%Y'])
+
+@profiled()
+def read_clean_csv(path):
+    """ Esta função tem o objetivo de ler e limpar o CSV durante a leitura, com o leitor multithread do pyarrow.
+
+        O resultado é igual ao de clean_data(pd.read_csv(path)) (no esquema compacto), sem passar todas as colunas
+        por texto (object):
+        1. Os tipos, o valor nulo 'NaN ' das colunas numéricas e o formato das datas são aplicados pelo leitor
+        2. As colunas de texto continuam no Arrow, onde são removidos os espaços e o prefixo '(min) '
+        3. As linhas descartadas vão para a quarentena, com o motivo (primeira coluna de REQUIRED_COLUMNS nula)
+
+        Os números são arredondados corretamente pelo pyarrow. O leitor padrão do pandas pode diferir no último bit
+        em números com 15 ou mais algarismos significativos (as coordenadas do train.csv têm 6 casas decimais).
+        Todas as cargas do CSV (em blocos, read_clean_csv_chunks, e em paralelo, utils.parallel) usam o mesmo leitor.
+
+        Input: path (str) -> Caminho do CSV
+        Output: tuple (DataFrame limpo, DataFrame da quarentena com as colunas 'index', 'reason' e as colunas lidas)
+    """
+    convert_options = csv_convert_options(pd.read_csv(path, nrows=0).columns)
+    table = pv.read_csv(path, read_options=pv.ReadOptions(use_threads=True), convert_options=convert_options)
+    return clean_csv_table(table)
+
+def read_clean_csv_chunks(path, chunksize):
+    """ Esta função tem o objetivo de ler e limpar um CSV em blocos, com o leitor em fluxo do pyarrow (ver read_clean_csv).
+
+        Só um bloco fica em memória por vez. A coluna 'index' segue a numeração das linhas do arquivo inteiro, então
+        os blocos concatenados são iguais ao resultado de read_clean_csv (a menos da ordem das categorias).
+
+        Input:
+        - path (str): Caminho do CSV
+        - chunksize (int): Quantidade mínima de linhas por bloco (o leitor entrega as linhas em lotes)
+        Output: gerador de tuplas (DataFrame limpo, DataFrame da quarentena, quantidade de linhas lidas), com ao menos um bloco
+    """
+    convert_options = csv_convert_options(pd.read_csv(path, nrows=0).columns)
+    offset, batches, n_rows = 0, [], 0
+    with pv.open_csv(path, convert_options=convert_options) as reader:
+        for batch in reader:
+            batches.append(batch)
+            n_rows += batch.num_rows
+            if n_rows >= chunksize:
+                yield clean_csv_table(pa.Table.from_batches(batches), offset) + (n_rows,)
+                offset, batches, n_rows = offset + n_rows, [], 0
+
+        # Último bloco (ou um bloco vazio, se o CSV não tiver linhas)
+        if batches or offset == 0:
+            yield clean_csv_table(pa.Table.from_batches(batches, schema=reader.schema), offset) + (n_rows,)
+
+def clean_csv_table(table, offset=0):
+    """ Esta função tem o objetivo de limpar as linhas de um CSV já lidas pelo pyarrow com csv_convert_options (ver read_clean_csv).
+
+        Input:
+        - table (Table): Linhas lidas
+        - offset (int): Número da primeira linha no arquivo (coluna 'index')
+        Output: tuple (DataFrame limpo, DataFrame da quarentena)
+    """
+    # 'NaN ' vira nulo nas colunas numéricas; nas de texto continua como valor e é comparado aqui
+    reason = pa.nulls(table.num_rows, pa.string())
+    for col in reversed(REQUIRED_COLUMNS):
+        missing = pc.is_null(table[col]) if col in CSV_TYPES else pc.equal(table[col], 'NaN ')
+        reason = pc.if_else(missing, f'{col} nulo', reason)
+    rejected = pc.is_valid(reason)
+
+    table = table.add_column(0, 'index', pa.array(np.arange(offset, offset + table.num_rows)))
+    df_rejected = table.filter(rejected).add_column(1, 'reason', reason.filter(rejected)).to_pandas()
+    table = table.filter(pc.invert(rejected))
+
+    for col in STRIPPED_COLUMNS:
+        table = table.set_column(table.schema.get_field_index(col), col, pc.utf8_trim_whitespace(table[col]))
+    time_taken = pc.cast(pc.replace_substring(table['Time_taken(min)'], '(min) ', ''), pa.int64())
+    table = table.set_column(table.schema.get_field_index('Time_taken(min)'), 'Time_taken(min)', time_taken)
+
+    # Textos categóricos do esquema compacto chegam ao pandas já codificados (sem passar por object)
+    for col in table.column_names:
+        if COMPACT_SCHEMA.get(col) == 'category' and pa.types.is_string(table.schema.field(col).type):
+            table = table.set_column(table.schema.get_field_index(col), col, pc.dictionary_encode(table[col]))
+
+    df1 = table.to_pandas()
+
+    # Semana do ano formatada só uma vez por data
+    codes, dates = pd.factorize(df1['Order_Date'])
+    df1['week_of_year'] = np.asarray(pd.DatetimeIndex(dates).strftime('%U'), dtype=object)[codes]
+
+    df1['distance'] = haversine_distance(df1['Restaurant_latitude'], df1['Restaurant_longitude'],
+                                         df1['Delivery_location_latitude'], df1['Delivery_location_longitude'])
+
+    return sort_categories(compact_dtypes(df1)), df_rejected
+
+def quarantine_report(df_rejected):
+    """ Esta função tem o objetivo de contar as linhas da quarentena por motivo.
+
+        Input: df_rejected (DataFrame) -> Quarentena (saída de read_clean_csv)
+        Output: DataFrame com as colunas 'reason' e 'count', do motivo mais frequente para o menos frequente
+    """
+    return df_rejected['reason'].value_counts().rename_axis('reason').reset_index(name='count')
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """ Esta função tem o objetivo de calcular, de forma vetorizada, a distância em km entre pares de coordenadas.
+
+        Os resultados são equivalentes aos do pacote haversine, mas calculados de uma só vez com NumPy.
+
+        Input:
+        - lat1, lon1 (array-like): Latitudes e longitudes de origem, em graus
+        - lat2, lon2 (array-like): Latitudes e longitudes de destino, em graus
+        Output: ndarray
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+
+    d = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(d))
+
+def figure_key(df, *args):
+    """ Esta função tem o objetivo de calcular uma chave barata para o conteúdo de uma tabela agregada e os argumentos do gráfico.
+
+        Input:
+        - df (DataFrame): Tabela agregada
+        - args: Demais argumentos do gráfico
+        Output: str
+    """
+    sha = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    sha.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes], args)).encode())
+    return sha.hexdigest()
+
+@profiled()
+def chart(df, cols, labels=None, size=None, color=None, cc_scale=None, cc_midpoint=None, type='bar', max_points=None, downsample='lttb'):
     """ Esta função tem o objetivo de criar gráficos simples do Plotly. Não inclui gráficos do módulo graph_objects.
 
         Tipos de gráficos:
@@ -77,8 +279,26 @@ def chart(df, cols, labels=None, size=None, color=None, cc_scale=None, cc_midpoi
         - cc_scale (str): Define o tipo de escala contínua de cores em gráficos suportados
         - cc_midpoint(str): Define o ponto do meio para cores contínuas em gráficos suportados
         - type (str): Define o tipo. Tipos suportados: 'bar', 'pie', 'scatter', 'line', e 'sb'
+        - max_points (int): Quantidade máxima de pontos em gráficos de barras e de linha (padrão: sem limite).
+        Séries mais longas são reduzidas com utils.downsampling antes de desenhar
+        - downsample (str): Método de redução das séries longas: 'lttb' ou 'minmax'
         Output: Figure
+
+        As figuras são memorizadas em um cache LRU com chave no conteúdo de df e nos argumentos,
+        e são compartilhadas entre sessões: não devem ser modificadas.
     """
+    key = figure_key(df, cols, labels, size, color, cc_scale, cc_midpoint, type, max_points, downsample)
+    with _figure_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+
+    # Importado só ao desenhar: o restante do módulo é usado sem o Plotly (ex.: utils.analytics)
+    import plotly.express as px
+
+    if max_points is not None and type in ('bar', 'line'):
+        df = downsample_series(df, cols[0], cols[1], max_points, downsample)
+
     if type == 'bar':
         fig = px.bar(df, x=cols[0], y=cols[1], labels=labels)
     elif type == 'pie':
@@ -86,7 +306,408 @@ def chart(df, cols, labels=None, size=None, color=None, cc_scale=None, cc_midpoi
     elif type == 'scatter':
         fig = px.scatter(df, x=cols[0], y=cols[1], size=size, color=color, labels=labels)
     elif type == 'line':
-        fig = px.line(df, x=cols[0], y=cols[1], labels=labels)
+        fig = px.line(df, x=cols[0], y=cols[1], color=color, labels=labels)
     elif type == 'sb':
         fig = px.sunburst(df, path=cols[0:2], values=cols[2], color=color, color_continuous_scale=cc_scale, color_continuous_midpoint=cc_midpoint)        
-    return fig
\ No newline at end of file
+
+    with _figure_lock:
+        _figure_cache[key] = fig
+        if len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+
+    return fig
+
+def source_fingerprint(path):
+    """ Esta função tem o objetivo de identificar o conteúdo do arquivo CSV de origem.
+
+        O hash SHA-256 só é recalculado quando o mtime ou o tamanho do arquivo mudam;
+        caso contrário, é reaproveitado o valor registrado em um arquivo auxiliar (.json).
+
+        Input: path (str)
+        Output: str
+    """
+    stat = os.stat(path)
+    snapshot_dir = os.path.join(os.path.dirname(path), '.snapshots')
+    meta_path = os.path.join(snapshot_dir, os.path.basename(path) + '.json')
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return meta['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+
+    meta = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha.hexdigest()}
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    return meta['sha256']
+
+def snapshot_path(path):
+    """ Esta função tem o objetivo de retornar o caminho do snapshot limpo (Parquet) de um arquivo CSV.
+
+        Input: path (str)
+        Output: str
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = source_fingerprint(path)[:16]
+    return os.path.join(os.path.dirname(path), '.snapshots', f'{name}_v{SNAPSHOT_VERSION}_{key}.parquet')
+
+def cube_snapshot_path(target):
+    """ Esta função tem o objetivo de retornar o caminho do cubo (ver utils.rollup) gravado ao lado de um snapshot.
+
+        Input: target (str) -> Caminho do snapshot
+        Output: str
+    """
+    return target.replace('.parquet', '_cube.parquet')
+
+def sketches_snapshot_path(target):
+    """ Esta função tem o objetivo de retornar o caminho dos sketches de entregadores (ver utils.sketches) gravados ao lado de um snapshot.
+
+        Input: target (str) -> Caminho do snapshot
+        Output: str
+    """
+    return target.replace('.parquet', '_couriers.parquet')
+
+def digests_snapshot_path(target):
+    """ Esta função tem o objetivo de retornar o caminho dos sketches de quantis (ver utils.quantiles) gravados ao lado de um snapshot.
+
+        Input: target (str) -> Caminho do snapshot
+        Output: str
+    """
+    return target.replace('.parquet', '_digests.parquet')
+
+def rejected_snapshot_path(target):
+    """ Esta função tem o objetivo de retornar o caminho da quarentena (linhas descartadas, ver read_clean_csv) gravada ao lado de um snapshot.
+
+        Input: target (str) -> Caminho do snapshot
+        Output: str
+    """
+    return target.replace('.parquet', '_rejected.parquet')
+
+def arrow_snapshot_path(target):
+    """ Esta função tem o objetivo de retornar o caminho da cópia Arrow (mapeada em memória, ver map_snapshot) de um snapshot.
+
+        Input: target (str) -> Caminho do snapshot
+        Output: str
+    """
+    return target.replace('.parquet', '.arrow')
+
+def _write_arrow(df, target):
+    """ Esta função tem a responsabilidade de gravar um DataFrame em um arquivo Arrow IPC sem compressão, de forma atômica.
+
+        Sem compressão, as colunas podem ser usadas diretamente do arquivo mapeado em memória.
+
+        Input:
+        - df (DataFrame): DataFrame a ser gravado
+        - target (str): Caminho do arquivo
+        Output: None
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = target + '.tmp'
+    with ipc.new_file(tmp, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, target)
+
+def _remove_files(folder, prefix, suffixes, keep):
+    """ Esta função tem a responsabilidade de remover arquivos de versões anteriores (mesmo prefixo) de uma pasta.
+
+        Arquivos ainda mapeados em memória por outro processo não podem ser removidos no Windows e são mantidos.
+
+        Input:
+        - folder (str): Pasta
+        - prefix (str): Prefixo dos arquivos
+        - suffixes (tuple): Extensões dos arquivos
+        - keep (str): Prefixo dos arquivos da versão atual, que são mantidos. Se None, todos são removidos
+        Output: None
+    """
+    for file in os.listdir(folder):
+        if file.startswith(prefix) and file.endswith(suffixes) and (keep is None or not file.startswith(keep)):
+            try:
+                os.remove(os.path.join(folder, file))
+            except OSError:
+                pass
+
+def _write_parquet(df, target):
+    """ Esta função tem a responsabilidade de gravar um DataFrame em Parquet de forma atômica.
+
+        Evita que outra sessão leia um arquivo incompleto.
+
+        Input:
+        - df (DataFrame): DataFrame a ser gravado
+        - target (str): Caminho do arquivo
+        Output: None
+    """
+    tmp = target + '.tmp'
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+
+def write_snapshot(path, df1=None, cube=None, df_rejected=None):
+    """ Esta função tem o objetivo de limpar o arquivo CSV e gravar o resultado em um snapshot Parquet.
+
+        As linhas são gravadas em ordem de Order_Date, para que o FilterIndex use os dados sem reordená-los (e sem copiá-los).
+        Além do Parquet, é gravada uma cópia Arrow para o mapeamento em memória (ver map_snapshot).
+        Quando o CSV é lido aqui (read_clean_csv), as linhas descartadas são gravadas na quarentena (rejected_snapshot_path).
+        Snapshots antigos do mesmo arquivo são removidos após a gravação.
+
+        Input:
+        - path (str): Caminho do CSV
+        - df1 (DataFrame): Dados já limpos (ex.: por utils.parallel). Se não informado, o CSV é lido e limpo aqui
+        - cube (DataFrame): Cubo já construído, gravado junto com o snapshot (opcional)
+        - df_rejected (DataFrame): Quarentena das linhas de df1 (opcional, ex.: por utils.parallel)
+        Output: str (caminho do snapshot)
+    """
+    target = snapshot_path(path)
+    if df1 is None:
+        df1, df_rejected = read_clean_csv(path)
+    if df_rejected is not None:
+        _write_parquet(df_rejected, rejected_snapshot_path(target))
+    df1 = df1.sort_values('Order_Date', kind='stable').reset_index(drop=True)
+
+    _write_parquet(df1, target)
+    _write_arrow(df1, arrow_snapshot_path(target))
+    if cube is not None:
+        _write_parquet(cube, cube_snapshot_path(target))
+
+    # Remove snapshots (e artefatos derivados, como o cubo) de versões anteriores do CSV
+    prefix = os.path.splitext(os.path.basename(path))[0] + '_v'
+    stem = os.path.splitext(os.path.basename(target))[0]
+    _remove_files(os.path.dirname(target), prefix, ('.parquet', '.arrow'), stem)
+
+    return target
+
+@cache_resource
+def read_snapshot(snapshot):
+    """ Esta função tem o objetivo de carregar um arquivo Parquet pequeno (cubo, sketches), compartilhado entre sessões.
+
+        O DataFrame não é copiado a cada chamada e não deve ser modificado.
+
+        Input: snapshot (str)
+        Output: DataFrame
+    """
+    return pd.read_parquet(snapshot)
+
+@cache_resource
+def map_snapshot(file):
+    """ Esta função tem o objetivo de abrir os dados limpos de um arquivo Arrow mapeado em memória, uma única vez por processo.
+
+        As colunas numéricas, de datas e os códigos das categorias apontam diretamente para o arquivo mapeado:
+        não há cópia por sessão nem desserialização a cada interação, e as páginas do arquivo ficam no cache
+        do sistema operacional, compartilhadas até entre processos. Os arrays são somente leitura.
+
+        Input: file (str) -> Arquivo Arrow (ver arrow_snapshot_path)
+        Output: DataFrame
+    """
+    table = ipc.open_file(pa.memory_map(file)).read_all()
+    # Um bloco por coluna: sem a consolidação de colunas do mesmo tipo, que copiaria os dados
+    return table.to_pandas(split_blocks=True)
+
+def dataset_path():
+    """ Esta função tem o objetivo de retornar a origem dos dados das páginas.
+
+        Se o armazenamento incremental já foi criado (ver utils.ingestion), ele é utilizado;
+        caso contrário, é utilizado o CSV de origem.
+
+        Input: None
+        Output: str
+    """
+    if os.path.exists(os.path.join(STORE_DIR, 'state.json')):
+        return STORE_DIR
+    return DATA_PATH
+
+def store_version(store_dir):
+    """ Esta função tem o objetivo de retornar a versão atual do armazenamento incremental.
+
+        Input: store_dir (str)
+        Output: int
+    """
+    with open(os.path.join(store_dir, 'state.json')) as f:
+        return json.load(f)['version']
+
+def data_version(path):
+    """ Esta função tem o objetivo de identificar a versão dos dados usada como chave de caches e artefatos.
+
+        Para o CSV de origem, é o nome do snapshot (versão do formato + hash do CSV);
+        para o armazenamento incremental, é a sua versão.
+
+        Input: path (str)
+        Output: str
+    """
+    if os.path.isdir(path):
+        return f'store_v{store_version(path)}'
+    return os.path.splitext(os.path.basename(snapshot_path(path)))[0]
+
+def store_artifact(store_dir, artifact, state=None):
+    """ Esta função tem o objetivo de retornar o caminho do arquivo atual de um agregado do armazenamento incremental.
+
+        Os agregados são gravados com nomes versionados e o state.json aponta para os atuais, de modo que todos
+        mudam de uma vez na gravação do estado (ver utils.ingestion). Armazenamentos antigos usam o nome fixo.
+
+        Input:
+        - store_dir (str): Pasta do armazenamento
+        - artifact (str): Nome do agregado (ex.: 'cube.parquet')
+        - state (dict): Estado do armazenamento. Se não informado, é lido de state.json
+        Output: str
+    """
+    if state is None:
+        with open(os.path.join(store_dir, 'state.json')) as f:
+            state = json.load(f)
+    return os.path.join(store_dir, state.get('aggregates', {}).get(artifact, artifact))
+
+@cache_resource
+def read_store(store_dir, version, artifact):
+    """ Esta função tem o objetivo de carregar um agregado do armazenamento incremental, compartilhado entre sessões.
+
+        A versão faz parte da chave do cache, de modo que uma nova ingestão invalida o resultado anterior.
+        O DataFrame não é copiado a cada chamada e não deve ser modificado.
+
+        Input:
+        - store_dir (str): Pasta do armazenamento
+        - version (int): Versão do armazenamento
+        - artifact (str): 'cube.parquet' para o cubo, 'couriers.parquet' para os sketches de entregadores
+        ou 'digests.parquet' para os sketches de quantis
+        Output: DataFrame
+    """
+    return pd.read_parquet(store_artifact(store_dir, artifact))
+
+def store_parts(store_dir):
+    """ Esta função tem o objetivo de listar as partes de dados limpos registradas no estado do armazenamento incremental.
+
+        Partes gravadas por ingestões que falharam antes de gravar o estado não estão no estado e são ignoradas
+        (os agregados também não as incluem).
+
+        Input: store_dir (str)
+        Output: list (caminhos dos arquivos)
+    """
+    with open(os.path.join(store_dir, 'state.json')) as f:
+        return [os.path.join(store_dir, 'parts', part) for part in json.load(f)['parts']]
+
+@cache_resource
+def map_store(store_dir, version):
+    """ Esta função tem o objetivo de abrir os dados limpos do armazenamento incremental, em ordem de Order_Date, uma única vez por versão.
+
+        Cada parte tem uma cópia Arrow ao lado do Parquet, gravada uma única vez na primeira leitura depois da sua
+        ingestão: uma nova versão só grava as cópias das partes novas, sem reescrever o histórico. As cópias são
+        mapeadas em memória e juntadas sem decodificar Parquet; o DataFrame não deve ser modificado.
+
+        Input:
+        - store_dir (str): Pasta do armazenamento
+        - version (int): Versão do armazenamento (faz parte da chave do cache)
+        Output: DataFrame
+    """
+    tables = []
+    for file in store_parts(store_dir):
+        arrow_file = os.path.splitext(file)[0] + '.arrow'
+        if not os.path.exists(arrow_file):
+            _write_arrow(pd.read_parquet(file), arrow_file)
+        table = ipc.open_file(pa.memory_map(arrow_file)).read_all()
+        # As partes podem ter índices de categorias de larguras diferentes (ver widen_dictionaries)
+        tables.append(table.cast(widen_dictionaries(table.schema)))
+
+    df = pa.concat_tables(tables).unify_dictionaries().to_pandas()
+    return sort_categories(df).sort_values('Order_Date', kind='stable').reset_index(drop=True)
+
+def load_clean_data(path):
+    """ Esta função tem o objetivo de carregar os dados já limpos a partir do snapshot.
+
+        O snapshot é identificado pelo mtime e pelo hash do CSV de origem; se ele não existir,
+        o CSV é lido e limpo uma única vez e o resultado é gravado em disco.
+        Os dados são lidos da cópia Arrow mapeada em memória (ver map_snapshot). Se path for a pasta do armazenamento
+        incremental, as cópias Arrow das partes são juntadas uma única vez por versão (ver map_store).
+        Todas as sessões e páginas compartilham o mesmo DataFrame, que não deve ser modificado.
+
+        Input: path (str)
+        Output: DataFrame
+    """
+    if os.path.isdir(path):
+        # Cópias de todo o histórico gravadas por versões anteriores (uma por versão do armazenamento)
+        _remove_files(path, 'clean_v', ('.arrow',), None)
+        return map_store(path, store_version(path))
+
+    target = snapshot_path(path)
+    if not os.path.exists(target):
+        target = write_snapshot(path)
+
+    arrow_path = arrow_snapshot_path(target)
+    if not os.path.exists(arrow_path):
+        _write_arrow(pd.read_parquet(target), arrow_path)
+
+    return map_snapshot(arrow_path)
+
+def load_cube(path):
+    """ Esta função tem o objetivo de carregar o cubo de agregados parciais (ver utils.rollup) dos dados limpos.
+
+        O cubo é construído uma única vez por snapshot e gravado ao lado dele em Parquet.
+
+        Input: path (str)
+        Output: DataFrame
+    """
+    if os.path.isdir(path):
+        return read_store(path, store_version(path), 'cube.parquet')
+
+    target = snapshot_path(path)
+    if not os.path.exists(target):
+        target = write_snapshot(path)
+
+    cube_path = cube_snapshot_path(target)
+    if not os.path.exists(cube_path):
+        _write_parquet(build_cube(load_clean_data(path)), cube_path)
+
+    return read_snapshot(cube_path)
+
+def load_courier_sketches(path):
+    """ Esta função tem o objetivo de carregar os sketches de entregadores distintos (ver utils.sketches) dos dados limpos.
+
+        Há um sketch por dia, cidade e densidade de tráfego; eles podem ser filtrados como o cubo (filter_cube)
+        e combinados com utils.sketches.distinct_count. São construídos uma única vez por snapshot.
+
+        Input: path (str)
+        Output: DataFrame
+    """
+    if os.path.isdir(path):
+        # Armazenamentos criados antes dos sketches: constrói a partir das partes uma única vez
+        if not os.path.exists(store_artifact(path, 'couriers.parquet')):
+            _write_parquet(build_distinct_sketches(load_clean_data(path)), os.path.join(path, 'couriers.parquet'))
+        return read_store(path, store_version(path), 'couriers.parquet')
+
+    target = snapshot_path(path)
+    if not os.path.exists(target):
+        target = write_snapshot(path)
+
+    sketches_path = sketches_snapshot_path(target)
+    if not os.path.exists(sketches_path):
+        _write_parquet(build_distinct_sketches(load_clean_data(path)), sketches_path)
+
+    return read_snapshot(sketches_path)
+
+def load_digests(path):
+    """ Esta função tem o objetivo de carregar os sketches de quantis (t-digests, ver utils.quantiles) dos dados limpos.
+
+        Há um t-digest por dia, cidade, densidade de tráfego, festival e medida; eles podem ser filtrados como
+        o cubo (filter_cube) e combinados com utils.quantiles.quantiles. São construídos uma única vez por snapshot.
+
+        Input: path (str)
+        Output: DataFrame
+    """
+    if os.path.isdir(path):
+        # Armazenamentos criados antes dos sketches: constrói a partir das partes uma única vez
+        if not os.path.exists(store_artifact(path, 'digests.parquet')):
+            _write_parquet(build_digests(load_clean_data(path)), os.path.join(path, 'digests.parquet'))
+        return read_store(path, store_version(path), 'digests.parquet')
+
+    target = snapshot_path(path)
+    if not os.path.exists(target):
+        target = write_snapshot(path)
+
+    digests_path = digests_snapshot_path(target)
+    if not os.path.exists(digests_path):
+        _write_parquet(build_digests(load_clean_data(path)), digests_path)
+
+    return read_snapshot(digests_path)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+def _as_float(values):
+    """ Esta função tem a responsabilidade de converter o eixo x (números ou datas) em float, para o cálculo das áreas do LTTB.
+
+        Input: values (Series)
+        Output: ndarray (float)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    return values.to_numpy(dtype=float)
+
+def lttb_indices(x, y, n_out):
+    """ Esta função tem o objetivo de escolher n_out pontos de uma série com o algoritmo Largest-Triangle-Three-Buckets (LTTB).
+
+        O primeiro e o último ponto são mantidos. Os pontos internos são divididos em n_out - 2 faixas e, em cada faixa,
+        é escolhido o ponto que forma o maior triângulo com o ponto escolhido na faixa anterior e a média da faixa seguinte.
+        Preserva o formato visual da série (picos e vales) com muito menos pontos.
+
+        Input:
+        - x (ndarray): Eixo x em ordem crescente (float)
+        - y (ndarray): Valores (float)
+        - n_out (int): Quantidade de pontos de saída (mínimo 3)
+        Output: ndarray (posições dos pontos escolhidos, em ordem crescente)
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < n_out - 1:
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+
+    return indices
+
+def minmax_indices(y, n_out):
+    """ Esta função tem o objetivo de escolher até n_out pontos de uma série mantendo o mínimo e o máximo de cada faixa.
+
+        A série é dividida em n_out // 2 faixas de tamanho igual. É mais barata que o LTTB e
+        garante que os extremos (picos) apareçam no gráfico.
+
+        Input:
+        - y (ndarray): Valores (float)
+        - n_out (int): Quantidade máxima de pontos de saída
+        Output: ndarray (posições dos pontos escolhidos, em ordem crescente)
+    """
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    buckets = np.arange(n) * n_buckets // n
+    positions = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([positions.idxmin().dropna().to_numpy(dtype=np.int64),
+                                     positions.idxmax().dropna().to_numpy(dtype=np.int64)]))
+
+def downsample(df, x_col, y_col, max_points, method='lttb'):
+    """ Esta função tem o objetivo de reduzir uma série temporal longa a no máximo max_points linhas antes de desenhá-la.
+
+        Séries com até max_points linhas são retornadas sem alteração.
+
+        Input:
+        - df (DataFrame): Série com uma linha por ponto
+        - x_col (str): Coluna do eixo x (ex.: 'Order_Date')
+        - y_col (str): Coluna dos valores
+        - max_points (int): Quantidade máxima de pontos
+        - method (str): 'lttb' ou 'minmax'
+        Output: DataFrame
+    """
+    if len(df) <= max_points:
+        return df
+
+    df_sorted = df.sort_values(x_col, kind='stable').reset_index(drop=True)
+    y = df_sorted[y_col].to_numpy(dtype=float)
+
+    if method == 'lttb':
+        indices = lttb_indices(_as_float(df_sorted[x_col]), y, max_points)
+    elif method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        raise ValueError(f'Método de redução desconhecido: {method}')
+
+    return df_sorted.iloc[indices].reset_index(drop=True)
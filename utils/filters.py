@@ -0,0 +1,183 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.caching import cache_resource
+from utils.data_manipulation import data_version, load_clean_data
+from utils.profiling import DEBUG_KEY
+from utils.spatial import AreaFilter, SpatialIndex
+
+class FilterIndex:
+    """ Esta classe tem o objetivo de aplicar os filtros da barra lateral (data limite e densidades de tráfego) sem varrer todas as linhas.
+
+        Os dados limpos são ordenados por Order_Date (os snapshots já são gravados nessa ordem e são usados sem cópia),
+        de modo que o corte de data é encontrado por busca binária e, sem filtro de tráfego, o resultado é uma fatia (view).
+        Para cada densidade de tráfego é pré-calculado um bitmap (array booleano) das linhas.
+        Os filtros geográficos (AreaFilter) usam um SpatialIndex, construído na primeira consulta com esses filtros.
+        Os resultados recentes são memorizados em um cache LRU com chave (data, conjunto de densidades, filtros geográficos).
+
+        Os DataFrames retornados são compartilhados entre sessões e páginas e não devem ser modificados.
+
+        Input:
+        - df (DataFrame): DataFrame limpo
+        - cache_size (int): Quantidade de resultados mantidos no cache LRU
+    """
+    def __init__(self, df, cache_size=32):
+        if not df['Order_Date'].is_monotonic_increasing:
+            df = df.sort_values('Order_Date', kind='stable').reset_index(drop=True)
+        self.data = df
+        self.dates = self.data['Order_Date'].to_numpy()
+        self.min_date = self.data['Order_Date'].min()
+        self.max_date = self.data['Order_Date'].max()
+
+        traffic = self.data['Road_traffic_density']
+        self.traffic_options = list(traffic.unique())
+        self.bitmaps = {option: (traffic == option).to_numpy() for option in self.traffic_options}
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._spatial = None
+        self._spatial_lock = threading.Lock()
+
+    @property
+    def spatial(self):
+        """ SpatialIndex das linhas, construído uma única vez na primeira consulta com filtros geográficos. """
+        with self._spatial_lock:
+            if self._spatial is None:
+                self._spatial = SpatialIndex(self.data)
+        return self._spatial
+
+    def _traffic_mask(self, options, rows):
+        """ Esta função tem a responsabilidade de combinar os bitmaps das densidades selecionadas nas linhas informadas.
+
+            Quando mais da metade das densidades está selecionada, combina o complemento (menos bitmaps).
+
+            Input:
+            - options (frozenset): Densidades selecionadas
+            - rows (slice ou ndarray): Linhas consideradas (as anteriores ao corte de data ou suas posições)
+            Output: ndarray (bool)
+        """
+        selected = [option for option in self.traffic_options if option in options]
+        others = [option for option in self.traffic_options if option not in options]
+        n_rows = rows.stop if isinstance(rows, slice) else len(rows)
+
+        if len(selected) <= len(others):
+            mask = np.zeros(n_rows, dtype=bool)
+            for option in selected:
+                mask |= self.bitmaps[option][rows]
+        else:
+            mask = np.ones(n_rows, dtype=bool)
+            for option in others:
+                mask &= ~self.bitmaps[option][rows]
+
+        return mask
+
+    def filter(self, date_limit, traffic_options, area=None):
+        """ Esta função tem o objetivo de retornar os pedidos anteriores à data limite com as densidades de tráfego selecionadas.
+
+            Input:
+            - date_limit (datetime): Data limite (exclusiva) dos pedidos
+            - traffic_options (list): Densidades de tráfego selecionadas
+            - area (AreaFilter): Filtros geográficos. Se não informado (ou inativo), não há filtro geográfico
+            Output: DataFrame
+        """
+        area = area or AreaFilter()
+        key = (np.datetime64(date_limit, 'ns'), frozenset(traffic_options), area.key())
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        # Equivalente a Order_Date < date_limit
+        n_rows = int(np.searchsorted(self.dates, key[0], side='left'))
+
+        all_traffic = all(option in key[1] for option in self.traffic_options)
+
+        if area.active:
+            # Posições (crescentes) dos filtros geográficos, cortadas na data limite
+            positions = self.spatial.query(area)
+            positions = positions[:np.searchsorted(positions, n_rows)]
+            if not all_traffic:
+                positions = positions[self._traffic_mask(key[1], positions)]
+            df_filtered = self.data.iloc[positions]
+        elif all_traffic:
+            df_filtered = self.data.iloc[:n_rows]
+        else:
+            df_filtered = self.data.iloc[np.flatnonzero(self._traffic_mask(key[1], slice(0, n_rows)))]
+
+        with self._lock:
+            self._cache[key] = df_filtered
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return df_filtered
+
+@cache_resource
+def _build_filter_index(path, version):
+    """ Esta função tem a responsabilidade de construir o FilterIndex uma única vez por versão dos dados.
+
+        Input:
+        - path (str): CSV de origem ou pasta do armazenamento incremental
+        - version (str): Identificador da versão dos dados (faz parte da chave do cache)
+        Output: FilterIndex
+    """
+    return FilterIndex(load_clean_data(path))
+
+def load_filter_index(path):
+    """ Esta função tem o objetivo de retornar o FilterIndex compartilhado por todas as páginas e sessões.
+
+        Input: path (str)
+        Output: FilterIndex
+    """
+    return _build_filter_index(path, data_version(path))
+
+def sidebar_filters(backend):
+    """ Esta função tem o objetivo de desenhar a barra lateral comum às páginas e retornar os filtros selecionados.
+
+        Input: backend (PandasBackend ou SQLBackend, ver utils.backends) -> Fornece as datas mínima e máxima, as densidades
+        e o restaurante mais próximo do ponto informado nos filtros geográficos
+        Output: tuple (data limite, lista de densidades de tráfego, AreaFilter)
+    """
+    import streamlit as st
+
+    st.sidebar.image('img/logo.png', width=120)
+    st.sidebar.markdown('# Curry Company')
+    st.sidebar.markdown('## Fastest delivery in town')
+    st.sidebar.markdown('---')
+
+    st.sidebar.markdown('## Selecione uma data limite')
+    date_slider = st.sidebar.slider('Até qual valor?', value=backend.max_date.to_pydatetime(),
+                                                       min_value=backend.min_date.to_pydatetime(),
+                                                       max_value=backend.max_date.to_pydatetime(),
+                                                       format='DD-MM-YYYY')
+    st.sidebar.markdown('---')
+
+    traffic_options = st.sidebar.multiselect('Quais as condições de trânsito?',
+                                     options=backend.traffic_options,
+                                     default=backend.traffic_options,
+                                     placeholder='Escolha as densidades')
+
+    with st.sidebar.expander('Filtros geográficos'):
+        target = st.radio('Raio em torno do', ['delivery', 'restaurant'], horizontal=True,
+                          format_func={'delivery': 'Local de entrega', 'restaurant': 'Restaurante'}.get)
+        col1, col2 = st.columns(2)
+        lat = col1.number_input('Latitude', min_value=-90.0, max_value=90.0, value=None, format='%.6f')
+        lon = col2.number_input('Longitude', min_value=-180.0, max_value=180.0, value=None, format='%.6f')
+        radius_km = st.number_input('Raio (km, 0 = sem filtro)', min_value=0.0, value=0.0, step=1.0)
+        min_distance_km = st.number_input('Entregas acima de (km, 0 = sem filtro)', min_value=0.0, value=0.0, step=1.0)
+
+        center = None if lat is None or lon is None else (lat, lon)
+        if center is not None:
+            restaurant = backend.nearest_restaurant(lat, lon)
+            if restaurant is not None:
+                st.caption(f"Restaurante mais próximo: ({restaurant['Restaurant_latitude']:.6f}, {restaurant['Restaurant_longitude']:.6f}), "
+                           f"a {restaurant['distance']:.2f} km, com {restaurant['orders']} pedidos")
+
+    st.sidebar.markdown('---')
+    st.sidebar.toggle('Modo debug (medições)', key=DEBUG_KEY)
+    st.sidebar.markdown('### Made by Gabriel Paneque Didi')
+
+    return date_slider, traffic_options, AreaFilter(center, radius_km, target, min_distance_km)
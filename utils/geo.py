@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+def grid_cells(df, cols, value_col, cell_size):
+    """ Esta função tem o objetivo de agrupar coordenadas em uma grade regular (em graus) com células de tamanho cell_size.
+
+        Cada célula recebe a quantidade de pedidos e a média de value_col.
+        Coordenadas inválidas (não finitas ou iguais a (0, 0)) são ignoradas.
+
+        Input:
+        - df (DataFrame): DataFrame com os dados das entregas
+        - cols (list): Lista de strings com nomes de colunas que retornam latitude e longitude
+        - value_col (str): Coluna cuja média é calculada por célula
+        - cell_size (float): Tamanho da célula, em graus
+        Output: DataFrame com as colunas 'row', 'column', 'orders' e 'value_mean'
+    """
+    lat = df[cols[0]].to_numpy(dtype=float)
+    lon = df[cols[1]].to_numpy(dtype=float)
+    values = df[value_col].to_numpy(dtype=float)
+
+    valid = np.isfinite(lat) & np.isfinite(lon) & ((lat != 0) | (lon != 0))
+    lat, lon, values = lat[valid], lon[valid], values[valid]
+
+    rows = np.floor(lat / cell_size).astype(np.int64)
+    columns = np.floor(lon / cell_size).astype(np.int64)
+    df_cells = pd.DataFrame({'row': rows, 'column': columns, 'value': values})
+    return df_cells.groupby(['row', 'column']).agg(orders=('value', 'size'), value_mean=('value', 'mean')).reset_index()
+
+def bin_coordinates(rows, cols, value_col='Time_taken(min)', cell_size=0.05, max_cells=2000):
+    """ Esta função tem o objetivo de agrupar coordenadas em uma grade regular (em graus) no servidor.
+
+        Se a grade tiver mais que max_cells células ocupadas, o tamanho da célula é dobrado até o limite
+        ser respeitado, de modo que o volume de dados enviado ao navegador não depende da quantidade de pedidos.
+
+        Input:
+        - rows (PandasRows ou SQLRows): Dados filtrados (ver utils.backends), que calculam a grade (grid_cells ou SQL)
+        - cols (list): Lista de strings com nomes de colunas que retornam latitude e longitude
+        - value_col (str): Coluna cuja média é calculada por célula
+        - cell_size (float): Tamanho inicial da célula, em graus
+        - max_cells (int): Quantidade máxima de células retornadas
+        Output: tuple (DataFrame com as colunas 'lat', 'lon', 'orders' e 'value_mean', tamanho final da célula)
+    """
+    while True:
+        df_bins = rows.grid(cols, value_col, cell_size)
+        if len(df_bins) <= max_cells:
+            break
+        cell_size *= 2
+
+    df_bins['lat'] = (df_bins['row'] + 0.5) * cell_size
+    df_bins['lon'] = (df_bins['column'] + 0.5) * cell_size
+
+    return df_bins.loc[:, ['lat', 'lon', 'orders', 'value_mean']], cell_size
+
+def draw_binned_map(df_bins, cell_size, value_label='Tempo médio (min)'):
+    """ Esta função tem o objetivo de criar um mapa com as células de bin_coordinates.
+
+        O mapa tem uma camada de calor (peso = quantidade de pedidos) e uma única camada GeoJSON com as
+        células coloridas pela média do valor, com tooltip. Não há um marcador por pedido.
+
+        Input:
+        - df_bins (DataFrame): Células retornadas por bin_coordinates
+        - cell_size (float): Tamanho da célula, em graus
+        - value_label (str): Rótulo da média exibido na legenda e no tooltip
+        Output: Map
+    """
+    # Importados só ao desenhar: a grade (bin_coordinates) é usada sem o Folium (ex.: utils.analytics)
+    import folium
+    from folium.plugins import HeatMap
+
+    map = folium.Map(location=(np.average(df_bins['lat'], weights=df_bins['orders']),
+                               np.average(df_bins['lon'], weights=df_bins['orders'])),
+                     zoom_control=True, control_scale=True, zoom_start=6)
+
+    HeatMap(df_bins.loc[:, ['lat', 'lon', 'orders']].to_numpy().tolist(), name='Densidade de pedidos').add_to(map)
+
+    vmin, vmax = float(df_bins['value_mean'].min()), float(df_bins['value_mean'].max())
+    colormap = folium.LinearColormap(['green', 'yellow', 'red'], vmin=vmin, vmax=max(vmax, vmin + 1), caption=value_label)
+
+    half = cell_size / 2
+    features = [{'type': 'Feature',
+                 'geometry': {'type': 'Polygon',
+                              'coordinates': [[[lon - half, lat - half], [lon + half, lat - half],
+                                               [lon + half, lat + half], [lon - half, lat + half],
+                                               [lon - half, lat - half]]]},
+                 'properties': {'orders': int(orders), 'value_mean': round(float(value_mean), 2)}}
+                for lat, lon, orders, value_mean in zip(df_bins['lat'], df_bins['lon'], df_bins['orders'], df_bins['value_mean'])]
+
+    folium.GeoJson({'type': 'FeatureCollection', 'features': features},
+                   name=value_label,
+                   style_function=lambda feature: {'fillColor': colormap(feature['properties']['value_mean']),
+                                                   'color': None, 'weight': 0, 'fillOpacity': 0.5},
+                   tooltip=folium.GeoJsonTooltip(fields=['orders', 'value_mean'], aliases=['Pedidos', value_label])).add_to(map)
+
+    colormap.add_to(map)
+    folium.LayerControl().add_to(map)
+
+    return map
@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from utils.data_manipulation import STORE_DIR, quarantine_report, read_clean_csv, read_clean_csv_chunks, store_artifact
+from utils.quantiles import DIGEST_DIMENSIONS, build_digests, merge_digests
+from utils.rollup import build_cube, merge_cubes
+from utils.sketches import SKETCH_DIMENSIONS, build_distinct_sketches, merge_distinct_sketches
+
+# Pasta onde novos lotes de pedidos (CSV no mesmo formato de train.csv) são depositados
+DROP_DIR = 'datasets/incoming'
+
+# Quantidade de linhas lidas por vez na carga em blocos
+CHUNKSIZE = 100_000
+
+# Agregados mantidos no armazenamento: (arquivo, construção a partir de linhas limpas, combinação de agregados concatenados)
+AGGREGATES = [
+    ('cube.parquet', build_cube, merge_cubes),
+    ('couriers.parquet', build_distinct_sketches, lambda sketches: merge_distinct_sketches(sketches, SKETCH_DIMENSIONS)),
+    ('digests.parquet', build_digests, lambda digests: merge_digests(digests, DIGEST_DIMENSIONS)),
+]
+
+# Agregados que não são mais mantidos, removidos na próxima ingestão. Os IDs já ingeridos são lidos das partes (ver stored_ids)
+RETIRED_AGGREGATES = ['ids.parquet']
+
+def read_state(store_dir=STORE_DIR):
+    """ Esta função tem o objetivo de ler o estado do armazenamento incremental.
+
+        O estado guarda a versão do armazenamento, a marca d'água (última Order_Date ingerida), a lista de
+        lotes já processados, as partes de dados limpos e os arquivos atuais dos agregados.
+
+        Input: store_dir (str)
+        Output: dict
+    """
+    try:
+        with open(os.path.join(store_dir, 'state.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': 0, 'watermark_date': None, 'batches': [], 'parts': [], 'aggregates': {}}
+
+def _write_state(state, store_dir):
+    """ Esta função tem a responsabilidade de gravar o estado do armazenamento de forma atômica.
+
+        Input:
+        - state (dict): Estado do armazenamento
+        - store_dir (str): Pasta do armazenamento
+        Output: None
+    """
+    tmp = os.path.join(store_dir, 'state.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, os.path.join(store_dir, 'state.json'))
+
+def _remove_old_aggregates(state, store_dir):
+    """ Esta função tem a responsabilidade de remover os arquivos de agregados que o estado não referencia mais.
+
+        São as versões anteriores e as gravadas por ingestões que falharam antes de gravar o estado.
+
+        Input:
+        - state (dict): Estado do armazenamento (já gravado)
+        - store_dir (str): Pasta do armazenamento
+        Output: None
+    """
+    current = set(state.get('aggregates', {}).values())
+    files = [file for file, _, _ in AGGREGATES] + RETIRED_AGGREGATES
+    stems = tuple(os.path.splitext(file)[0] + '-' for file in files)
+    for name in os.listdir(store_dir):
+        old = name in files or (name.startswith(stems) and name.endswith('.parquet'))
+        if old and name not in current:
+            os.remove(os.path.join(store_dir, name))
+
+def id_months(df, state):
+    """ Esta função tem o objetivo de listar os meses cujos IDs já ingeridos são comparados com um lote (ver stored_ids).
+
+        São os meses de Order_Date do lote e os meses a partir do mês da marca d'água, onde chegam os reenvios
+        de pedidos recentes.
+
+        Input:
+        - df (DataFrame): Lote já limpo
+        - state (dict): Estado do armazenamento
+        Output: set (meses no formato AAAA-MM)
+    """
+    months = set(df['Order_Date'].dt.strftime('%Y-%m').unique())
+    if state['watermark_date'] is not None:
+        months |= {os.path.dirname(part) for part in state['parts'] if os.path.dirname(part) >= state['watermark_date'][:7]}
+    return months
+
+def stored_ids(state, store_dir, months):
+    """ Esta função tem o objetivo de retornar os IDs já ingeridos em alguns meses de Order_Date.
+
+        As partes são particionadas por mês (ver _append_rows), então os IDs de um mês são a coluna ID das suas
+        partes: só essa coluna das partes dos meses informados é lida, e o custo depende dos meses do lote, não do
+        tamanho do histórico.
+
+        Input:
+        - state (dict): Estado do armazenamento
+        - store_dir (str): Pasta do armazenamento
+        - months (set): Meses no formato AAAA-MM (ver id_months)
+        Output: Series
+    """
+    files = [os.path.join(store_dir, 'parts', part) for part in state['parts'] if os.path.dirname(part) in months]
+    if not files:
+        return pd.Series([], dtype=object)
+    return pd.concat([pd.read_parquet(file, columns=['ID'])['ID'] for file in files], ignore_index=True)
+
+def apply_watermark(df, state, ids):
+    """ Esta função tem o objetivo de separar as linhas novas das duplicadas e contar os pedidos atrasados.
+
+        São rejeitadas (duplicadas) as linhas cujo ID já foi ingerido (nos meses de id_months) e os IDs repetidos
+        dentro do próprio lote.
+        Linhas com ID novo e Order_Date anterior à marca d'água (pedidos que chegaram atrasados) são aceitas
+        e contadas à parte.
+
+        Input:
+        - df (DataFrame): Lote já limpo (saída de clean_data)
+        - state (dict): Estado do armazenamento
+        - ids (Series): IDs já ingeridos (ver stored_ids)
+        Output: tuple (DataFrame aceito, quantidade de linhas duplicadas, quantidade de linhas atrasadas aceitas)
+    """
+    accepted = ~df['ID'].duplicated() & ~df['ID'].isin(ids)
+
+    late = pd.Series(False, index=df.index)
+    if state['watermark_date'] is not None:
+        late = df['Order_Date'] < pd.Timestamp(state['watermark_date'])
+
+    return df.loc[accepted, :], int((~accepted).sum()), int((accepted & late).sum())
+
+def _write_parts(df, state, store_dir):
+    """ Esta função tem a responsabilidade de gravar linhas limpas em novas partes do armazenamento e avançar a marca d'água.
+
+        As linhas são gravadas em partes Parquet particionadas por mês de Order_Date (parts/AAAA-MM/). O estado é
+        alterado aqui mas não gravado: partes gravadas por uma ingestão que falhar antes disso são ignoradas.
+
+        Input:
+        - df (DataFrame): Linhas limpas a serem gravadas
+        - state (dict): Estado do armazenamento
+        - store_dir (str): Pasta do armazenamento
+        Output: None
+    """
+    for month, df_month in df.groupby(df['Order_Date'].dt.strftime('%Y-%m')):
+        part = os.path.join(month, f'part-{len(state["parts"]):05d}.parquet')
+        os.makedirs(os.path.join(store_dir, 'parts', month), exist_ok=True)
+        df_month.to_parquet(os.path.join(store_dir, 'parts', part), index=False)
+        state['parts'].append(part)
+
+    last_date = df['Order_Date'].max()
+    if state['watermark_date'] is None or last_date > pd.Timestamp(state['watermark_date']):
+        state['watermark_date'] = last_date.strftime('%Y-%m-%d')
+
+def _build_aggregates(df, partials=None):
+    """ Esta função tem o objetivo de construir os agregados de AGGREGATES de linhas limpas, combinados com agregados parciais.
+
+        Input:
+        - df (DataFrame): Linhas limpas
+        - partials (dict): Agregados parciais de outras linhas ({arquivo: DataFrame}), como os de blocos anteriores
+        Output: dict {arquivo: DataFrame}
+    """
+    if partials is None:
+        return {file: build(df) for file, build, _ in AGGREGATES}
+    return {file: merge(pd.concat([partials[file], build(df)], ignore_index=True)) for file, build, merge in AGGREGATES}
+
+def _write_aggregates(partials, state, store_dir, n_parts):
+    """ Esta função tem a responsabilidade de combinar os agregados das novas linhas com os do armazenamento e gravá-los.
+
+        Cada agregado de AGGREGATES (cubo, sketches de entregadores e de quantis) é combinado com o agregado das
+        novas linhas, sem reler o histórico. Os agregados são gravados em novos arquivos (nome com a quantidade
+        de partes) e os anteriores não são alterados: a troca acontece quando o estado, alterado aqui mas não
+        gravado, for gravado. Se a ingestão falhar antes disso, o lote pode ser reprocessado sem ser contado duas vezes.
+
+        Input:
+        - partials (dict): Agregados das novas linhas (ver _build_aggregates)
+        - state (dict): Estado do armazenamento, com as novas partes
+        - store_dir (str): Pasta do armazenamento
+        - n_parts (int): Quantidade de partes antes das novas linhas
+        Output: None
+    """
+    aggregates = state.setdefault('aggregates', {})
+    for file in RETIRED_AGGREGATES:
+        aggregates.pop(file, None)
+    for file, build, merge in AGGREGATES:
+        target = store_artifact(store_dir, file, state)
+        if os.path.exists(target):
+            aggregate = merge(pd.concat([pd.read_parquet(target), partials[file]], ignore_index=True))
+        elif n_parts > 0:
+            # Armazenamento criado antes deste agregado: começa pelo histórico já gravado
+            history = pd.concat([pd.read_parquet(os.path.join(store_dir, 'parts', part)) for part in state['parts'][:n_parts]], ignore_index=True)
+            aggregate = merge(pd.concat([build(history), partials[file]], ignore_index=True))
+        else:
+            aggregate = partials[file]
+        aggregates[file] = f'{os.path.splitext(file)[0]}-{len(state["parts"]):05d}.parquet'
+        aggregate.to_parquet(os.path.join(store_dir, aggregates[file]), index=False)
+
+def _append_rows(df, state, store_dir):
+    """ Esta função tem a responsabilidade de gravar linhas limpas no armazenamento e atualizar cubo, sketches e marca d'água.
+
+        Input:
+        - df (DataFrame): Linhas limpas a serem gravadas
+        - state (dict): Estado do armazenamento
+        - store_dir (str): Pasta do armazenamento
+        Output: None
+    """
+    n_parts = len(state['parts'])
+    _write_parts(df, state, store_dir)
+    _write_aggregates(_build_aggregates(df), state, store_dir, n_parts)
+
+def _write_quarantine(df_quarantine, path, store_dir):
+    """ Esta função tem a responsabilidade de gravar as linhas descartadas na limpeza de um CSV na quarentena do armazenamento.
+
+        Input:
+        - df_quarantine (DataFrame): Linhas descartadas (ver read_clean_csv)
+        - path (str): Caminho do CSV (o arquivo da quarentena tem o mesmo nome)
+        - store_dir (str): Pasta do armazenamento
+        Output: None
+    """
+    if len(df_quarantine) > 0:
+        os.makedirs(os.path.join(store_dir, 'quarantine'), exist_ok=True)
+        df_quarantine.to_parquet(os.path.join(store_dir, 'quarantine', os.path.splitext(os.path.basename(path))[0] + '.parquet'), index=False)
+
+def ingest_batch(path, store_dir=STORE_DIR):
+    """ Esta função tem o objetivo de ingerir um lote de pedidos no armazenamento incremental.
+
+        Apenas as linhas do lote são lidas e limpas (read_clean_csv). As linhas aceitas são gravadas em novas
+        partes Parquet e o cubo de agregados é atualizado com o cubo do lote, sem reler o histórico.
+        As linhas descartadas na limpeza são gravadas na quarentena do armazenamento (pasta quarantine).
+
+        Input:
+        - path (str): Caminho do CSV do lote
+        - store_dir (str): Pasta do armazenamento
+        Output: dict com a quantidade de linhas lidas, aceitas, rejeitadas por duplicidade, atrasadas (aceitas,
+        com data anterior à marca d'água) e em quarentena (por motivo)
+    """
+    state = read_state(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+
+    df_batch, df_quarantine = read_clean_csv(path)
+    df_new, rejected, late = apply_watermark(df_batch, state, stored_ids(state, store_dir, id_months(df_batch, state)))
+
+    _write_quarantine(df_quarantine, path, store_dir)
+
+    if len(df_new) > 0:
+        _append_rows(df_new, state, store_dir)
+
+    state['batches'].append(os.path.basename(path))
+    state['version'] += 1
+    _write_state(state, store_dir)
+    _remove_old_aggregates(state, store_dir)
+
+    return {'batch': os.path.basename(path), 'read': len(df_batch) + len(df_quarantine), 'cleaned': len(df_batch), 'accepted': len(df_new),
+            'rejected': rejected, 'late': late, 'quarantined': quarantine_report(df_quarantine).set_index('reason')['count'].to_dict()}
+
+def ingest_new_batches(drop_dir=DROP_DIR, store_dir=STORE_DIR):
+    """ Esta função tem o objetivo de ingerir, em ordem de nome, os lotes da pasta de entrada ainda não processados.
+
+        Input:
+        - drop_dir (str): Pasta de entrada dos lotes
+        - store_dir (str): Pasta do armazenamento
+        Output: list (um resumo por lote ingerido)
+    """
+    processed = set(read_state(store_dir)['batches'])
+    batches = sorted(file for file in os.listdir(drop_dir) if file.endswith('.csv') and file not in processed)
+
+    return [ingest_batch(os.path.join(drop_dir, file), store_dir) for file in batches]
+
+def ingest_csv_in_chunks(path, store_dir=STORE_DIR, chunksize=CHUNKSIZE):
+    """ Esta função tem o objetivo de carregar um CSV maior que a memória no armazenamento incremental.
+
+        O CSV é lido e limpo em blocos de chunksize linhas com o mesmo leitor de ingest_batch (read_clean_csv_chunks),
+        e cada bloco é gravado em partes imediatamente. As linhas descartadas na limpeza vão para a quarentena. Dos blocos só ficam em memória os agregados (cubo e sketches), combinados bloco a bloco e
+        gravados uma única vez no final: o pico de memória depende do tamanho do bloco e dos agregados, e não do arquivo.
+        Como os pedidos do CSV não estão ordenados por data, a marca d'água não é aplicada aqui:
+        o resultado é o mesmo de read_clean_csv sobre o arquivo inteiro. O armazenamento deve estar vazio.
+
+        Input:
+        - path (str): Caminho do CSV (ex.: datasets/train.csv)
+        - store_dir (str): Pasta do armazenamento
+        - chunksize (int): Quantidade de linhas por bloco
+        Output: dict com a quantidade de linhas lidas, gravadas e em quarentena (por motivo)
+    """
+    state = read_state(store_dir)
+    if state['parts']:
+        raise ValueError(f'O armazenamento {store_dir} já possui dados')
+    os.makedirs(store_dir, exist_ok=True)
+
+    read, written, partials, quarantine = 0, 0, None, []
+    for df_chunk, df_rejected, n_rows in read_clean_csv_chunks(path, chunksize):
+        if len(df_chunk) > 0:
+            _write_parts(df_chunk, state, store_dir)
+            partials = _build_aggregates(df_chunk, partials)
+        quarantine.append(df_rejected)
+        read += n_rows
+        written += len(df_chunk)
+
+    if partials is not None:
+        _write_aggregates(partials, state, store_dir, 0)
+    df_quarantine = pd.concat([df for df in quarantine if len(df) > 0] or quarantine[:1], ignore_index=True)
+    _write_quarantine(df_quarantine, path, store_dir)
+
+    state['batches'].append(os.path.basename(path))
+    state['version'] += 1
+    _write_state(state, store_dir)
+    _remove_old_aggregates(state, store_dir)
+
+    return {'batch': os.path.basename(path), 'read': read, 'cleaned': written, 'accepted': written, 'rejected': 0, 'late': 0,
+            'quarantined': quarantine_report(df_quarantine).set_index('reason')['count'].to_dict()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingere novos lotes de pedidos no armazenamento incremental.')
+    parser.add_argument('--drop-dir', default=DROP_DIR)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--from-csv', help='Carrega um CSV completo em blocos em um armazenamento vazio')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    if args.from_csv:
+        print(ingest_csv_in_chunks(args.from_csv, args.store_dir, args.chunksize))
+    else:
+        for report in ingest_new_batches(args.drop_dir, args.store_dir):
+            print(report)
@@ -0,0 +1,127 @@
+import argparse
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from utils.data_manipulation import DATA_PATH, clean_csv_table, csv_convert_options, write_snapshot
+from utils.rollup import build_cube, merge_cubes
+from utils.schema import sort_categories, widen_dictionaries
+
+def split_byte_ranges(path, n_parts):
+    """ Esta função tem o objetivo de dividir um CSV em faixas de bytes que começam e terminam em quebras de linha.
+
+        Cada faixa pode ser lida e limpa de forma independente por um processo. O cabeçalho fica fora das faixas.
+        Supõe que não há quebras de linha dentro de campos entre aspas (como no train.csv).
+
+        Input:
+        - path (str): Caminho do CSV
+        - n_parts (int): Quantidade desejada de faixas
+        Output: list de tuplas (início, fim)
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header_end = len(f.readline())
+        bounds = [header_end]
+        for i in range(1, n_parts):
+            f.seek(max(header_end + (size - header_end) * i // n_parts - 1, bounds[-1]))
+            f.readline()
+            bounds.append(f.tell())
+        bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _clean_partition(path, start, end, columns, out_dir, part):
+    """ Esta função tem a responsabilidade de ler, limpar e agregar uma faixa do CSV dentro de um processo do pool.
+
+        A faixa é lida e limpa com o mesmo leitor do pyarrow de read_clean_csv (clean_csv_table).
+        Os dados limpos, a quarentena e o cubo parcial são gravados em arquivos Arrow IPC em out_dir, em vez de
+        voltarem ao processo principal como DataFrames serializados com pickle.
+
+        Input:
+        - path (str): Caminho do CSV
+        - start, end (int): Faixa de bytes
+        - columns (list): Nomes das colunas do CSV
+        - out_dir (str): Pasta temporária dos arquivos Arrow
+        - part (int): Número da faixa
+        Output: tuple (arquivo dos dados, quantidade de linhas brutas, arquivo do cubo, arquivo da quarentena)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    table_raw = pv.read_csv(io.BytesIO(data), read_options=pv.ReadOptions(column_names=columns, use_threads=False),
+                            convert_options=csv_convert_options(columns))
+    df1, df_rejected = clean_csv_table(table_raw)
+
+    data_file = os.path.join(out_dir, f'data-{part:05d}.arrow')
+    cube_file = os.path.join(out_dir, f'cube-{part:05d}.arrow')
+    rejected_file = os.path.join(out_dir, f'rejected-{part:05d}.arrow')
+    for df, file in [(df1, data_file), (build_cube(df1), cube_file), (df_rejected, rejected_file)]:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return data_file, table_raw.num_rows, cube_file, rejected_file
+
+def _read_arrow(file):
+    """ Esta função tem a responsabilidade de ler um arquivo Arrow IPC mapeado em memória.
+
+        As colunas categóricas passam a usar índices int32, para que as partes possam ser concatenadas.
+
+        Input: file (str)
+        Output: Table
+    """
+    table = pa.ipc.open_file(pa.memory_map(file)).read_all()
+    return table.cast(widen_dictionaries(table.schema))
+
+def parallel_clean(path, workers=None):
+    """ Esta função tem o objetivo de executar a limpeza (read_clean_csv) e build_cube em paralelo, em um pool de processos.
+
+        O CSV é dividido em faixas de linhas (split_byte_ranges); cada processo limpa sua faixa e constrói
+        o cubo parcial. O processo principal concatena as partes Arrow, corrige a coluna 'index' para a
+        numeração global das linhas e combina os cubos (merge_cubes). O resultado é igual ao de
+        read_clean_csv sobre o arquivo inteiro, inclusive a quarentena.
+
+        Input:
+        - path (str): Caminho do CSV
+        - workers (int): Quantidade de processos (padrão: quantidade de CPUs)
+        Output: tuple (DataFrame limpo, cubo, DataFrame da quarentena)
+    """
+    workers = workers or os.cpu_count()
+    columns = pd.read_csv(path, nrows=0).columns.tolist()
+    ranges = split_byte_ranges(path, workers * 2)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_clean_partition, path, start, end, columns, out_dir, part)
+                       for part, (start, end) in enumerate(ranges)]
+            results = [future.result() for future in futures]
+
+        tables = [_read_arrow(data_file) for data_file, _, _, _ in results]
+        df1 = pa.concat_tables(tables).to_pandas()
+        cube = merge_cubes(*[_read_arrow(cube_file).to_pandas() for _, _, cube_file, _ in results])
+        # Faixas sem linhas descartadas têm colunas sem tipo (null) e não entram na concatenação
+        rejected = [_read_arrow(rejected_file).to_pandas() for _, _, _, rejected_file in results]
+        df_rejected = pd.concat([df for df in rejected if len(df) > 0] or rejected[:1], ignore_index=True)
+
+    # Numeração global das linhas, como em read_clean_csv sobre o arquivo inteiro
+    offsets = np.cumsum([0] + [n_rows for _, n_rows, _, _ in results[:-1]])
+    df1['index'] += np.repeat(offsets, [table.num_rows for table in tables])
+    df_rejected['index'] += np.repeat(offsets, [len(df) for df in rejected])
+
+    return sort_categories(df1), cube, df_rejected
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Limpa o CSV e constrói o cubo em paralelo, gravando o snapshot lido pelas páginas.')
+    parser.add_argument('path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    df1, cube, df_rejected = parallel_clean(args.path, args.workers)
+    print(write_snapshot(args.path, df1, cube, df_rejected))
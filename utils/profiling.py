@@ -0,0 +1,153 @@
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Arquivo JSON-lines onde as medições são acrescentadas quando o modo debug está ligado
+PROFILE_LOG = 'logs/profile.jsonl'
+
+# Chave do toggle de debug (e das medições) no st.session_state
+DEBUG_KEY = 'debug_profiling'
+RECORDS_KEY = 'profile_records'
+
+def _rss_mb():
+    """ Esta função tem a responsabilidade de retornar a memória residente atual do processo, em MB.
+
+        Lê /proc/self/statm (Linux). Em outros sistemas retorna None.
+
+        Input: None
+        Output: float ou None
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+def debug_enabled():
+    """ Esta função tem o objetivo de informar se o modo debug (medição das etapas) está ligado.
+
+        Fora do Streamlit (Streamlit não importado, ex.: utils.analytics em scripts) retorna False sem importá-lo.
+
+        Input: None
+        Output: bool
+    """
+    if 'streamlit' not in sys.modules:
+        return False
+
+    import streamlit as st
+    try:
+        return bool(st.session_state.get(DEBUG_KEY, False))
+    except Exception:
+        return False
+
+def start_profiling(page):
+    """ Esta função tem o objetivo de iniciar as medições de uma execução da página.
+
+        Deve ser chamada no início de cada página, antes de qualquer etapa medida.
+
+        Input: page (str) -> Nome da página
+        Output: None
+    """
+    if debug_enabled():
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        st.session_state[RECORDS_KEY] = {'page': page, 'session': ctx.session_id if ctx else None,
+                                         'started': time.time(), 'sections': []}
+
+class _Section:
+    """ Esta classe guarda a medição de uma etapa. O campo rows_out pode ser preenchido dentro do bloco with. """
+    def __init__(self, name, rows_in):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+@contextmanager
+def profile(name, rows_in=None):
+    """ Esta função tem o objetivo de medir uma etapa da página: tempo de parede, linhas de entrada/saída e variação de memória.
+
+        Com o modo debug desligado, o bloco é executado sem nenhuma medição.
+
+        Exemplo:
+            with profile('filtro', rows_in=len(df)) as section:
+                df1 = ...
+                section.rows_out = len(df1)
+
+        Input:
+        - name (str): Nome da etapa
+        - rows_in (int): Quantidade de linhas de entrada
+        Output: _Section
+    """
+    section = _Section(name, rows_in)
+    if not debug_enabled():
+        yield section
+        return
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    try:
+        yield section
+    finally:
+        seconds = time.perf_counter() - start
+        rss_after = _rss_mb()
+        import streamlit as st
+        records = st.session_state.get(RECORDS_KEY)
+        if records is not None:
+            records['sections'].append({
+                'section': name,
+                'seconds': round(seconds, 4),
+                'rows_in': section.rows_in,
+                'rows_out': section.rows_out,
+                'mem_delta_mb': None if rss_before is None or rss_after is None else round(rss_after - rss_before, 1),
+            })
+
+def profiled(name=None):
+    """ Esta função tem o objetivo de criar um decorador que mede cada chamada da função com profile().
+
+        As linhas de entrada e de saída são obtidas com len() do primeiro argumento e do retorno, quando possível.
+
+        Input: name (str) -> Nome da etapa (padrão: nome da função)
+        Output: decorador
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = len(args[0]) if args and hasattr(args[0], '__len__') and not isinstance(args[0], str) else None
+            with profile(name or func.__name__, rows_in) as section:
+                result = func(*args, **kwargs)
+                if hasattr(result, '__len__') and not isinstance(result, (str, tuple)):
+                    section.rows_out = len(result)
+            return result
+        return wrapper
+    return decorator
+
+def profiling_panel():
+    """ Esta função tem o objetivo de mostrar as medições da execução atual na barra lateral e acrescentá-las ao log.
+
+        Deve ser chamada no final de cada página. Não faz nada com o modo debug desligado.
+
+        Input: None
+        Output: None
+    """
+    if not debug_enabled():
+        return
+
+    import streamlit as st
+    records = st.session_state.get(RECORDS_KEY)
+    if not records:
+        return
+
+    total = time.time() - records['started']
+    with st.sidebar.expander(f'Medições ({total:.2f} s)', expanded=True):
+        st.dataframe(records['sections'], hide_index=True)
+
+    os.makedirs(os.path.dirname(PROFILE_LOG), exist_ok=True)
+    with open(PROFILE_LOG, 'a') as f:
+        for section in records['sections']:
+            f.write(json.dumps({'timestamp': records['started'], 'session': records['session'], 'page': records['page'], **section}) + '\n')
+
+    st.session_state[RECORDS_KEY] = None
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# Células dos sketches de quantis: os filtros das páginas (data e tráfego) e os agrupamentos dos painéis de percentis.
+# Menos dimensões que o cubo, para que a tabela de centróides continue pequena
+DIGEST_DIMENSIONS = ['Order_Date', 'City', 'Road_traffic_density', 'Festival']
+
+# Medidas com sketch de quantis
+QUANTILE_MEASURES = ['Time_taken(min)', 'Delivery_person_Ratings']
+
+# Compressão do t-digest: no máximo ~compression centróides por sketch; maior = mais preciso e maior
+DIGEST_COMPRESSION = 100
+
+# Quantis mostrados nas páginas
+PERCENTILES = [0.5, 0.9, 0.99]
+
+def _k_scale(q, compression):
+    """ Esta função tem a responsabilidade de aplicar a função de escala k1 do t-digest, que deixa os centróides menores nas caudas.
+
+        Input:
+        - q (ndarray): Quantis em [0, 1]
+        - compression (int): Compressão do t-digest
+        Output: ndarray
+    """
+    return compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+def _compress(df, keys, compression):
+    """ Esta função tem a responsabilidade de agrupar os centróides de cada sketch, de forma vetorizada para todos os sketches.
+
+        Os centróides de cada sketch (linhas com as mesmas keys) são ordenados pela média. Cada centróide é
+        atribuído a uma faixa de largura 1 na escala k1, de acordo com o quantil do seu ponto médio, e os
+        centróides de uma mesma faixa são combinados em um só (média ponderada). É o mesmo limite de tamanho
+        do t-digest, aplicado em uma única passagem em vez de um centróide por vez.
+
+        Input:
+        - df (DataFrame): Centróides com as colunas keys, 'mean' e 'weight'
+        - keys (list): Colunas que identificam cada sketch
+        - compression (int): Compressão do t-digest
+        Output: DataFrame com as colunas keys, 'mean' e 'weight'
+    """
+    if len(df) == 0:
+        return df.loc[:, keys + ['mean', 'weight']].reset_index(drop=True)
+
+    aux = df.loc[:, keys + ['mean', 'weight']].copy()
+    aux['sketch'] = aux.groupby(keys, dropna=False, observed=True).ngroup()
+    aux = aux.sort_values(['sketch', 'mean'], kind='stable')
+
+    grouped = aux.groupby('sketch')['weight']
+    position = grouped.cumsum() - aux['weight'] / 2
+    aux['bucket'] = np.floor(_k_scale(position / grouped.transform('sum'), compression)).astype(np.int64)
+    aux['weighted'] = aux['mean'] * aux['weight']
+
+    agg = {col: (col, 'first') for col in keys}
+    agg['weighted'] = ('weighted', 'sum')
+    agg['weight'] = ('weight', 'sum')
+    compressed = aux.groupby(['sketch', 'bucket'], sort=True).agg(**agg).reset_index(drop=True)
+    compressed['mean'] = compressed['weighted'] / compressed['weight']
+
+    return compressed.loc[:, keys + ['mean', 'weight']]
+
+def build_digests(df, measures=QUANTILE_MEASURES, by=DIGEST_DIMENSIONS, compression=DIGEST_COMPRESSION):
+    """ Esta função tem o objetivo de construir um t-digest por célula e medida a partir dos dados limpos.
+
+        A tabela tem uma linha por centróide, com as dimensões, 'measure', 'mean' e 'weight'. Como o cubo,
+        pode ser filtrada (filter_cube) e combinada para qualquer agrupamento (merge_digests), sem reler as linhas.
+
+        Input:
+        - df (DataFrame): DataFrame limpo
+        - measures (list): Medidas com sketch de quantis
+        - by (list): Lista de strings com nomes das dimensões das células
+        - compression (int): Compressão do t-digest
+        Output: DataFrame
+    """
+    digests = []
+    for measure in measures:
+        aux = df.loc[df[measure].notna(), by].copy()
+        aux['measure'] = measure
+        aux['mean'] = df.loc[df[measure].notna(), measure].astype('float64')
+        # Valores repetidos (tempos em minutos, avaliações com uma casa) viram um único centróide com peso
+        aux = aux.groupby(by + ['measure', 'mean'], dropna=False, observed=True).size().rename('weight').reset_index()
+        aux['weight'] = aux['weight'].astype('float64')
+        digests.append(_compress(aux, by + ['measure'], compression))
+
+    df_digests = pd.concat(digests, ignore_index=True)
+    df_digests['measure'] = df_digests['measure'].astype('category')
+    return df_digests
+
+def merge_digests(df_digests, by, compression=DIGEST_COMPRESSION):
+    """ Esta função tem o objetivo de combinar os t-digests das células agrupando pelas colunas informadas.
+
+        Input:
+        - df_digests (DataFrame): Saída de build_digests (normalmente já filtrada)
+        - by (list): Lista de strings com nomes de dimensões
+        - compression (int): Compressão do t-digest
+        Output: DataFrame com as colunas by, 'measure', 'mean' e 'weight'
+    """
+    return _compress(df_digests, by + ['measure'], compression)
+
+def quantiles(df_digests, by, measure, qs=PERCENTILES, compression=DIGEST_COMPRESSION):
+    """ Esta função tem o objetivo de estimar quantis de uma medida para cada grupo a partir dos t-digests.
+
+        O quantil é interpolado linearmente entre os pontos médios dos centróides, como no t-digest.
+
+        Input:
+        - df_digests (DataFrame): Saída de build_digests (normalmente já filtrada)
+        - by (list): Lista de strings com nomes de dimensões
+        - measure (str): Medida (uma de QUANTILE_MEASURES)
+        - qs (list): Quantis em [0, 1]
+        - compression (int): Compressão do t-digest
+        Output: DataFrame com as colunas by e uma coluna 'p<quantil>' para cada quantil (ex.: p50, p90, p99)
+    """
+    columns = [f'p{q * 100:g}' for q in qs]
+    merged = merge_digests(df_digests.loc[df_digests['measure'] == measure, :], by, compression)
+
+    rows = []
+    for key, centroids in merged.groupby(by, dropna=False, observed=True, sort=True):
+        weights = centroids['weight'].to_numpy()
+        positions = np.cumsum(weights) - weights / 2
+        values = np.interp(np.asarray(qs) * weights.sum(), positions, centroids['mean'].to_numpy())
+        rows.append(list(key if isinstance(key, tuple) else (key,)) + list(values))
+
+    return pd.DataFrame(rows, columns=by + columns)
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+def top_k_per_group(df, group_col, value_col, k=10):
+    """ Esta função tem o objetivo de retornar, em uma única passagem, os k menores e os k maiores valores de cada grupo.
+
+        As linhas são ordenadas uma única vez por (grupo, valor) e a posição de cada linha dentro do seu grupo
+        é calculada de forma vetorizada, sem laços por grupo nem concatenações. Linhas com valor nulo são ignoradas.
+
+        Input:
+        - df (DataFrame): DataFrame com uma linha por item a ser ranqueado (ex.: um entregador por cidade)
+        - group_col (str): Coluna de agrupamento (ex.: 'City')
+        - value_col (str): Coluna da métrica (ex.: 'Time_taken(min)', 'Delivery_person_Ratings')
+        - k (int): Quantidade de linhas por grupo em cada extremo
+        Output: tuple (DataFrame com os k menores por grupo em ordem crescente,
+                       DataFrame com os k maiores por grupo em ordem decrescente)
+    """
+    df_valid = df.loc[df[value_col].notna() & df[group_col].notna(), :]
+
+    codes, _ = pd.factorize(df_valid[group_col], sort=True)
+    order = np.lexsort((df_valid[value_col].to_numpy(dtype=float), codes))
+    sorted_codes = codes[order]
+
+    positions = np.arange(len(order))
+    rank = positions - np.searchsorted(sorted_codes, sorted_codes, side='left')
+    rank_from_end = np.searchsorted(sorted_codes, sorted_codes, side='right') - 1 - positions
+
+    head = order[rank < k]
+
+    tail_positions = np.flatnonzero(rank_from_end < k)
+    tail = order[tail_positions[np.lexsort((rank_from_end[tail_positions], sorted_codes[tail_positions]))]]
+
+    return df_valid.iloc[head].reset_index(drop=True), df_valid.iloc[tail].reset_index(drop=True)
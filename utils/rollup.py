@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões do cubo: todo filtro/agrupamento das páginas é feito sobre estas colunas
+CUBE_DIMENSIONS = ['Order_Date', 'week_of_year', 'City', 'Road_traffic_density', 'Festival', 'Type_of_order', 'Weatherconditions']
+
+# Medidas agregadas em cada célula do cubo
+CUBE_MEASURES = ['Time_taken(min)', 'Delivery_person_Ratings', 'Delivery_person_Age', 'Vehicle_condition', 'distance']
+
+def build_cube(df):
+    """ Esta função tem o objetivo de materializar o cubo de agregados parciais a partir dos dados limpos.
+
+        Cada célula (combinação das dimensões) guarda a quantidade de pedidos ('count') e, para cada medida,
+        as parciais combináveis: quantidade de valores válidos (_n), soma (_sum), soma dos quadrados dos desvios
+        em relação à média da célula (_m2, como no algoritmo de Welford), mínimo (_min) e máximo (_max).
+
+        Input: df (DataFrame) -> DataFrame limpo (saída de clean_data)
+        Output: DataFrame
+    """
+    aux = df.loc[:, CUBE_DIMENSIONS + CUBE_MEASURES].copy()
+    for measure in CUBE_MEASURES:
+        # Somas em float64 para não estourar os tipos inteiros estreitos do esquema compacto
+        aux[measure] = pd.to_numeric(aux[measure])
+        aux[measure + '_float'] = aux[measure].astype('float64')
+
+    agg = {'count': ('Order_Date', 'size')}
+    for measure in CUBE_MEASURES:
+        agg[measure + '_n'] = (measure, 'count')
+        agg[measure + '_sum'] = (measure + '_float', 'sum')
+        agg[measure + '_m2'] = (measure + '_float', 'var')
+        agg[measure + '_min'] = (measure, 'min')
+        agg[measure + '_max'] = (measure, 'max')
+
+    cube = aux.groupby(CUBE_DIMENSIONS, dropna=False, observed=True).agg(**agg).reset_index()
+
+    # Variância amostral * (n - 1) = soma dos quadrados dos desvios (zero para células com um único valor)
+    for measure in CUBE_MEASURES:
+        cube[measure + '_m2'] = (cube[measure + '_m2'] * (cube[measure + '_n'] - 1)).fillna(0.0)
+
+    return cube
+
+def upgrade_cube(cube):
+    """ Esta função tem o objetivo de converter cubos gravados no formato antigo (soma dos quadrados, _sumsq) para o formato atual (_m2).
+
+        Cubos já no formato atual são retornados sem alteração.
+
+        Input: cube (DataFrame)
+        Output: DataFrame
+    """
+    old = [measure for measure in CUBE_MEASURES if measure + '_sumsq' in cube.columns]
+    if not old:
+        return cube
+
+    cube = cube.copy()
+    for measure in old:
+        n = cube[measure + '_n']
+        m2 = cube[measure + '_sumsq'] - cube[measure + '_sum'] ** 2 / n.where(n > 0)
+        cube[measure + '_m2'] = m2.clip(lower=0).fillna(0.0)
+    return cube.drop(columns=[measure + '_sumsq' for measure in old])
+
+def _merge_partials(cube, by):
+    """ Esta função tem a responsabilidade de combinar as parciais de um cubo agrupando pelas colunas informadas.
+
+        As somas dos quadrados dos desvios são combinadas como no algoritmo paralelo de Chan/Welford:
+        M2 = Σ M2_i + Σ n_i * (média_i - média do grupo)², sem a subtração de grandes números da soma dos quadrados.
+
+        Input:
+        - cube (DataFrame): Cubo de agregados parciais
+        - by (list): Lista de strings com nomes de dimensões
+        Output: DataFrame
+    """
+    cube = upgrade_cube(cube)
+    grouped = cube.groupby(by, dropna=False, observed=True)
+
+    aux = cube.loc[:, by + ['count']].copy()
+    agg = {'count': 'sum'}
+    for measure in CUBE_MEASURES:
+        n, total = cube[measure + '_n'], cube[measure + '_sum']
+        n_group = grouped[measure + '_n'].transform('sum')
+        delta = total / n.where(n > 0) - grouped[measure + '_sum'].transform('sum') / n_group.where(n_group > 0)
+
+        for col in ['_n', '_sum', '_min', '_max']:
+            aux[measure + col] = cube[measure + col]
+        aux[measure + '_m2'] = cube[measure + '_m2'] + (n * delta ** 2).fillna(0.0)
+
+        agg[measure + '_n'] = 'sum'
+        agg[measure + '_sum'] = 'sum'
+        agg[measure + '_m2'] = 'sum'
+        agg[measure + '_min'] = 'min'
+        agg[measure + '_max'] = 'max'
+
+    return aux.groupby(by, dropna=False, observed=True).agg(agg).reset_index()
+
+def merge_cubes(*cubes):
+    """ Esta função tem o objetivo de combinar cubos construídos sobre partes diferentes dos dados.
+
+        Input: cubes (DataFrame) -> Um ou mais cubos gerados por build_cube
+        Output: DataFrame
+    """
+    return _merge_partials(pd.concat(cubes, ignore_index=True), CUBE_DIMENSIONS)
+
+def filter_cube(cube, date_limit, traffic_options):
+    """ Esta função tem o objetivo de aplicar os filtros da barra lateral sobre as células do cubo.
+
+        Input:
+        - cube (DataFrame): Cubo de agregados parciais
+        - date_limit (datetime): Data limite (exclusiva) dos pedidos
+        - traffic_options (list): Densidades de tráfego selecionadas
+        Output: DataFrame
+    """
+    return cube.loc[(cube['Order_Date'] < date_limit) & (cube['Road_traffic_density'].isin(traffic_options)), :]
+
+def rollup(cube, by, stats=None):
+    """ Esta função tem o objetivo de responder a um agrupamento somando as células do cubo.
+
+        Estatísticas suportadas por medida: 'count', 'sum', 'mean', 'std' (amostral, como no pandas), 'min' e 'max'.
+        Quantis não são combináveis pelo cubo: ver utils.quantiles.
+
+        Input:
+        - cube (DataFrame): Cubo (normalmente já filtrado por filter_cube)
+        - by (list): Lista de strings com nomes de dimensões
+        - stats (dict): Dicionário {medida: [estatísticas]}. Se não informado, retorna apenas a quantidade de pedidos
+        Output: DataFrame com as colunas de agrupamento, 'count' e uma coluna '<medida>_<estatística>' para cada estatística pedida
+    """
+    merged = _merge_partials(cube, by)
+
+    df_rollup = merged.loc[:, by + ['count']].copy()
+    for measure, measure_stats in (stats or {}).items():
+        n = merged[measure + '_n']
+        total = merged[measure + '_sum']
+        for stat in measure_stats:
+            if stat == 'count':
+                values = n
+            elif stat == 'sum':
+                values = total
+            elif stat == 'mean':
+                values = total / n.where(n > 0)
+            elif stat == 'std':
+                values = np.sqrt(merged[measure + '_m2'] / (n - 1).where(n > 1))
+            elif stat in ('min', 'max'):
+                values = merged[measure + '_' + stat]
+            else:
+                raise ValueError(f'Estatística não suportada: {stat}')
+            df_rollup[f'{measure}_{stat}'] = values
+
+    return df_rollup
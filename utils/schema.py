@@ -0,0 +1,91 @@
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+
+# Esquema compacto dos dados limpos: categorias para textos de baixa cardinalidade,
+# inteiros estreitos e float32 onde a faixa de valores permite.
+# Coordenadas e distância continuam em float64 para manter a precisão do haversine.
+COMPACT_SCHEMA = {
+    'Delivery_person_ID': 'category',
+    'Delivery_person_Age': 'int8',
+    'Delivery_person_Ratings': 'float32',
+    'Time_Orderd': 'category',
+    'Time_Order_picked': 'category',
+    'Weatherconditions': 'category',
+    'Road_traffic_density': 'category',
+    'Vehicle_condition': 'int8',
+    'Type_of_order': 'category',
+    'Type_of_vehicle': 'category',
+    'multiple_deliveries': 'int8',
+    'Festival': 'category',
+    'City': 'category',
+    'Time_taken(min)': 'int16',
+    'week_of_year': 'category',
+}
+
+def compact_dtypes(df):
+    """ Esta função tem o objetivo de converter as colunas do DataFrame limpo para o esquema compacto.
+
+        Colunas ausentes no DataFrame são ignoradas.
+
+        Input: df (DataFrame)
+        Output: DataFrame
+    """
+    return df.astype({col: dtype for col, dtype in COMPACT_SCHEMA.items() if col in df.columns})
+
+def sort_categories(df):
+    """ Esta função tem o objetivo de ordenar as categorias das colunas categóricas.
+
+        Ao juntar partes com categorias diferentes, a ordem das categorias depende da ordem das partes;
+        ordená-las deixa o resultado igual ao de astype('category') sobre os dados inteiros.
+
+        Input: df (DataFrame)
+        Output: DataFrame
+    """
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+
+    return df
+
+def widen_dictionaries(schema):
+    """ Esta função tem o objetivo de trocar os índices das colunas categóricas (dictionary) de um esquema Arrow por int32.
+
+        O pandas grava categorias com o menor inteiro que comporta a quantidade de categorias (int8, int16...),
+        então partes gravadas separadamente podem ter esquemas diferentes e não podem ser lidas ou concatenadas juntas.
+
+        Input: schema (Schema)
+        Output: Schema
+    """
+    return pa.schema([field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                      if pa.types.is_dictionary(field.type) else field for field in schema],
+                     metadata=schema.metadata)
+
+def memory_report(df_before, df_after):
+    """ Esta função tem o objetivo de comparar o uso de memória (em bytes) de cada coluna antes e depois da compactação.
+
+        Input:
+        - df_before (DataFrame): DataFrame original
+        - df_after (DataFrame): DataFrame compactado
+        Output: DataFrame com as colunas 'column', 'dtype_before', 'dtype_after', 'bytes_before', 'bytes_after' e 'ratio'
+    """
+    report = pd.DataFrame({'dtype_before': df_before.dtypes.astype(str),
+                           'dtype_after': df_after.dtypes.astype(str),
+                           'bytes_before': df_before.memory_usage(index=False, deep=True),
+                           'bytes_after': df_after.memory_usage(index=False, deep=True)})
+    report.loc['TOTAL', ['bytes_before', 'bytes_after']] = report[['bytes_before', 'bytes_after']].sum()
+    report[['bytes_before', 'bytes_after']] = report[['bytes_before', 'bytes_after']].astype('int64')
+    report['ratio'] = (report['bytes_after'] / report['bytes_before']).round(3)
+
+    return report.rename_axis('column').reset_index()
+
+if __name__ == '__main__':
+    from utils.data_manipulation import clean_data
+
+    parser = argparse.ArgumentParser(description='Mostra o uso de memória dos dados limpos antes e depois do esquema compacto.')
+    parser.add_argument('path', nargs='?', default='datasets/train.csv')
+    args = parser.parse_args()
+
+    df_clean = clean_data(pd.read_csv(args.path), compact=False)
+    print(memory_report(df_clean, compact_dtypes(df_clean)).to_string(index=False))
@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+
+# Precisão do HyperLogLog: 2^12 registradores, erro padrão relativo de 1.04 / sqrt(4096) ≈ 1.6%
+HLL_PRECISION = 12
+
+# Até esta quantidade de valores distintos o sketch guarda os próprios hashes e a contagem é exata
+EXACT_LIMIT = 4096
+
+# Células dos sketches de entregadores: permitem combinar qualquer filtro de data/tráfego e agrupar por semana ou cidade
+SKETCH_DIMENSIONS = ['Order_Date', 'week_of_year', 'City', 'Road_traffic_density']
+
+def hash_values(values):
+    """ Esta função tem o objetivo de calcular hashes de 64 bits estáveis (iguais entre processos e execuções) dos valores.
+
+        Input: values (array-like)
+        Output: ndarray (uint64)
+    """
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+def _bit_length(values):
+    """ Esta função tem a responsabilidade de calcular, de forma vetorizada e exata, a quantidade de bits de inteiros sem sinal.
+
+        Input: values (ndarray uint64)
+        Output: ndarray (int64)
+    """
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= np.uint64(1 << shift)
+        length[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    return length + (values > 0)
+
+def hll_positions(hashes, precision=HLL_PRECISION):
+    """ Esta função tem o objetivo de calcular o registrador e o valor (posição do primeiro bit 1) de cada hash no HyperLogLog.
+
+        Input:
+        - hashes (ndarray uint64)
+        - precision (int): Quantidade de bits usados para escolher o registrador
+        Output: tuple (registradores, valores)
+    """
+    bits = 64 - precision
+    index = (hashes >> np.uint64(bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << bits) - 1)
+    rank = (bits - _bit_length(rest) + 1).astype(np.uint8)
+    return index, rank
+
+def hll_estimate(registers):
+    """ Esta função tem o objetivo de estimar a quantidade de valores distintos a partir dos registradores do HyperLogLog.
+
+        Para cardinalidades pequenas é usada a contagem linear (registradores zerados), como no algoritmo original.
+
+        Input: registers (ndarray uint8, uma linha por sketch)
+        Output: ndarray (float)
+    """
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+
+    raw = alpha * m ** 2 / np.sum(np.exp2(-registers.astype(float)), axis=1)
+    zeros = np.sum(registers == 0, axis=1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+class DistinctSketch:
+    """ Esta classe tem o objetivo de contar valores distintos de forma aproximada e combinável (HyperLogLog).
+
+        Enquanto houver até exact_limit valores distintos, os hashes são guardados e a contagem é exata.
+        Dois sketches são combinados com merge (máximo dos registradores e união dos hashes), então sketches
+        construídos em partes diferentes dos dados respondem à contagem do conjunto sem reler as linhas.
+
+        Input:
+        - precision (int): Precisão do HyperLogLog (2^precision registradores)
+        - exact_limit (int): Quantidade máxima de hashes guardados para a contagem exata
+    """
+    def __init__(self, precision=HLL_PRECISION, exact_limit=EXACT_LIMIT):
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    @property
+    def is_exact(self):
+        return self.hashes is not None
+
+    def add_hashes(self, hashes):
+        """ Esta função tem o objetivo de acrescentar hashes (ver hash_values) ao sketch.
+
+            Input: hashes (ndarray uint64)
+            Output: DistinctSketch
+        """
+        index, rank = hll_positions(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        self._add_exact(hashes)
+        return self
+
+    def add(self, values):
+        """ Esta função tem o objetivo de acrescentar valores ao sketch.
+
+            Input: values (array-like)
+            Output: DistinctSketch
+        """
+        return self.add_hashes(hash_values(values))
+
+    def _add_exact(self, hashes):
+        if self.hashes is not None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > self.exact_limit:
+                self.hashes = None
+
+    def merge(self, other):
+        """ Esta função tem o objetivo de combinar dois sketches, como se os valores de ambos tivessem sido acrescentados a um só.
+
+            Input: other (DistinctSketch) -> Sketch com a mesma precisão
+            Output: DistinctSketch (novo)
+        """
+        if other.precision != self.precision:
+            raise ValueError('Sketches com precisões diferentes não podem ser combinados')
+
+        merged = DistinctSketch(self.precision, min(self.exact_limit, other.exact_limit))
+        merged.registers = np.maximum(self.registers, other.registers)
+        merged.hashes = self.hashes
+        if other.hashes is None:
+            merged.hashes = None
+        else:
+            merged._add_exact(other.hashes)
+        return merged
+
+    def estimate(self):
+        """ Esta função tem o objetivo de retornar a quantidade (exata ou estimada) de valores distintos.
+
+            Input: None
+            Output: float
+        """
+        if self.is_exact:
+            return float(len(self.hashes))
+        return float(hll_estimate(self.registers)[0])
+
+    def relative_error(self):
+        """ Esta função tem o objetivo de retornar o erro padrão relativo da estimativa (0 no modo exato).
+
+            Input: None
+            Output: float
+        """
+        return 0.0 if self.is_exact else 1.04 / np.sqrt(len(self.registers))
+
+    def error_bounds(self, z=3):
+        """ Esta função tem o objetivo de retornar o intervalo da contagem de distintos com z erros padrão.
+
+            Input: z (float) -> Quantidade de erros padrão (3 ≈ 99.7%)
+            Output: tuple (mínimo, máximo)
+        """
+        estimate = self.estimate()
+        margin = z * self.relative_error() * estimate
+        return max(estimate - margin, 0.0), estimate + margin
+
+def build_distinct_sketches(df, value_col='Delivery_person_ID', by=SKETCH_DIMENSIONS, precision=HLL_PRECISION, exact_limit=EXACT_LIMIT):
+    """ Esta função tem o objetivo de construir, em uma passagem vetorizada, um sketch de valores distintos por célula.
+
+        Cada linha da saída guarda os registradores do HyperLogLog ('registers', bytes) e, enquanto a célula tiver até
+        exact_limit valores distintos, os hashes ordenados ('hashes', bytes; nulo quando a célula passa do limite).
+        As linhas podem ser filtradas como as do cubo (ex.: filter_cube) e combinadas com merge_distinct_sketches.
+
+        Input:
+        - df (DataFrame): DataFrame limpo
+        - value_col (str): Coluna cujos valores distintos são contados
+        - by (list): Lista de strings com nomes das dimensões das células
+        - precision (int): Precisão do HyperLogLog
+        - exact_limit (int): Quantidade máxima de hashes guardados por célula
+        Output: DataFrame
+    """
+    aux = df.loc[df[value_col].notna(), by].copy()
+    aux['hash'] = hash_values(df.loc[df[value_col].notna(), value_col])
+    aux['cell'] = aux.groupby(by, dropna=False, observed=True).ngroup()
+    aux = aux.drop_duplicates(['cell', 'hash']).sort_values(['cell', 'hash'])
+
+    cells = aux.drop_duplicates('cell').reset_index(drop=True)
+    cell_codes = aux['cell'].to_numpy()
+    hashes = aux['hash'].to_numpy()
+
+    m = 1 << precision
+    registers = np.zeros((len(cells), m), dtype=np.uint8)
+    index, rank = hll_positions(hashes, precision)
+    np.maximum.at(registers.reshape(-1), cell_codes * m + index, rank)
+
+    starts = np.searchsorted(cell_codes, cells['cell'].to_numpy(), side='left')
+    ends = np.searchsorted(cell_codes, cells['cell'].to_numpy(), side='right')
+
+    df_sketches = cells.loc[:, by].copy()
+    df_sketches['registers'] = [row.tobytes() for row in registers]
+    df_sketches['hashes'] = [hashes[start:end].tobytes() if end - start <= exact_limit else None for start, end in zip(starts, ends)]
+
+    return df_sketches
+
+def _to_sketch(registers, hashes, exact_limit):
+    sketch = DistinctSketch(int(np.log2(len(registers))), exact_limit)
+    sketch.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+    sketch.hashes = None if hashes is None else np.frombuffer(hashes, dtype=np.uint64)
+    return sketch
+
+def merge_distinct_sketches(df_sketches, by=None, exact_limit=EXACT_LIMIT):
+    """ Esta função tem o objetivo de combinar as células de uma tabela de sketches agrupando pelas colunas informadas.
+
+        Input:
+        - df_sketches (DataFrame): Saída de build_distinct_sketches (normalmente já filtrada)
+        - by (list): Lista de strings com nomes de dimensões. Se não informada, todas as células são combinadas em uma
+        - exact_limit (int): Quantidade máxima de hashes guardados por sketch combinado
+        Output: DataFrame com as colunas de agrupamento, 'registers' e 'hashes'
+    """
+    by = by or []
+    if len(df_sketches) == 0:
+        if by:
+            return pd.DataFrame(columns=by + ['registers', 'hashes'])
+        # Sem células: um único sketch vazio (contagem zero)
+        return pd.DataFrame({'registers': [bytes(1 << HLL_PRECISION)], 'hashes': [b'']})
+
+    if by:
+        codes = df_sketches.groupby(by, dropna=False, observed=True).ngroup().to_numpy()
+    else:
+        codes = np.zeros(len(df_sketches), dtype=np.int64)
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1]])
+
+    registers = np.frombuffer(b''.join(df_sketches['registers'].to_numpy()[order]), dtype=np.uint8)
+    registers = np.maximum.reduceat(registers.reshape(len(df_sketches), -1), starts, axis=0)
+
+    hashes = []
+    ends = np.r_[starts[1:], len(order)]
+    for start, end in zip(starts, ends):
+        group = df_sketches['hashes'].to_numpy()[order[start:end]]
+        if any(value is None for value in group):
+            hashes.append(None)
+            continue
+        union = np.unique(np.frombuffer(b''.join(group), dtype=np.uint64))
+        hashes.append(union.tobytes() if len(union) <= exact_limit else None)
+
+    df_merged = df_sketches.iloc[order[starts]].loc[:, by].reset_index(drop=True)
+    df_merged['registers'] = [row.tobytes() for row in registers]
+    df_merged['hashes'] = hashes
+
+    return df_merged
+
+def distinct_count(df_sketches, by=None, z=3, exact_limit=EXACT_LIMIT):
+    """ Esta função tem o objetivo de responder à contagem de valores distintos de cada grupo a partir dos sketches.
+
+        Input:
+        - df_sketches (DataFrame): Saída de build_distinct_sketches (normalmente já filtrada)
+        - by (list): Lista de strings com nomes de dimensões. Se não informada, retorna uma única linha
+        - z (float): Quantidade de erros padrão do intervalo
+        - exact_limit (int): Quantidade máxima de hashes guardados por sketch combinado
+        Output: DataFrame com as colunas de agrupamento, 'distinct', 'low', 'high' e 'exact'
+    """
+    by = by or []
+    df_merged = merge_distinct_sketches(df_sketches, by, exact_limit)
+
+    df_count = df_merged.loc[:, by].copy()
+    sketches = [_to_sketch(registers, hashes, exact_limit) for registers, hashes in zip(df_merged['registers'], df_merged['hashes'])]
+    bounds = [sketch.error_bounds(z) for sketch in sketches]
+
+    df_count['distinct'] = [round(sketch.estimate()) for sketch in sketches]
+    df_count['low'] = [low for low, _ in bounds]
+    df_count['high'] = [high for _, high in bounds]
+    df_count['exact'] = [sketch.is_exact for sketch in sketches]
+
+    return df_count
@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_manipulation import EARTH_RADIUS_KM, haversine_distance
+
+# Quilômetros por grau de latitude (e de longitude no equador)
+KM_PER_DEGREE = 2 * np.pi * EARTH_RADIUS_KM / 360
+
+# Tamanho das células da grade, em graus (~11 km no equador): raios de poucos km consultam poucas células
+GRID_CELL_SIZE = 0.1
+
+# Acima de 1 / SORT_FRACTION das linhas, o filtro de distância mínima compara todas as distâncias (ver SpatialIndex.query)
+SORT_FRACTION = 16
+
+# Colunas de coordenadas de cada alvo dos filtros geográficos
+TARGET_COLUMNS = {
+    'delivery': ['Delivery_location_latitude', 'Delivery_location_longitude'],
+    'restaurant': ['Restaurant_latitude', 'Restaurant_longitude'],
+}
+
+class AreaFilter:
+    """ Esta classe tem o objetivo de representar os filtros geográficos da barra lateral.
+
+        Input:
+        - center (tuple): (latitude, longitude) do ponto de referência. Se não informado, não há filtro de raio
+        - radius_km (float): Raio em km em torno do ponto (0 ou None = sem filtro de raio)
+        - target (str): Coordenadas comparadas com o raio: 'delivery' (local de entrega) ou 'restaurant'
+        - min_distance_km (float): Distância mínima entre restaurante e local de entrega (0 ou None = sem filtro)
+    """
+    def __init__(self, center=None, radius_km=None, target='delivery', min_distance_km=None):
+        self.center = None if center is None else (float(center[0]), float(center[1]))
+        self.radius_km = float(radius_km) if radius_km and self.center is not None else None
+        self.target = target
+        self.min_distance_km = float(min_distance_km) if min_distance_km else None
+
+    @property
+    def active(self):
+        return self.radius_km is not None or self.min_distance_km is not None
+
+    def key(self):
+        """ Esta função tem o objetivo de retornar uma chave (tupla) do filtro, usada nos caches.
+
+            Input: None
+            Output: tuple (None se o filtro não estiver ativo)
+        """
+        if not self.active:
+            return None
+        if self.radius_km is None:
+            return (None, None, None, self.min_distance_km)
+        return (self.center, self.radius_km, self.target, self.min_distance_km)
+
+def latitude_band(lat, radius_km):
+    """ Esta função tem o objetivo de retornar a faixa de latitudes que contém todos os pontos a até radius_km de uma latitude.
+
+        Input:
+        - lat (float): Latitude do ponto
+        - radius_km (float): Raio em km
+        Output: tuple (latitude mínima, latitude máxima)
+    """
+    delta = radius_km / KM_PER_DEGREE
+    return lat - delta, lat + delta
+
+class GridIndex:
+    """ Esta classe tem o objetivo de encontrar pontos próximos de uma coordenada sem calcular a distância até todos os pontos.
+
+        Os pontos são distribuídos em uma grade regular de cell_size graus e ordenados pela célula (linha da grade e,
+        dentro dela, coluna). Assim, as células de uma linha da grade que cruzam o retângulo em volta do raio são uma
+        única fatia contínua: a consulta faz duas buscas binárias por linha da grade e só calcula a distância
+        (haversine) dos pontos dessas células.
+
+        Input:
+        - lat, lon (array-like): Coordenadas dos pontos, em graus
+        - cell_size (float): Tamanho das células, em graus
+    """
+    def __init__(self, lat, lon, cell_size=GRID_CELL_SIZE):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_size = cell_size
+        self.n_columns = int(np.ceil(360 / cell_size)) + 1
+
+        # Coordenadas inválidas (nulas) ficam com chave -1, fora de qualquer consulta
+        valid = np.isfinite(self.lat) & np.isfinite(self.lon)
+        rows = np.floor((np.where(valid, self.lat, 0) + 90) / cell_size).astype(np.int64)
+        columns = np.floor((np.where(valid, self.lon, 0) + 180) / cell_size).astype(np.int64)
+        keys = np.where(valid, rows * self.n_columns + columns, -1)
+
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _candidates(self, lat, lon, radius_km):
+        """ Esta função tem a responsabilidade de retornar as posições dos pontos das células que cruzam o retângulo em volta do raio.
+
+            O retângulo tem a faixa de latitudes do raio e, em longitude, o maior desvio possível de um ponto do círculo
+            na latitude mais distante do equador: pela fórmula de haversine, sin(dlon / 2) <= sin(raio / 2) / cos(lat).
+            Quando o retângulo passa por um dos polos ou cobre todas as longitudes, todos os pontos são candidatos.
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            - radius_km (float): Raio em km
+            Output: ndarray (posições, sem ordem e possivelmente repetidas)
+        """
+        lat_min, lat_max = latitude_band(lat, radius_km)
+        if lat_min <= -90 or lat_max >= 90:
+            return self.order[self.keys >= 0]
+
+        ratio = np.sin(radius_km / EARTH_RADIUS_KM / 2) / np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+        if ratio >= 1:
+            return self.order[self.keys >= 0]
+
+        delta_lon = np.degrees(2 * np.arcsin(ratio))
+        row_min, row_max = (int(np.floor((value + 90) / self.cell_size)) for value in (lat_min, lat_max))
+        column_min = int(np.floor((lon - delta_lon + 180) / self.cell_size))
+        column_max = int(np.floor((lon + delta_lon + 180) / self.cell_size))
+
+        # Faixas de colunas; se o retângulo alcança o antimeridiano, a parte do outro lado é uma segunda faixa
+        # (com uma coluna a mais, por causa do arredondamento de 360 / cell_size). A coluna last só tem a longitude
+        # 180, igual a -180: alcançá-la (column_max >= last) já cruza o antimeridiano, e alcançar a coluna 0
+        # (column_min <= 0) inclui os pontos com longitude 180
+        last = int(np.floor(360 / self.cell_size))
+        ranges = [(max(column_min, 0), min(column_max, last))]
+        if column_min <= 0:
+            ranges.append((column_min + last - 1, last))
+        if column_max >= last:
+            ranges.append((0, column_max - last + 1))
+
+        slices = []
+        for row in range(row_min, row_max + 1):
+            for first, second in ranges:
+                start = np.searchsorted(self.keys, row * self.n_columns + first, side='left')
+                end = np.searchsorted(self.keys, row * self.n_columns + second, side='right')
+                slices.append(self.order[start:end])
+
+        return np.concatenate(slices) if slices else np.array([], dtype=np.int64)
+
+    def within(self, lat, lon, radius_km):
+        """ Esta função tem o objetivo de retornar os pontos a até radius_km de uma coordenada (distância de haversine).
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            - radius_km (float): Raio em km
+            Output: ndarray (posições dos pontos, em ordem crescente)
+        """
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_distance(lat, lon, self.lat[candidates], self.lon[candidates])
+        return np.unique(candidates[distances <= radius_km])
+
+    def nearest(self, lat, lon):
+        """ Esta função tem o objetivo de retornar o ponto mais próximo de uma coordenada.
+
+            O raio da busca começa em uma célula e dobra até haver um candidato a até o raio atual: como os candidatos
+            incluem todos os pontos dentro do raio, nenhum ponto fora deles pode estar mais perto.
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            Output: tuple (posição do ponto, distância em km) ou (None, None) se não houver pontos
+        """
+        radius_km = self.cell_size * KM_PER_DEGREE
+        while True:
+            candidates = self._candidates(lat, lon, radius_km)
+            if len(candidates) > 0:
+                distances = haversine_distance(lat, lon, self.lat[candidates], self.lon[candidates])
+                best = int(np.argmin(distances))
+                if distances[best] <= radius_km:
+                    return int(candidates[best]), float(distances[best])
+            if radius_km >= KM_PER_DEGREE * 180:
+                return None, None
+            radius_km *= 2
+
+class RestaurantLocator:
+    """ Esta classe tem o objetivo de encontrar o restaurante mais próximo de uma coordenada.
+
+        Cada par de coordenadas de restaurante distinto é um restaurante.
+
+        Input: df_restaurants (DataFrame) -> Colunas 'Restaurant_latitude', 'Restaurant_longitude' e 'orders' (ver restaurant_locations)
+    """
+    def __init__(self, df_restaurants):
+        self.restaurants = df_restaurants.reset_index(drop=True)
+        self.grid = GridIndex(self.restaurants['Restaurant_latitude'], self.restaurants['Restaurant_longitude'])
+
+    def nearest(self, lat, lon):
+        """ Esta função tem o objetivo de retornar o restaurante mais próximo de uma coordenada.
+
+            Input:
+            - lat, lon (float): Coordenadas do ponto
+            Output: dict com 'Restaurant_latitude', 'Restaurant_longitude', 'orders' e 'distance' (km), ou None se não houver restaurantes
+        """
+        position, distance = self.grid.nearest(lat, lon)
+        if position is None:
+            return None
+
+        restaurant = self.restaurants.iloc[position]
+        return {'Restaurant_latitude': float(restaurant['Restaurant_latitude']), 'Restaurant_longitude': float(restaurant['Restaurant_longitude']),
+                'orders': int(restaurant['orders']), 'distance': distance}
+
+def restaurant_locations(df):
+    """ Esta função tem o objetivo de listar os restaurantes (pares de coordenadas distintos) com a quantidade de pedidos.
+
+        Input: df (DataFrame) -> DataFrame limpo
+        Output: DataFrame com as colunas 'Restaurant_latitude', 'Restaurant_longitude' e 'orders'
+    """
+    return df.groupby(TARGET_COLUMNS['restaurant']).size().rename('orders').reset_index()
+
+class SpatialIndex:
+    """ Esta classe tem o objetivo de aplicar os filtros geográficos (AreaFilter) sem varrer todas as linhas.
+
+        São construídos, uma única vez, uma grade (GridIndex) dos locais de entrega, uma dos restaurantes e a ordem das
+        linhas pela distância entre restaurante e local de entrega: o filtro de distância mínima é um sufixo dessa ordem,
+        encontrado por busca binária. Quando o sufixo tem muitas linhas, ordená-lo custa mais que comparar todas as
+        distâncias, e a comparação é usada no lugar.
+
+        Input: df (DataFrame) -> DataFrame limpo (as posições retornadas são as linhas de df)
+    """
+    def __init__(self, df):
+        self.grids = {target: GridIndex(df[cols[0]], df[cols[1]]) for target, cols in TARGET_COLUMNS.items()}
+        self.distance = df['distance'].to_numpy(dtype=float)
+        self.by_distance = np.argsort(self.distance, kind='stable')
+        self.sorted_distance = self.distance[self.by_distance]
+        self.restaurants = RestaurantLocator(restaurant_locations(df))
+
+    def query(self, area):
+        """ Esta função tem o objetivo de retornar as linhas que atendem aos filtros geográficos.
+
+            Input: area (AreaFilter) -> Filtros ativos
+            Output: ndarray (posições das linhas, em ordem crescente)
+        """
+        if area.radius_km is not None:
+            positions = self.grids[area.target].within(area.center[0], area.center[1], area.radius_km)
+            if area.min_distance_km is not None:
+                positions = positions[self.distance[positions] > area.min_distance_km]
+            return positions
+
+        start = np.searchsorted(self.sorted_distance, area.min_distance_km, side='right')
+        if len(self.by_distance) - start > len(self.by_distance) // SORT_FRACTION:
+            return np.flatnonzero(self.distance > area.min_distance_km)
+        return np.sort(self.by_distance[start:])
+
+def area_mask(df, area):
+    """ Esta função tem o objetivo de aplicar os filtros geográficos varrendo as linhas (referência para o SpatialIndex).
+
+        Input:
+        - df (DataFrame): DataFrame limpo
+        - area (AreaFilter): Filtros ativos
+        Output: Series (bool)
+    """
+    mask = pd.Series(True, index=df.index)
+    if area.radius_km is not None:
+        cols = TARGET_COLUMNS[area.target]
+        mask &= haversine_distance(area.center[0], area.center[1], df[cols[0]], df[cols[1]]) <= area.radius_km
+    if area.min_distance_km is not None:
+        mask &= df['distance'] > area.min_distance_km
+    return mask
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from utils.rollup import rollup
+from utils.sketches import hll_estimate
+
+# Janelas móveis (em dias corridos) das métricas operacionais
+ROLLING_WINDOWS = [7, 28]
+
+# Dias por bloco na estimativa do HyperLogLog: limita os temporários (dias x registradores) em históricos longos
+ESTIMATE_CHUNK = 256
+
+def sliding_sum(values, window):
+    """ Esta função tem o objetivo de somar valores diários em janelas móveis, de forma incremental.
+
+        A soma de cada janela é a da janela anterior mais o dia que entra e menos o dia que sai. Com a soma
+        acumulada isso vira uma subtração por dia: O(dias), independente do tamanho da janela.
+        Nos primeiros window - 1 dias a janela tem só os dias disponíveis.
+
+        Input:
+        - values (ndarray): Valores diários, um dia por linha
+        - window (int): Tamanho da janela em dias
+        Output: ndarray com o mesmo formato de values
+    """
+    prefix = np.cumsum(values, axis=0)
+    sums = prefix.copy()
+    sums[window:] -= prefix[:-window]
+    return sums
+
+def sliding_max(values, window):
+    """ Esta função tem o objetivo de calcular o máximo de valores diários em janelas móveis (algoritmo de van Herk/Gil-Werman).
+
+        Um máximo não pode ser desfeito quando o dia sai da janela. Por isso os dias são divididos em blocos de window
+        dias, com o máximo acumulado de cada bloco do início para o fim e do fim para o início: toda janela cobre o final
+        de um bloco e o início do seguinte, e o seu máximo é o maior dos dois acumulados. São três operações por dia,
+        independente do tamanho da janela. Nos primeiros window - 1 dias a janela tem só os dias disponíveis.
+        Os acumulados são feitos posição a posição do bloco, sobre todos os blocos de uma vez (bem mais rápido que
+        np.maximum.accumulate em um eixo intermediário).
+
+        Input:
+        - values (ndarray): Valores diários, um dia por linha (ex.: registradores do HyperLogLog)
+        - window (int): Tamanho da janela em dias
+        Output: ndarray com o mesmo formato de values
+    """
+    n = len(values)
+    padded = np.concatenate([values, np.zeros((-n % window,) + values.shape[1:], dtype=values.dtype)])
+    forward = padded.reshape((-1, window) + values.shape[1:])
+    backward = forward.copy()
+    for j in range(1, window):
+        np.maximum(forward[:, j - 1], forward[:, j], out=forward[:, j])
+        np.maximum(backward[:, window - j], backward[:, window - j - 1], out=backward[:, window - j - 1])
+    forward, backward = forward.reshape(padded.shape)[:n], backward.reshape(padded.shape)[:n]
+
+    maxima = forward.copy()
+    maxima[window - 1:] = np.maximum(backward[:n - window + 1], forward[window - 1:])
+    return maxima
+
+def rolling_metrics(cube, sketches, windows=ROLLING_WINDOWS, by=['City']):
+    """ Esta função tem o objetivo de calcular métricas operacionais em janelas móveis de dias corridos para cada grupo.
+
+        O cubo e os sketches são resumidos em arrays diários (um dia por linha, um grupo por coluna, dias sem pedidos
+        zerados), e as janelas são calculadas de forma incremental sobre esses arrays (sliding_sum e sliding_max), sem
+        recalcular cada janela nem reler as linhas. Os entregadores ativos de cada janela são a união dos sketches
+        diários (máximo dos registradores), estimada pelo HyperLogLog. Só são retornadas janelas completas.
+
+        Input:
+        - cube (DataFrame): Cubo (normalmente já filtrado por filter_cube)
+        - sketches (DataFrame): Sketches de entregadores filtrados da mesma forma (ver utils.sketches)
+        - windows (list): Tamanhos das janelas em dias
+        - by (list): Lista de strings com nomes de dimensões presentes no cubo e nos sketches
+        Output: DataFrame com as colunas 'Order_Date' (último dia da janela), by, 'window', 'orders', 'couriers',
+        'orders_by_person' e 'time_mean'
+    """
+    columns = ['Order_Date'] + by + ['window', 'orders', 'couriers', 'orders_by_person', 'time_mean']
+    # Sem janelas completas: tabela vazia com os mesmos tipos (concatenada com as demais nos artefatos)
+    empty = cube.loc[[], ['Order_Date'] + by].reset_index(drop=True).assign(window=np.int64(0), orders=np.int64(0), couriers=0.0,
+                                                                             orders_by_person=0.0, time_mean=0.0)
+    if len(cube) == 0:
+        return empty
+
+    daily = rollup(cube, ['Order_Date'] + by, {'Time_taken(min)': ['sum', 'count']})
+    dates = pd.date_range(daily['Order_Date'].min(), daily['Order_Date'].max(), freq='D')
+    groups = pd.MultiIndex.from_frame(daily.loc[:, by]).unique().sort_values()
+
+    # Arrays diários: uma linha por dia corrido, uma coluna por grupo
+    shape = (len(dates), len(groups))
+    day = (daily['Order_Date'] - dates[0]).dt.days.to_numpy()
+    group = groups.get_indexer(pd.MultiIndex.from_frame(daily.loc[:, by]))
+    orders, time_sum, time_n = np.zeros(shape, dtype=np.int64), np.zeros(shape), np.zeros(shape)
+    orders[day, group] = daily['count'].to_numpy()
+    time_sum[day, group] = daily['Time_taken(min)_sum'].to_numpy()
+    time_n[day, group] = daily['Time_taken(min)_count'].to_numpy()
+
+    sketch_day = (sketches['Order_Date'] - dates[0]).dt.days.to_numpy()
+    sketch_group = groups.get_indexer(pd.MultiIndex.from_frame(sketches.loc[:, by]))
+    sketch_registers = np.frombuffer(b''.join(sketches['registers'].to_numpy()), dtype=np.uint8).reshape(len(sketches), -1)
+
+    # Registradores diários de cada grupo: máximo dos sketches de cada dia (as demais dimensões são combinadas).
+    # Os sketches de uma mesma célula (grupo, dia) são combinados em camadas: a k-ésima camada tem o k-ésimo sketch
+    # de cada célula, então cada camada é um único máximo vetorizado, sem células repetidas
+    valid = np.flatnonzero(sketch_group >= 0)
+    cell = sketch_group[valid] * len(dates) + sketch_day[valid]
+    order = np.argsort(cell, kind='stable')
+    cell, rows = cell[order], valid[order]
+    layer = np.arange(len(cell)) - np.searchsorted(cell, cell, side='left')
+
+    daily_registers = np.zeros((len(groups) * len(dates), sketch_registers.shape[1]), dtype=np.uint8)
+    for k in range(layer.max() + 1 if len(layer) else 0):
+        mask = layer == k
+        daily_registers[cell[mask]] = np.maximum(daily_registers[cell[mask]], sketch_registers[rows[mask]])
+    daily_registers = daily_registers.reshape(len(groups), len(dates), -1)
+
+    frames = []
+    for window in windows:
+        if len(dates) < window:
+            continue
+
+        couriers = np.zeros(shape)
+        for g in range(len(groups)):
+            registers = sliding_max(daily_registers[g], window)
+            for start in range(window - 1, len(dates), ESTIMATE_CHUNK):
+                couriers[start:start + ESTIMATE_CHUNK, g] = hll_estimate(registers[start:start + ESTIMATE_CHUNK])
+
+        window_orders = sliding_sum(orders, window)[window - 1:]
+        window_time_sum = sliding_sum(time_sum, window)[window - 1:]
+        window_time_n = sliding_sum(time_n, window)[window - 1:]
+        couriers = np.round(couriers[window - 1:])
+
+        df_window = pd.DataFrame({'Order_Date': np.repeat(dates[window - 1:], len(groups))})
+        df_window = pd.concat([df_window, groups.to_frame(index=False).iloc[np.tile(np.arange(len(groups)), len(dates) - window + 1)].reset_index(drop=True)], axis=1)
+        df_window['window'] = window
+        df_window['orders'] = window_orders.reshape(-1)
+        df_window['couriers'] = couriers.reshape(-1)
+        df_window['orders_by_person'] = np.divide(window_orders, couriers, out=np.full(couriers.shape, np.nan), where=couriers > 0).reshape(-1)
+        df_window['time_mean'] = np.divide(window_time_sum, window_time_n, out=np.full(shape, np.nan)[window - 1:], where=window_time_n > 0).reshape(-1)
+        frames.append(df_window)
+
+    if not frames:
+        return empty
+
+    return pd.concat(frames, ignore_index=True).loc[:, columns]